@@ -1,33 +1,55 @@
 import abc
+import hashlib
 import math
+import sqlite3
 import time
+from contextlib import ExitStack, closing
 from datetime import datetime
-from multiprocessing import Pool
+from itertools import groupby
+from multiprocessing import Pool, Queue, Semaphore
+from multiprocessing.queues import Queue as QueueType
+from multiprocessing.synchronize import Semaphore as SemaphoreType
+from operator import itemgetter
 from pathlib import Path
-from typing import Iterator, cast
+from tempfile import TemporaryDirectory
+from typing import Iterable, Iterator, cast
 
 import elasticsearch
+import orjson
 import tqdm
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk, parallel_bulk
+from elasticsearch.helpers import parallel_bulk, scan
 from elasticsearch_dsl import Index, Search
 from redis import Redis
 
 from app._types import FetcherResult, FetcherStatus, JSONType
+from app.bulk_writer import BulkWriter
 from app.config import Config, IndexConfig, settings
+from app.import_checkpoint import ImportCheckpoint, remove_checkpoints
+from app.import_metrics import ImportMetrics, import_report, write_import_report
 from app.indexing import (
     BaseTaxonomyPreprocessor,
     DocumentProcessor,
     generate_index_object,
     generate_taxonomy_index_object,
 )
-from app.taxonomy import iter_taxonomies
+from app.taxonomy import Taxonomy, TaxonomyNode, iter_taxonomies
 from app.taxonomy_es import refresh_synonyms
 from app.utils import connection, get_logger, load_class_object_from_string
-from app.utils.io import jsonl_iter
+from app.utils.io import jsonl_lines
+from app.warmup import warmup_new_index, warmup_new_taxonomy_index
 
 logger = get_logger(__name__)
 
+# key of taxonomy content hashes in the taxonomy index metadata
+TAXONOMY_HASHES_META = "taxonomy_hashes"
+# database of document content hashes, for differential imports
+CONTENT_HASHES_DB = "content_hashes.db"
+# number of lines sent at once to an import process, see send_lines
+LINES_BATCH_SIZE = 500
+# max number of batches of lines waiting to be processed, per import process
+PENDING_LINE_BATCHES = 4
+
 
 class BaseDocumentFetcher(abc.ABC):
     def __init__(self, config: IndexConfig) -> None:
@@ -224,6 +246,101 @@ def get_document_dict(
         return None
 
 
+class ContentHashes:
+    """Content hashes of the documents of an index,
+    used to skip unchanged documents in differential imports
+
+    Hashes are read from a SQLite database (see `save_content_hashes`),
+    so that import processes share them without copying them in memory,
+    and ids of documents found during import are appended to a file,
+    to find removed documents at the end of the import (see `gen_removed_ids`).
+
+    :param hashes_dir: the directory of the content hashes database
+    :param process_num: the number of the import process,
+      used to name the file of seen ids
+    """
+
+    def __init__(self, hashes_dir: Path, process_num: int = 0) -> None:
+        self.db = sqlite3.connect(
+            (hashes_dir / CONTENT_HASHES_DB).resolve().as_uri() + "?mode=ro",
+            uri=True,
+        )
+        # ids of documents found during import
+        self.seen_ids_path = hashes_dir / f"seen_ids_{process_num}.jsonl"
+        self.seen_ids_file = self.seen_ids_path.open("wb")
+
+    def unchanged(self, document_dict: JSONType) -> bool:
+        """Tell if a document (ready for bulk insert) is unchanged in the index"""
+        _id = document_dict["_id"]
+        self.seen_ids_file.write(orjson.dumps(_id) + b"\n")
+        content_hash = document_dict.get("_source", {}).get("content_hash")
+        if content_hash is None:
+            return False
+        row = self.db.execute(
+            "SELECT hash FROM content_hashes WHERE id = ?", (_id,)
+        ).fetchone()
+        return row is not None and row[0] == content_hash
+
+    def close(self) -> None:
+        self.seen_ids_file.close()
+        self.db.close()
+
+
+def save_content_hashes(
+    es_client: Elasticsearch, index_name: str, hashes_dir: Path
+) -> int:
+    """Save the content hash of every document of an index
+    in a SQLite database in hashes_dir
+
+    Documents indexed without content hash are associated to an empty string.
+
+    :return: the number of documents
+    """
+    db = sqlite3.connect(hashes_dir / CONTENT_HASHES_DB)
+    with closing(db):
+        with db:
+            db.execute(
+                "CREATE TABLE content_hashes "
+                "(id TEXT PRIMARY KEY, hash TEXT NOT NULL) WITHOUT ROWID"
+            )
+            db.executemany(
+                "INSERT INTO content_hashes VALUES (?, ?)",
+                (
+                    (hit["_id"], hit["_source"].get("content_hash", ""))
+                    for hit in scan(
+                        es_client,
+                        index=index_name,
+                        query={"_source": ["content_hash"]},
+                        size=5000,
+                    )
+                ),
+            )
+        return db.execute("SELECT count(*) FROM content_hashes").fetchone()[0]
+
+
+def gen_removed_ids(hashes_dir: Path, seen_ids_paths: Iterable[Path]) -> Iterator[str]:
+    """Generate ids of documents of the content hashes database
+    that were not found during import
+
+    :param hashes_dir: the directory of the content hashes database
+    :param seen_ids_paths: files of ids of documents found during import,
+      written by `ContentHashes`
+    """
+    db = sqlite3.connect(hashes_dir / CONTENT_HASHES_DB)
+    with closing(db):
+        db.execute("CREATE TEMP TABLE seen_ids (id TEXT PRIMARY KEY) WITHOUT ROWID")
+        for path in seen_ids_paths:
+            with path.open("rb") as f:
+                db.executemany(
+                    "INSERT OR IGNORE INTO seen_ids VALUES (?)",
+                    ((orjson.loads(line),) for line in f),
+                )
+        for (_id,) in db.execute(
+            "SELECT id FROM content_hashes WHERE id NOT IN (SELECT id FROM seen_ids)"
+        ):
+            yield _id
+
+
 def gen_documents(
     processor: DocumentProcessor,
     file_path: Path,
@@ -231,86 +348,310 @@ def gen_documents(
     num_items: int | None,
     num_processes: int,
     process_num: int,
+    metrics: ImportMetrics | None = None,
+    checkpoint: ImportCheckpoint | None = None,
+    content_hashes: ContentHashes | None = None,
+    lines: Iterable[tuple[int, bytes]] | None = None,
 ):
     """Generate documents to index for process number process_num
 
     We chunk documents based on document num % process_num
+
+    :param metrics: if provided, used to measure documents throughput
+      and time spent reading, parsing and transforming documents
+    :param checkpoint: if provided, lines up to the checkpoint line are skipped,
+      and the line of each generated document is added to pending lines
+    :param content_hashes: if provided, documents with the same content hash
+      are skipped
+    :param lines: if provided, the lines of the file with their line number,
+      instead of reading file_path (see `send_lines`)
     """
-    for i, row in enumerate(tqdm.tqdm(jsonl_iter(file_path))):
+    metrics = metrics or ImportMetrics(process_num)
+    start_line = checkpoint.line + 1 if checkpoint is not None else 0
+    if lines is None:
+        lines = enumerate(tqdm.tqdm(jsonl_lines(file_path)))
+    read_start = time.perf_counter()
+    for i, line in lines:
         if num_items is not None and i >= num_items:
             break
+        if i < start_line:
+            # already imported before the import was interrupted
+            continue
         # Only get the relevant
         if i % num_processes != process_num:
             continue
+        metrics.count("read")
+        metrics.add_time("read", time.perf_counter() - read_start)
+
+        with metrics.stage("parse"):
+            row = orjson.loads(line)
+        metrics.count("parsed")
+        with metrics.stage("transform"):
+            document_dict = get_document_dict(
+                processor,
+                FetcherResult(status=FetcherStatus.FOUND, document=row),
+                next_index,
+            )
+        if document_dict and content_hashes and content_hashes.unchanged(document_dict):
+            metrics.count("unchanged")
+        elif document_dict:
+            metrics.count("transformed")
+            if checkpoint is not None:
+                checkpoint.add_pending(i)
+            yield document_dict
+        else:
+            metrics.count("skipped")
+        read_start = time.perf_counter()
 
-        document_dict = get_document_dict(
-            processor,
-            FetcherResult(status=FetcherStatus.FOUND, document=row),
-            next_index,
-        )
-        if not document_dict:
-            continue
 
-        yield document_dict
+def send_lines(
+    file_path: Path,
+    num_items: int | None,
+    lines_queues: list[QueueType],
+    batch_size: int = LINES_BATCH_SIZE,
+) -> None:
+    """Read a JSONL file and send its lines to import processes
+
+    The file is read and decompressed once, line i is sent to the process
+    number i % num_processes, in batches of (line number, line) pairs.
+    None is sent to each process at the end of the file.
+
+    :param file_path: the JSONL file to read
+    :param num_items: max number of lines to send, default to no limit
+    :param lines_queues: the queue of each import process,
+      they should be bounded to limit memory usage
+    :param batch_size: number of lines sent at once to a process
+    """
+    num_processes = len(lines_queues)
+    batches: list[list[tuple[int, bytes]]] = [[] for _ in range(num_processes)]
+    for i, line in enumerate(tqdm.tqdm(jsonl_lines(file_path))):
+        if num_items is not None and i >= num_items:
+            break
+        process_num = i % num_processes
+        batches[process_num].append((i, line))
+        if len(batches[process_num]) >= batch_size:
+            lines_queues[process_num].put(batches[process_num])
+            batches[process_num] = []
+    for lines_queue, batch in zip(lines_queues, batches):
+        if batch:
+            lines_queue.put(batch)
+        lines_queue.put(None)
+
+
+class QueuedLines:
+    """Lines of the input file received by an import process
+    (see `send_lines`)
+
+    :param lines_queue: the queue of the import process
+    """
 
+    def __init__(self, lines_queue: QueueType) -> None:
+        self.lines_queue = lines_queue
+        self.done = False
 
-def gen_taxonomy_documents(
-    config: IndexConfig, next_index: str, supported_langs: set[str]
-):
-    """Generator for taxonomy documents in Elasticsearch.
+    def __iter__(self) -> Iterator[tuple[int, bytes]]:
+        while not self.done:
+            batch = self.lines_queue.get()
+            if batch is None:
+                self.done = True
+            else:
+                yield from batch
 
-    :param taxonomy_config: the taxonomy configuration
-    :param next_index: the index to write to
+    def drain(self) -> None:
+        """Discard remaining lines, so that the reader is not blocked
+        if the process stops early"""
+        for _ in self:
+            pass
+
+
+def taxonomy_entry(
+    taxonomy_name: str, node: TaxonomyNode, supported_langs: set[str]
+) -> JSONType:
+    """Compute the entry stored in the taxonomy index for a taxonomy node.
+
+    This is also used by the in-memory autocomplete engine,
+    so that both give the same names, synonyms and weights.
+
+    :param taxonomy_name: the name of the taxonomy
+    :param node: the (preprocessed) taxonomy node
     :param supported_langs: a set of supported languages
-    :yield: a dict with the document to index, compatible with ES bulk API
+    :return: a dict with id, taxonomy_name, name and synonyms
+    """
+    names = {
+        lang: lang_name
+        for lang, lang_name in node.names.items()
+        if lang in supported_langs and lang_name
+    }
+    synonyms: dict[str, set[str]] = {
+        lang: set(node.synonyms.get(lang) or [])
+        for lang in node.synonyms
+        if lang in supported_langs
+    }
+    for lang, lang_name in names.items():
+        if lang_name:
+            synonyms.setdefault(lang, set()).add(lang_name)
+    # put the name as first synonym and order  by length
+    synonyms_list: dict[str, list[str]] = {}
+    for lang, lang_synonyms in synonyms.items():
+        filtered_synonyms = filter(lambda s: s, lang_synonyms)
+        synonyms_list[lang] = sorted(
+            filtered_synonyms, key=lambda s: 0 if s == names.get(lang) else len(s)
+        )
+    return {
+        "id": node.id,
+        "taxonomy_name": taxonomy_name,
+        "name": names,
+        "synonyms": {
+            lang: {
+                "input": lang_synonyms,
+                "weight": max(100 - len(node.id), 0),
+            }
+            for lang, lang_synonyms in synonyms_list.items()
+        },
+    }
+
+
+def iter_taxonomy_entries(
+    config: IndexConfig, taxonomies: Iterable[Taxonomy], supported_langs: set[str]
+) -> Iterator[JSONType]:
+    """Iterate over the entries of taxonomies, after preprocessing.
+
+    :param config: the index configuration
+    :param taxonomies: the taxonomies to iterate on
+    :param supported_langs: a set of supported languages
+    :yield: entries, as computed by :py:func:`taxonomy_entry`
     """
     taxonomy_config = config.taxonomy
     preprocessor: BaseTaxonomyPreprocessor | None = None
     if taxonomy_config.preprocessor:
         preprocessor_cls = load_class_object_from_string(taxonomy_config.preprocessor)
         preprocessor = preprocessor_cls(config)
-    for taxonomy in tqdm.tqdm(iter_taxonomies(taxonomy_config)):
+    for taxonomy in taxonomies:
         for node in taxonomy.iter_nodes():
             if preprocessor:
                 result = preprocessor.preprocess(taxonomy, node)
                 if result.status != FetcherStatus.FOUND or result.node is None:
                     continue  # skip this entry
                 node = result.node
-            names = {
-                lang: lang_name
-                for lang, lang_name in node.names.items()
-                if lang in supported_langs and lang_name
-            }
-            synonyms: dict[str, set[str]] = {
-                lang: set(node.synonyms.get(lang) or [])
-                for lang in node.synonyms
-                if lang in supported_langs
-            }
-            for lang, lang_name in names.items():
-                if lang_name:
-                    synonyms.setdefault(lang, set()).add(lang_name)
-            # put the name as first synonym and order  by length
-            synonyms_list: dict[str, list[str]] = {}
-            for lang, lang_synonyms in synonyms.items():
-                filtered_synonyms = filter(lambda s: s, lang_synonyms)
-                synonyms_list[lang] = sorted(
-                    filtered_synonyms, key=lambda s: 0 if s == names[lang] else len(s)
-                )
+            yield taxonomy_entry(taxonomy.name, node, supported_langs)
+
+
+def taxonomy_entry_id(entry: JSONType) -> str:
+    """Id of a taxonomy entry in the taxonomy index
+
+    It is deterministic, so that entries can be updated in place.
+    """
+    return f"{entry['taxonomy_name']}:{entry['id']}"
+
+
+def _hash_entry(hasher, entry: JSONType) -> None:
+    hasher.update(orjson.dumps(entry, option=orjson.OPT_SORT_KEYS))
+
+
+def taxonomy_hash(entries: Iterable[JSONType]) -> str:
+    """Content hash of a taxonomy, computed from its entries"""
+    hasher = hashlib.blake2b(digest_size=16)
+    for entry in entries:
+        _hash_entry(hasher, entry)
+    return hasher.hexdigest()
+
+
+def gen_taxonomy_documents(
+    config: IndexConfig,
+    next_index: str,
+    supported_langs: set[str],
+    hashes: dict[str, str] | None = None,
+):
+    """Generator for taxonomy documents in Elasticsearch.
+
+    :param taxonomy_config: the taxonomy configuration
+    :param next_index: the index to write to
+    :param supported_langs: a set of supported languages
+    :param hashes: if provided, filled with the content hash of each taxonomy
+      (see :py:func:`taxonomy_hash`)
+    :yield: a dict with the document to index, compatible with ES bulk API
+    """
+    taxonomies = tqdm.tqdm(iter_taxonomies(config.taxonomy))
+    entries = iter_taxonomy_entries(config, taxonomies, supported_langs)
+    for taxonomy_name, taxonomy_entries in groupby(
+        entries, key=itemgetter("taxonomy_name")
+    ):
+        hasher = hashlib.blake2b(digest_size=16)
+        for entry in taxonomy_entries:
+            _hash_entry(hasher, entry)
             yield {
                 "_index": next_index,
-                "_source": {
-                    "id": node.id,
-                    "taxonomy_name": taxonomy.name,
-                    "name": names,
-                    "synonyms": {
-                        lang: {
-                            "input": lang_synonyms,
-                            "weight": max(100 - len(node.id), 0),
-                        }
-                        for lang, lang_synonyms in synonyms_list.items()
-                    },
-                },
+                "_id": taxonomy_entry_id(entry),
+                "_source": entry,
             }
+        if hashes is not None:
+            hashes[taxonomy_name] = hasher.hexdigest()
+
+
+def gen_taxonomy_entries_diff(
+    es_client: Elasticsearch,
+    index_name: str,
+    taxonomy_name: str,
+    entries: Iterable[JSONType],
+) -> Iterator[JSONType]:
+    """Generate bulk actions to update the entries of a taxonomy in an index
+
+    Only entries that changed are indexed,
+    and entries that do not exist anymore are deleted.
+
+    :param index_name: the taxonomy index
+    :param taxonomy_name: the name of the taxonomy
+    :param entries: the new entries of the taxonomy
+    """
+    existing = {
+        hit["_id"]: hit["_source"]
+        for hit in scan(
+            es_client,
+            index=index_name,
+            query={"query": {"term": {"taxonomy_name": taxonomy_name}}},
+            size=5000,
+        )
+    }
+    for entry in entries:
+        _id = taxonomy_entry_id(entry)
+        if existing.pop(_id, None) != entry:
+            yield {"_index": index_name, "_id": _id, "_source": entry}
+    for _id in existing:
+        yield {"_op_type": "delete", "_index": index_name, "_id": _id}
+
+
+def gen_taxonomy_updates(
+    es_client: Elasticsearch,
+    config: IndexConfig,
+    index_name: str,
+    previous_hashes: dict[str, str],
+    hashes: dict[str, str],
+) -> Iterator[JSONType]:
+    """Generate bulk actions to update taxonomies that changed in an index
+
+    Taxonomies are downloaded again if a newer version is available,
+    those whose content hash did not change are skipped.
+
+    :param index_name: the taxonomy index
+    :param previous_hashes: the content hash of each indexed taxonomy
+    :param hashes: filled with the content hash of each taxonomy
+    """
+    taxonomies = iter_taxonomies(config.taxonomy, download_newer=True)
+    entries = iter_taxonomy_entries(config, taxonomies, set(config.supported_langs))
+    for taxonomy_name, group in groupby(entries, key=itemgetter("taxonomy_name")):
+        taxonomy_entries = list(group)
+        hashes[taxonomy_name] = taxonomy_hash(taxonomy_entries)
+        if previous_hashes.get(taxonomy_name) == hashes[taxonomy_name]:
+            logger.info("Taxonomy %s is unchanged", taxonomy_name)
+            continue
+        logger.info("Updating taxonomy %s", taxonomy_name)
+        yield from gen_taxonomy_entries_diff(
+            es_client, index_name, taxonomy_name, taxonomy_entries
+        )
+    # taxonomies that are not in the configuration anymore
+    for taxonomy_name in previous_hashes.keys() - hashes.keys():
+        logger.info("Removing taxonomy %s", taxonomy_name)
+        yield from gen_taxonomy_entries_diff(es_client, index_name, taxonomy_name, [])
 
 
 def update_alias(es_client: Elasticsearch, next_index: str, index_alias: str):
@@ -342,6 +683,69 @@ def get_alias(es_client: Elasticsearch, index_name: str):
     return resp[0]
 
 
+def get_index_meta(
+    es_client: Elasticsearch, index_alias: str
+) -> tuple[str, JSONType] | None:
+    """Get the index pointed by an alias, and the metadata (`_meta`) of its mapping
+
+    :return: None if the alias does not exist
+    """
+    try:
+        resp = es_client.indices.get(
+            index=index_alias, filter_path=["*.aliases", "*.mappings._meta"]
+        )
+    except elasticsearch.NotFoundError:
+        return None
+    for index_name, data in resp.items():
+        return index_name, data.get("mappings", {}).get("_meta", {})
+    return None
+
+
+def set_taxonomy_hashes(
+    es_client: Elasticsearch, index_name: str, hashes: dict[str, str]
+) -> None:
+    """Store the content hash of each taxonomy in the taxonomy index metadata
+
+    The update date is also stored, see :py:func:`app.autocomplete.taxonomy_generation`
+    """
+    es_client.indices.put_mapping(
+        index=index_name,
+        meta={
+            TAXONOMY_HASHES_META: hashes,
+            "updated": datetime.now().isoformat(),
+        },
+    )
+
+
+# limits concurrent bulk requests across import processes,
+# see init_import_process
+_BULK_SEMAPHORE: SemaphoreType | None = None
+# directory of the content hashes database, for differential imports
+_CONTENT_HASHES_DIR: Path | None = None
+# queues of lines of the input file, by process number, see send_lines
+_LINES_QUEUES: list[QueueType] | None = None
+
+
+def init_import_process(
+    bulk_semaphore: SemaphoreType | None,
+    content_hashes_dir: Path | None = None,
+    lines_queues: list[QueueType] | None = None,
+) -> None:
+    """Initialize an import process
+
+    :param bulk_semaphore: semaphore shared by import processes,
+      acquired during bulk requests
+    :param content_hashes_dir: for differential imports, the directory
+      of the content hashes database (see `save_content_hashes`)
+    :param lines_queues: if provided, the queues import processes
+      receive lines from, instead of reading the file
+    """
+    global _BULK_SEMAPHORE, _CONTENT_HASHES_DIR, _LINES_QUEUES
+    _BULK_SEMAPHORE = bulk_semaphore
+    _CONTENT_HASHES_DIR = content_hashes_dir
+    _LINES_QUEUES = lines_queues
+
+
 def import_parallel(
     config: IndexConfig,
     file_path: Path,
@@ -349,6 +753,8 @@ def import_parallel(
     num_items: int | None,
     num_processes: int,
     process_num: int,
+    resume: bool = False,
+    checkpoints: bool = True,
 ):
     """One task of import.
 
@@ -358,36 +764,98 @@ def import_parallel(
     :param int num_processes: total number of processes
     :param int process_num: the index of the process
         (from 0 to num_processes - 1)
+    :param bool resume: if True, continue after the last saved checkpoint
+    :param bool checkpoints: if True, save progress to be able to resume,
+      this is only possible when importing in a new index
+    :return: the process number, the number of indexed documents,
+      the errors, the metrics of the process (see `ImportMetrics.to_dict`),
+      and for differential imports, the file of ids of documents found
     """
-    processor = DocumentProcessor(config)
-    # open a connection for this process
-    es = connection.get_es_client(request_timeout=120, retry_on_timeout=True)
-    # Note that bulk works better than parallel bulk for our usecase.
-    # The preprocessing in this file is non-trivial, so it's better to
-    # parallelize that. If we then do parallel_bulk here, this causes queueing
-    # and a lot of memory usage in the importer process.
-    success, errors = bulk(
-        es,
-        gen_documents(
-            processor,
-            file_path,
-            next_index,
-            num_items,
-            num_processes,
-            process_num,
-        ),
-        raise_on_error=False,
+    # lines are received from the reader when importing with several processes
+    lines = (
+        QueuedLines(_LINES_QUEUES[process_num]) if _LINES_QUEUES is not None else None
+    )
+    try:
+        processor = DocumentProcessor(config)
+        metrics = ImportMetrics(process_num)
+        content_hashes = (
+            ContentHashes(_CONTENT_HASHES_DIR, process_num)
+            if _CONTENT_HASHES_DIR is not None
+            else None
+        )
+        checkpoint = (
+            ImportCheckpoint(next_index, file_path, num_processes, process_num)
+            if checkpoints
+            else None
+        )
+        if checkpoint is not None and resume:
+            # continue from where a previous run stopped
+            checkpoint.load()
+            if checkpoint.done:
+                logger.info("[%d] Already done in a previous run", process_num)
+                return process_num, 0, [], metrics.to_dict(), None
+            if checkpoint.line >= 0:
+                logger.info("[%d] Resuming after line %d", process_num, checkpoint.line)
+        # open a connection for this process
+        es = connection.get_es_client(request_timeout=120, retry_on_timeout=True)
+        # The preprocessing in this file is non-trivial, so it's parallelized
+        # between processes. In each process, documents are transformed
+        # while sender threads send previous chunks, with a bounded number
+        # of pending chunks to limit memory usage.
+        writer = BulkWriter(
+            es,
+            metrics,
+            semaphore=_BULK_SEMAPHORE,
+            senders=settings.import_bulk_senders,
+        )
+        success, errors = writer.write(
+            gen_documents(
+                processor,
+                file_path,
+                next_index,
+                num_items,
+                num_processes,
+                process_num,
+                metrics,
+                checkpoint,
+                content_hashes,
+                lines,
+            ),
+            on_chunk_sent=checkpoint.chunk_sent if checkpoint is not None else None,
+        )
+        if checkpoint is not None:
+            checkpoint.finish()
+        metrics.stop()
+        seen_ids_path = None
+        if content_hashes is not None:
+            content_hashes.close()
+            seen_ids_path = content_hashes.seen_ids_path
+        return process_num, success, errors, metrics.to_dict(), seen_ids_path
+    finally:
+        if lines is not None:
+            lines.drain()
+
+
+def delete_documents(es_client: Elasticsearch, index_name: str, ids: Iterable[str]):
+    """Delete documents from an index
+
+    :return: the number of deleted documents and the errors
+    """
+    return BulkWriter(es_client).write(
+        {"_op_type": "delete", "_index": index_name, "_id": _id} for _id in ids
     )
-    return process_num, success, errors
 
 
-def import_taxonomies(config: IndexConfig, next_index: str):
+def import_taxonomies(
+    config: IndexConfig, next_index: str, hashes: dict[str, str] | None = None
+):
     """Import taxonomies into Elasticsearch.
 
     A single taxonomy index is used to store all taxonomy items.
 
     :param config: the index configuration to use
     :param next_index: the index to write to
+    :param hashes: if provided, filled with the content hash of each taxonomy
     """
     es = connection.current_es_client()
     # Note that bulk works better than parallel bulk for our usecase.
@@ -395,17 +863,63 @@ def import_taxonomies(config: IndexConfig, next_index: str):
     # parallelize that. If we then do parallel_bulk
     # here, this causes queueing and a lot of memory usage in the importer
     # process.
-    success, errors = bulk(
-        es,
+    success, errors = BulkWriter(es).write(
         gen_taxonomy_documents(
-            config, next_index, supported_langs=set(config.supported_langs)
+            config,
+            next_index,
+            supported_langs=set(config.supported_langs),
+            hashes=hashes,
         ),
-        raise_on_error=False,
     )
     if not success:
         logger.error("Encountered errors: %s", errors)
 
 
+def failed_taxonomies(errors: list[JSONType]) -> set[str]:
+    """Names of taxonomies with entries in bulk errors
+
+    :param errors: errors returned by `BulkWriter.write`
+    """
+    return {
+        result["_id"].split(":", 1)[0]
+        for error in errors
+        for result in error.values()
+        if "_id" in result
+    }
+
+
+def update_taxonomies(
+    es_client: Elasticsearch,
+    config: IndexConfig,
+    index_name: str,
+    previous_hashes: dict[str, str],
+) -> None:
+    """Update taxonomies that changed in the current taxonomy index
+
+    :param index_name: the taxonomy index
+    :param previous_hashes: the content hash of each indexed taxonomy
+    """
+    hashes: dict[str, str] = {}
+    success, errors = BulkWriter(es_client).write(
+        gen_taxonomy_updates(es_client, config, index_name, previous_hashes, hashes)
+    )
+    if errors:
+        logger.error("Encountered %d errors: %s", len(errors), errors)
+        # keep the previous hash of taxonomies that were not fully updated,
+        # so that they are updated again next time
+        for taxonomy_name in failed_taxonomies(errors):
+            if taxonomy_name in previous_hashes:
+                hashes[taxonomy_name] = previous_hashes[taxonomy_name]
+            else:
+                hashes.pop(taxonomy_name, None)
+    if hashes == previous_hashes:
+        logger.info("Taxonomies are unchanged")
+        return
+    logger.info("Updated %d taxonomy entries", success)
+    es_client.indices.refresh(index=index_name)
+    set_taxonomy_hashes(es_client, index_name, hashes)
+
+
 def get_redis_products(
     stream_name: str,
     processor: DocumentProcessor,
@@ -496,6 +1010,9 @@ def run_items_import(
     num_items: int | None = None,
     skip_updates: bool = False,
     partial: bool = False,
+    resume_index: str | None = None,
+    differential: bool = False,
+    index_id: str | None = None,
 ):
     """Run a full data import from a JSONL.
 
@@ -503,7 +1020,8 @@ def run_items_import(
     We then read from the Redis stream containing information about updated
     documents, fetch the full document and index it in Elasticsearch. The
     import is done in parallel using multiple processes. Once the import is
-    finished, the alias is updated to point to the new index.
+    finished, the new index is warmed up (see :py:mod:`app.warmup`),
+    and the alias is updated to point to it.
 
     :param file_path: the path of the JSONL file to import
     :param num_processes: the number of processes to use to perform parallel
@@ -514,10 +1032,28 @@ def run_items_import(
     :param partial: (exclusive with `skip_updates`),
       if True consider we don't have a full import,
       and directly updates items in current index.
+    :param resume_index: (exclusive with `partial`),
+      the temporary index of an interrupted import to resume.
+      The import must be run with the same file and number of processes,
+      each process continues after its last checkpoint.
+    :param differential: (requires `partial`), if True only documents
+      whose content changed are sent to Elasticsearch,
+      and documents that are not in the file are removed from the index.
+    :param index_id: the id of the index in configuration,
+      needed to warm up the new index
     """
+    if differential and not partial:
+        raise ValueError("A differential import must be a partial import")
     # we need a large timeout as index creation can take a while because of synonyms
     es_client = connection.get_es_client(request_timeout=600)
-    if not partial:
+    if resume_index is not None:
+        if partial:
+            raise ValueError("Can't resume a partial import")
+        if not es_client.indices.exists(index=resume_index):
+            raise ValueError(f"Index {resume_index} does not exist, can't resume")
+        logger.info("Resuming import in index %s", resume_index)
+        next_index = resume_index
+    elif not partial:
         # we create a temporary index to import to
         # at the end we will change alias to point to it
         index_date = datetime.now().strftime("%Y-%m-%d-%H-%M-%S-%f")
@@ -539,6 +1075,7 @@ def run_items_import(
         # use current index
         next_index = config.index.name
 
+    start = time.perf_counter()
     # split the work between processes
     args = []
     for i in range(num_processes):
@@ -550,43 +1087,123 @@ def run_items_import(
                 num_items,
                 num_processes,
                 i,
+                resume_index is not None,
+                # partial imports can't be resumed
+                not partial,
             )
         )
     # run in parallel
     num_errors = 0
-    with Pool(num_processes) as pool:
+    workers_metrics = []
+    bulk_semaphore = (
+        Semaphore(settings.import_bulk_concurrency)
+        if settings.import_bulk_concurrency
+        else None
+    )
+    seen_ids_paths: list[Path] = []
+    deleted = 0
+    with ExitStack() as stack:
+        content_hashes_dir = None
+        if differential:
+            # hashes are shared with import processes through a file,
+            # to avoid copying them in each process
+            content_hashes_dir = Path(
+                stack.enter_context(TemporaryDirectory(prefix="content-hashes-"))
+            )
+            num_hashes = save_content_hashes(es_client, next_index, content_hashes_dir)
+            logger.info("Fetched content hash of %d documents", num_hashes)
         if num_processes > 1:
             logger.info("Running in parallel with %d processes", num_processes)
-            result_iter = iter(pool.starmap(import_parallel, args))
+            # the file is read once here, and lines are sent to processes
+            # through bounded queues
+            lines_queues: list[QueueType] = [
+                Queue(PENDING_LINE_BATCHES) for _ in range(num_processes)
+            ]
+            pool = stack.enter_context(
+                Pool(
+                    num_processes,
+                    initializer=init_import_process,
+                    initargs=(bulk_semaphore, content_hashes_dir, lines_queues),
+                )
+            )
+            async_result = pool.starmap_async(import_parallel, args)
+            send_lines(file_path, num_items, lines_queues)
+            result_iter = iter(async_result.get())
         else:
             # run sequentially, it's easier to debug if we need it
-            # we won't use the pool in this case
-            logger.info("Running in a single processes")
+            logger.info("Running in a single process")
+            init_import_process(bulk_semaphore, content_hashes_dir)
+            # reset the state of the sequential run
+            stack.callback(init_import_process, None)
             result_iter = iter(map(lambda a: import_parallel(*a), args))
-        for i, success, errors in result_iter:
+        for i, success, errors, worker_metrics, seen_ids_path in result_iter:
             # Note: we log here instead of in sub-process because
             # it's easier to avoid mixing logs, and it works better for pytest
             logger.info("[%d] Indexed %d documents", i, success)
             if errors:
                 logger.error("[%d] Encountered %d errors: %s", i, len(errors), errors)
                 num_errors += len(errors)
+            workers_metrics.append(worker_metrics)
+            if seen_ids_path is not None:
+                seen_ids_paths.append(seen_ids_path)
+        if content_hashes_dir is not None:
+            if num_items is None:
+                # remove documents that are not in the file anymore
+                deleted, errors = delete_documents(
+                    es_client,
+                    next_index,
+                    gen_removed_ids(content_hashes_dir, seen_ids_paths),
+                )
+                logger.info("Deleted %d documents", deleted)
+                if errors:
+                    logger.error("Encountered %d errors: %s", len(errors), errors)
+                    num_errors += len(errors)
+            else:
+                logger.info("Not deleting documents, as we only imported some items")
     # update with last index updates (hopefully since the jsonl)
     if not skip_updates:
         num_errors += get_redis_updates(es_client, next_index, config)
     # wait for index refresh
     es_client.indices.refresh(index=next_index)
     if not partial:
+        if index_id is not None:
+            warmup_new_index(es_client, next_index, index_id, config)
         # make alias point to new index
         update_alias(es_client, next_index, config.index.name)
+    if not partial:
+        remove_checkpoints(next_index, num_processes)
+    report = import_report(
+        next_index,
+        time.perf_counter() - start,
+        workers_metrics,
+        file_path=str(file_path),
+        num_processes=num_processes,
+        num_errors=num_errors,
+        num_deleted=deleted,
+    )
+    report_path = write_import_report(report)
+    logger.info(
+        "Import rates (docs/s): %s, report written to %s", report["rates"], report_path
+    )
     return num_errors
 
 
-def perform_taxonomy_import(config: IndexConfig) -> None:
+def perform_taxonomy_import(config: IndexConfig, incremental: bool = False) -> None:
     """Create a new index for taxonomies and import them.
 
     :param config: the index configuration to use
+    :param incremental: if True, only taxonomies that changed
+      are updated, in the current index (see :py:func:`update_taxonomies`).
+      A new index is created if the current one has no taxonomy hashes.
     """
     es_client = connection.get_es_client()
+    if incremental:
+        current = get_index_meta(es_client, config.taxonomy.index.name)
+        if current is not None and TAXONOMY_HASHES_META in current[1]:
+            index_name, meta = current
+            update_taxonomies(es_client, config, index_name, meta[TAXONOMY_HASHES_META])
+            return
+        logger.info("No taxonomy hashes in current index, importing to a new index")
     # we create a temporary index to import to
     # at the end we will change alias to point to it
     index_date = datetime.now().strftime("%Y-%m-%d-%H-%M-%S-%f")
@@ -596,9 +1213,12 @@ def perform_taxonomy_import(config: IndexConfig) -> None:
     # create the index
     index.save()
 
-    import_taxonomies(config, next_index)
+    hashes: dict[str, str] = {}
+    import_taxonomies(config, next_index, hashes)
+    set_taxonomy_hashes(es_client, next_index, hashes)
     # wait for index refresh
     es_client.indices.refresh(index=next_index)
+    warmup_new_taxonomy_index(es_client, next_index, config)
 
     # make alias point to new index
     update_alias(es_client, next_index, config.taxonomy.index.name)
@@ -6,7 +6,7 @@ from typing import Annotated, Any, Literal, Optional, Tuple, Union, cast
 import elasticsearch_dsl.query
 import luqum.tree
 from fastapi import Query
-from pydantic import BaseModel, ConfigDict, field_validator, model_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 from . import config
 from .utils import str_utils
@@ -36,7 +36,52 @@ class ScatterChart(BaseModel):
     y: str
 
 
-ChartType = Union[DistributionChart, ScatterChart]
+class HistogramChart(BaseModel):
+    """Describes an entry for an histogram on a numeric field.
+
+    Buckets are computed by Elasticsearch on all matching documents.
+    """
+
+    chart_type: Literal["HistogramChart"] = "HistogramChart"
+    field: str
+    interval: Annotated[float | None, Field(gt=0)] = None
+    """Width of buckets, if None, buckets widths adapt to values distribution"""
+
+    buckets: Annotated[int, Field(ge=1)] = 20
+    """Number of buckets, only used if interval is None"""
+
+    @property
+    def name(self) -> str:
+        """Name of the chart, also used for the aggregation"""
+        return f"histogram:{self.field}"
+
+
+class StatsChart(BaseModel):
+    """Describes an entry for statistics (min, max, average and percentiles)
+    on a numeric field, displayed as a box plot.
+
+    Statistics are computed by Elasticsearch on all matching documents.
+    """
+
+    chart_type: Literal["StatsChart"] = "StatsChart"
+    field: str
+
+    @property
+    def name(self) -> str:
+        """Name of the chart, also used for the aggregation"""
+        return f"stats:{self.field}"
+
+
+NumericChartType = Union[HistogramChart, StatsChart]
+
+#: prefixes used to request numeric charts in GET requests
+#: (eg. `histogram:nutriscore_score`)
+NUMERIC_CHARTS_PREFIXES: dict[str, type[NumericChartType]] = {
+    "histogram": HistogramChart,
+    "stats": StatsChart,
+}
+
+ChartType = Union[DistributionChart, ScatterChart, HistogramChart, StatsChart]
 
 
 class FacetItem(BaseModel):
@@ -79,12 +124,15 @@ class DebugInfo(StrEnum):
     aggregations = "aggregations"
     lucene_query = "lucene_query"
     es_query = "es_query"
+    timings = "timings"
 
 
 class SearchResponseDebug(BaseModel):
     lucene_query: str | None = None
     es_query: JSONType | None = None
     aggregations: JSONType | None = None
+    # time spent in each stage of the search, in milliseconds
+    timings: dict[str, float] | None = None
 
 
 class SearchResponseError(BaseModel):
@@ -395,15 +443,35 @@ class AggregateSearchParameters(BaseModel):
         Query(
             description=cd_(
                 """Name of vega representations to return in the response.
-                Can be distribution chart or scatter plot.
+                Can be distribution chart, scatter plot, histogram or statistics.
 
                 If you pass a simple string, it will be interpreted as a distribution chart,
                 or a scatter plot if it is two fields separated by a column (x_axis_field:y_axis_field).
+
+                Histograms and statistics (box plot) on numeric fields
+                are requested using a `histogram:` or `stats:` prefix
+                (eg. `histogram:nutriscore_score`).
+                Using POST, you can also specify the `interval` (or number of `buckets`)
+                of an histogram.
                 """
             )
         ),
     ] = None
 
+    charts_data_only: Annotated[
+        bool,
+        Query(
+            description=cd_(
+                """If true, only the `data` section of vega charts is returned.
+
+                As charts specifications do not depend on the search,
+                they can be fetched once from the `/charts/spec` endpoint,
+                and data injected in them.
+                """
+            )
+        ),
+    ] = False
+
     @model_validator(mode="after")
     def check_facets_are_valid(self):
         """Check that the facets names are valid."""
@@ -417,30 +485,52 @@ class AggregateSearchParameters(BaseModel):
         """Check that the graph names are valid."""
         if self.charts is None:
             return self
-        errors = check_all_values_are_fields_agg(
-            self.index_id,
-            [
+        errors = check_charts_fields(self.index_id, self.charts)
+        if errors:
+            raise ValueError(errors)
+        return self
+
+
+def check_charts_fields(index_id: str | None, charts: list[ChartType]) -> list[str]:
+    """Check that charts fields are valid for their type of chart"""
+    errors = check_all_values_are_fields_agg(
+        index_id,
+        [chart.field for chart in charts if chart.chart_type == "DistributionChart"],
+    )
+
+    errors.extend(
+        check_fields_are_numeric(
+            index_id,
+            [chart.x for chart in charts if chart.chart_type == "ScatterChart"]
+            + [chart.y for chart in charts if chart.chart_type == "ScatterChart"]
+            + [
                 chart.field
-                for chart in self.charts
-                if chart.chart_type == "DistributionChart"
+                for chart in charts
+                if isinstance(chart, (HistogramChart, StatsChart))
             ],
         )
+    )
+    return errors
 
-        errors.extend(
-            check_fields_are_numeric(
-                self.index_id,
-                [chart.x for chart in self.charts if chart.chart_type == "ScatterChart"]
-                + [
-                    chart.y
-                    for chart in self.charts
-                    if chart.chart_type == "ScatterChart"
-                ],
-            )
-        )
 
-        if errors:
-            raise ValueError(errors)
-        return self
+def charts_from_str(charts: str) -> list[ChartType]:
+    """Parse charts as given in GET parameters
+
+    They are 'field' or 'xfield:yfield'
+    separated by ',' for Distribution and Scatter charts,
+    'histogram:field' or 'stats:field' for numeric charts.
+    """
+    parsed_charts: list[ChartType] = []
+    for c in charts.split(","):
+        if ":" in c:
+            [x, y] = c.split(":")
+            if x in NUMERIC_CHARTS_PREFIXES:
+                parsed_charts.append(NUMERIC_CHARTS_PREFIXES[x](field=y))
+            else:
+                parsed_charts.append(ScatterChart(x=x, y=y))
+        else:
+            parsed_charts.append(DistributionChart(field=c))
+    return parsed_charts
 
 
 def _prepare_str_list(item: Any) -> str | None:
@@ -498,20 +588,14 @@ class GetSearchParameters(SearchParameters):
     ) -> list[ChartType] | None:
         """
         Parse for get params are 'field' or 'xfield:yfield'
-        separated by ',' for Distribution and Scatter charts.
+        separated by ',' for Distribution and Scatter charts,
+        'histogram:field' or 'stats:field' for numeric charts.
 
         Directly the dictionnaries in POST request
         """
         str_charts = _prepare_str_list(charts)
         if str_charts:
-            parsed_charts: list[DistributionChart | ScatterChart] = []
-            charts_list = str_charts.split(",")
-            for c in charts_list:
-                if ":" in c:
-                    [x, y] = c.split(":")
-                    parsed_charts.append(ScatterChart(x=x, y=y))
-                else:
-                    parsed_charts.append(DistributionChart(field=c))
+            parsed_charts = charts_from_str(str_charts)
         if parsed_charts is not None:
             # we already know because of code logic that charts is the right type
             # but we need to cast for mypy type checking
@@ -1,28 +1,52 @@
+import hashlib
 import json
+import time
+from contextlib import asynccontextmanager
+from inspect import cleandoc as cd_
 from pathlib import Path
 from typing import Annotated, Any, cast
 
 import elasticsearch
+import orjson
 import starlette.status as status
-from elasticsearch_dsl import Search
 from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 
 import app.search as app_search
-from app import config
+from app import config, metrics
 from app._types import (
+    ChartsInfos,
     CommonParametersQuery,
     GetSearchParameters,
     PostSearchParameters,
     SearchResponse,
     SuccessSearchResponse,
     ErrorSearchResponse,
+    charts_from_str,
+    check_charts_fields,
 )
-from app.config import settings
-from app.postprocessing import process_taxonomy_completion_response
+from app.autocomplete import (
+    CompletionCacheKey,
+    can_complete_in_memory,
+    completion_cache,
+    completion_normalizer,
+    es_completion_result,
+    get_completion_engine,
+    normalize_completion_input,
+    start_completion_engines,
+    taxonomy_generation,
+)
+from app.charts import build_charts_templates
+from app.config import AutocompleteEngine, settings
 from app.query import build_completion_query
+from app.taxonomy import (
+    get_preloaded_taxonomy,
+    start_taxonomies_preload,
+    taxonomy_entry_result,
+)
 from app.utils import connection, get_logger, init_sentry
 from app.validations import check_index_id_is_defined
 
@@ -40,6 +64,23 @@ See the [project](https://github.com/openfoodfacts/search-a-licious/) for more i
 """
 
 
+def start_taxonomies_preloads(global_config: config.Config) -> None:
+    """Start loading taxonomies of all indices, for the taxonomy entry endpoint"""
+    for index_id, index_config in global_config.indices.items():
+        start_taxonomies_preload(
+            index_id, index_config.taxonomy, taxonomy_generation(index_id, index_config)
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start building in-memory autocomplete engines, if any,
+    and loading taxonomies, so that they are ready for the first requests"""
+    await run_in_threadpool(start_completion_engines, config.get_config())
+    await run_in_threadpool(start_taxonomies_preloads, config.get_config())
+    yield
+
+
 app = FastAPI(
     title="search-a-licious API",
     contact={
@@ -52,6 +93,7 @@ app = FastAPI(
         "url": "https://www.gnu.org/licenses/agpl-3.0.en.html",
     },
     description=API_DESCRIPTION,
+    lifespan=lifespan,
 )
 app.add_middleware(
     CORSMiddleware,
@@ -61,6 +103,32 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
+
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """Measure request durations, and report search stages timings"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    end = time.perf_counter()
+    # use route path, to avoid one series per document id or unknown url
+    route = request.scope.get("route")
+    endpoint = getattr(route, "path", "unmatched")
+    metrics.REQUEST_DURATION.observe(
+        end - start,
+        endpoint=endpoint,
+        method=request.method,
+        status=str(response.status_code),
+    )
+    timer = getattr(request.state, "stage_timer", None)
+    if timer is not None and timer.end is not None:
+        # the response was serialized after the search function returned
+        timer.add("serialization", end - timer.end)
+        timer.add("total", end - start)
+        timer.observe(endpoint=endpoint)
+    return response
+
+
 templates = Jinja2Templates(directory=Path(__file__).parent / "templates")
 init_sentry(settings.sentry_dns)
 connection.get_es_client()
@@ -78,27 +146,88 @@ def get_document(
     identifier: str,
     index_id: Annotated[str | None, CommonParametersQuery.index_id] = None,
 ):
-    """Fetch a document from Elasticsearch with specific ID."""
+    """Fetch a document from Elasticsearch with specific ID.
+
+    The ID is the value of the `id_field_name` field,
+    which is also the document ID in Elasticsearch,
+    so we use a (realtime) GET on the document.
+    """
     global_config = config.get_config()
     check_index_id_is_defined_or_400(index_id, global_config)
     index_id, index_config = global_config.get_index_config(index_id)
 
-    id_field_name = index_config.index.id_field_name
-    results = (
-        Search(index=index_config.index.name)
-        .query("term", **{id_field_name: identifier})
-        .extra(size=1)
-        .execute()
-    )
-    results_dict = [r.to_dict() for r in results]
-
-    if not results_dict:
+    result_processor = app_search.get_result_processor(index_id)
+    es = connection.current_es_client()
+    try:
+        result = es.get(
+            index=index_config.index.name,
+            id=identifier,
+            source_excludes=result_processor.internal_fields or None,
+        )
+    except elasticsearch.NotFoundError:
         raise HTTPException(status_code=404, detail="code not found")
 
-    product = results_dict[0]
+    product = result["_source"]
     return product
 
 
+MAX_DOCUMENTS_IDS = 100
+
+
+@app.get("/documents")
+def get_documents(
+    ids: Annotated[
+        str,
+        Query(
+            description=f"""Comma separated list of documents IDs
+            (values of the `id_field_name` field), at most {MAX_DOCUMENTS_IDS}."""
+        ),
+    ],
+    fields: Annotated[
+        str | None,
+        Query(
+            description="""Comma separated list of fields to return,
+            defaults to all fields.
+            The ID field is always returned."""
+        ),
+    ] = None,
+    index_id: Annotated[str | None, CommonParametersQuery.index_id] = None,
+):
+    """Fetch multiple documents from Elasticsearch with their IDs.
+
+    Documents are returned in the order of the requested IDs,
+    IDs of documents that were not found are listed in `not_found`.
+    """
+    global_config = config.get_config()
+    check_index_id_is_defined_or_400(index_id, global_config)
+    index_id, index_config = global_config.get_index_config(index_id)
+
+    ids_list = [id_ for id_ in ids.split(",") if id_]
+    if not ids_list:
+        raise HTTPException(status_code=400, detail="ids must not be empty")
+    if len(ids_list) > MAX_DOCUMENTS_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximum number of ids is {MAX_DOCUMENTS_IDS} (here: {len(ids_list)})",
+        )
+    source_includes = None
+    if fields:
+        source_includes = [index_config.index.id_field_name, *fields.split(",")]
+
+    result_processor = app_search.get_result_processor(index_id)
+    es = connection.current_es_client()
+    result = es.mget(
+        index=index_config.index.name,
+        ids=ids_list,
+        source_includes=source_includes,
+        source_excludes=result_processor.internal_fields or None,
+    )
+    return {
+        "documents": [doc["_source"] for doc in result["docs"] if doc.get("found")],
+        "not_found": [doc["_id"] for doc in result["docs"] if not doc.get("found")],
+    }
+
+
 def status_for_response(result: SearchResponse):
     if isinstance(result, SuccessSearchResponse):
         return status.HTTP_200_OK
@@ -109,9 +238,19 @@ def status_for_response(result: SearchResponse):
         return status.HTTP_500_INTERNAL_SERVER_ERROR
 
 
+def search_timer(request: Request) -> metrics.StageTimer:
+    """Create a timer for search stages,
+    it is reported to metrics by the `record_metrics` middleware"""
+    timer = metrics.StageTimer()
+    request.state.stage_timer = timer
+    return timer
+
+
 @app.post("/search", responses={400: {"model": ErrorSearchResponse}, 500: {"model": ErrorSearchResponse}})
 def search(
-    response: Response, search_parameters: Annotated[PostSearchParameters, Body()]
+    request: Request,
+    response: Response,
+    search_parameters: Annotated[PostSearchParameters, Body()],
 ) -> SearchResponse:
     """This is the main search endpoint.
 
@@ -119,20 +258,22 @@ def search(
 
     Under the hood, it calls the :py:func:`app.search.search` function
     """
-    result = app_search.search(search_parameters)
+    result = app_search.search(search_parameters, search_timer(request))
     response.status_code = status_for_response(result)
     return result
 
 
 @app.get("/search", responses={400: {"model": ErrorSearchResponse}, 500: {"model": ErrorSearchResponse}})
 def search_get(
-    response: Response, search_parameters: Annotated[GetSearchParameters, Query()]
+    request: Request,
+    response: Response,
+    search_parameters: Annotated[GetSearchParameters, Query()],
 ) -> SearchResponse:
     """This is the main search endpoint when using GET request
 
     Under the hood, it calls the :py:func:`app.search.search` function
     """
-    result = app_search.search(search_parameters)
+    result = app_search.search(search_parameters, search_timer(request))
     response.status_code = status_for_response(result)
     return result
 
@@ -167,30 +308,175 @@ def taxonomy_autocomplete(
     check_index_id_is_defined_or_400(index_id, global_config)
     index_id, index_config = global_config.get_index_config(index_id)
     taxonomy_names_list = taxonomy_names.split(",")
-    query = build_completion_query(
-        q=q,
-        taxonomy_names=taxonomy_names_list,
-        langs=langs.split(","),
+    langs_list = langs.split(",")
+    engine = index_config.taxonomy.autocomplete_engine
+    generation = taxonomy_generation(index_id, index_config)
+    completion_engine = None
+    if engine == AutocompleteEngine.memory and can_complete_in_memory(langs_list):
+        completion_engine = get_completion_engine(index_id, index_config, generation)
+    if completion_engine is None:
+        # not ready yet, or it can't handle these languages
+        engine = AutocompleteEngine.elasticsearch
+    normalizer = completion_normalizer(langs_list)
+    cache_key = CompletionCacheKey(
+        index_id=index_id,
+        generation=generation,
+        engine=engine,
+        taxonomy_names=tuple(taxonomy_names_list),
+        langs=tuple(langs_list),
         size=size,
-        config=index_config,
         fuzziness=fuzziness,
+        prefix=normalize_completion_input(q, normalizer) if normalizer else q,
+        normalizer=normalizer,
     )
+    result, cache_status = completion_cache.get(cache_key)
+    debug: dict[str, Any] = {"engine": engine, "cache": cache_status}
+    if result is None:
+        if completion_engine is not None:
+            result = completion_engine.complete_result(
+                q=q,
+                taxonomy_names=taxonomy_names_list,
+                langs=langs_list,
+                size=size,
+                fuzziness=fuzziness,
+            )
+        else:
+            query = build_completion_query(
+                q=q,
+                taxonomy_names=taxonomy_names_list,
+                langs=langs_list,
+                size=size,
+                config=index_config,
+                fuzziness=fuzziness,
+            )
+            try:
+                es_response = query.execute()
+            except elasticsearch.NotFoundError:
+                raise HTTPException(
+                    status_code=500,
+                    detail="taxonomy index not found, taxonomies need to be imported first",
+                )
+            result = es_completion_result(es_response, q, langs_list, size, fuzziness)
+            debug["query"] = query.to_dict()
+        completion_cache.set(cache_key, result)
+
+    return {
+        **result.response_for(q),
+        "debug": debug,
+    }
+
+
+CHARTS_SPEC_MAX_AGE = 24 * 3600
+
+
+@app.get("/charts/spec")
+def charts_spec(
+    response: Response,
+    charts: Annotated[
+        str,
+        Query(
+            description=cd_(
+                """Charts, as a comma separated list,
+                using the same syntax as the `charts` parameter of the search.
+                """
+            )
+        ),
+    ],
+    index_id: Annotated[str | None, CommonParametersQuery.index_id] = None,
+) -> ChartsInfos:
+    """Get the vega specifications of charts, without values.
+
+    Use it along with the `charts_data_only` search parameter,
+    to fetch specifications only once,
+    and then inject the `data` section of search results in them.
+    Specifications are static, so responses can be cached.
+    """
+    global_config = config.get_config()
+    check_index_id_is_defined_or_400(index_id, global_config)
+    index_id, index_config = global_config.get_index_config(index_id)
     try:
-        es_response = query.execute()
-    except elasticsearch.NotFoundError:
-        raise HTTPException(
-            status_code=500,
-            detail="taxonomy index not found, taxonomies need to be imported first",
-        )
+        charts_list = charts_from_str(charts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    errors = check_charts_fields(index_id, charts_list)
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+    response.headers["Cache-Control"] = f"public, max-age={CHARTS_SPEC_MAX_AGE}"
+    return build_charts_templates(index_config, charts_list)
 
-    response = process_taxonomy_completion_response(es_response, q, langs.split(","))
 
-    return {
-        **response,
-        "debug": {
-            "query": query.to_dict(),
-        },
+TAXONOMY_ENTRY_MAX_AGE = 3600
+MAX_TAXONOMY_ENTRY_PAGE_SIZE = 1000
+# in seconds, when taxonomies are not loaded yet
+TAXONOMY_PRELOAD_RETRY_AFTER = 10
+
+
+@app.get("/taxonomy/{taxonomy_name}/{entry_id}")
+def taxonomy_entry(
+    request: Request,
+    taxonomy_name: str,
+    entry_id: str,
+    page: Annotated[
+        int,
+        Query(ge=1, description="Page of children and descendants, starting at 1."),
+    ] = 1,
+    page_size: Annotated[
+        int,
+        Query(
+            ge=1,
+            le=MAX_TAXONOMY_ENTRY_PAGE_SIZE,
+            description="Number of children and descendants per page.",
+        ),
+    ] = 100,
+    index_id: Annotated[str | None, CommonParametersQuery.index_id] = None,
+):
+    """Get a taxonomy entry, with its names, parents, all its ancestors,
+    and (paged) children and descendants.
+
+    This avoids downloading whole taxonomies to browse them,
+    for example to list sub-categories when building a query.
+
+    Taxonomies are loaded in memory, with the ancestors and descendants
+    of all entries, in background, at startup and when they are re-imported:
+    until they are loaded, a 503 response is returned.
+    Responses can be cached too, and have an ETag,
+    so that clients can revalidate them with `If-None-Match`.
+    """
+    global_config = config.get_config()
+    check_index_id_is_defined_or_400(index_id, global_config)
+    index_id, index_config = global_config.get_index_config(index_id)
+    if not any(
+        source.name == taxonomy_name for source in index_config.taxonomy.sources
+    ):
+        raise HTTPException(status_code=404, detail="taxonomy not found")
+    taxonomy = get_preloaded_taxonomy(
+        index_id,
+        index_config.taxonomy,
+        taxonomy_name,
+        taxonomy_generation(index_id, index_config),
+    )
+    if taxonomy is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="taxonomies are being loaded, retry later",
+            headers={"Retry-After": str(TAXONOMY_PRELOAD_RETRY_AFTER)},
+        )
+    node = taxonomy[entry_id]
+    if node is None:
+        raise HTTPException(status_code=404, detail="taxonomy entry not found")
+    content = orjson.dumps(taxonomy_entry_result(taxonomy, node, page, page_size))
+    etag = f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={TAXONOMY_ENTRY_MAX_AGE}",
     }
+    if_none_match = [
+        tag.strip().removeprefix("W/")
+        for tag in request.headers.get("If-None-Match", "").split(",")
+    ]
+    if etag in if_none_match or "*" in if_none_match:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content, media_type="application/json", headers=headers)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -261,6 +547,15 @@ def robots_txt():
     return """User-agent: *\nDisallow: /"""
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Latency metrics, in Prometheus text format
+
+    Metrics are kept per API worker process.
+    """
+    return PlainTextResponse(metrics.render_metrics(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/health")
 def healthcheck():
     """API endpoint to check the health of the application
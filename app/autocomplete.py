@@ -0,0 +1,798 @@
+"""Autocompletion on taxonomies
+
+This provides an in-memory engine,
+an alternative to ElasticSearch completion suggesters
+(see :py:func:`app.query.build_completion_query`)
+which avoids a round trip to ElasticSearch on every keystroke.
+
+Taxonomies are small and do not change between imports,
+so for each taxonomy and language,
+we keep a sorted array of normalized synonyms.
+Completing a prefix is then a binary search,
+and fuzzy completion walks the sorted array as if it was a trie,
+skipping ranges of synonyms that can't match.
+
+It also provides a cache for autocomplete responses, whatever the engine.
+"""
+
+import bisect
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Callable, Iterable, NamedTuple
+
+import cachetools
+import elasticsearch
+from elasticsearch_dsl.response import Response
+
+from app._import import get_index_meta, iter_taxonomy_entries
+from app._types import JSONType
+from app.config import AutocompleteEngine, Config, IndexConfig, settings
+from app.postprocessing import process_taxonomy_completion_response
+from app.taxonomy import clear_taxonomy_cache, iter_taxonomies
+from app.utils import connection, get_logger
+from app.utils.analyzers import SPECIAL_NORMALIZERS
+
+logger = get_logger(__name__)
+
+# like ES, fuzzy matching requires the first characters to match
+FUZZY_PREFIX_LENGTH = 1
+# like ES, no fuzzy matching on shorter inputs
+FUZZY_MIN_LENGTH = 3
+# a character greater than any other, to compute the end of a prefix range
+_MAX_CHAR = "\U0010ffff"
+
+
+def _ascii_folding(text: str) -> str:
+    """Remove accents, like the `asciifolding` token filter"""
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)
+    )
+
+
+def _german_normalization(text: str) -> str:
+    """Like the `german_normalization` token filter:
+    ä, ö, ü become a, o, u, ß becomes ss,
+    and ae, oe, ue become a, o, u (but not in eg. que)
+    """
+    # like in Lucene implementation, the state tells what a following "e" does
+    ordinary, vowel, umlaut = 0, 1, 2
+    state = ordinary
+    chars = []
+    for c in text:
+        if c in "ao":
+            state = umlaut
+        elif c == "u":
+            state = umlaut if state == ordinary else vowel
+        elif c == "e":
+            if state == umlaut:
+                state = vowel
+                continue
+            state = vowel
+        elif c in "iqy":
+            state = vowel
+        elif c in "äöü":
+            c = {"ä": "a", "ö": "o", "ü": "u"}[c]
+            state = vowel
+        elif c == "ß":
+            c = "ss"
+            state = ordinary
+        else:
+            state = ordinary
+        chars.append(c)
+    return "".join(chars)
+
+
+def _scandinavian_folding(text: str) -> str:
+    """Like the `scandinavian_folding` token filter:
+    å, ä, æ become a, ö, ø become o,
+    and aa, ae, ao become a, oe, oo become o
+    """
+    chars = []
+    position = 0
+    while position < len(text):
+        c = text[position]
+        next_c = text[position + 1] if position + 1 < len(text) else ""
+        position += 1
+        if c in "åäæ":
+            c = "a"
+        elif c in "öø":
+            c = "o"
+        elif (c == "a" and next_c in ("a", "e", "o")) or (
+            c == "o" and next_c in ("e", "o")
+        ):
+            # skip next char
+            position += 1
+        chars.append(c)
+    return "".join(chars)
+
+
+DEFAULT_NORMALIZER = "asciifolding"
+
+#: normalizers of the autocomplete analyzer (by token filter name)
+#: that we mimic, see :py:data:`app.utils.analyzers.SPECIAL_NORMALIZERS`.
+#: Other languages are always completed by Elasticsearch.
+COMPLETION_NORMALIZERS: dict[str, Callable[[str], str]] = {
+    DEFAULT_NORMALIZER: _ascii_folding,
+    "german_normalization": _german_normalization,
+    "scandinavian_folding": _scandinavian_folding,
+}
+
+
+def lang_normalizer(lang: str) -> str:
+    """Name of the normalizer of the autocomplete analyzer for a language"""
+    return SPECIAL_NORMALIZERS.get(lang, DEFAULT_NORMALIZER)
+
+
+def completion_normalizer(langs: Iterable[str]) -> str | None:
+    """Name of the normalizer shared by languages,
+    None if they use different normalizers, or one we don't mimic
+    """
+    normalizers = {lang_normalizer(lang) for lang in langs}
+    if len(normalizers) != 1:
+        return None
+    normalizer = normalizers.pop()
+    return normalizer if normalizer in COMPLETION_NORMALIZERS else None
+
+
+def can_complete_in_memory(langs: Iterable[str]) -> bool:
+    """Tell if the in-memory engine gives the same results as Elasticsearch
+    for these languages"""
+    return all(lang_normalizer(lang) in COMPLETION_NORMALIZERS for lang in langs)
+
+
+def normalize_completion_input(text: str, normalizer: str = DEFAULT_NORMALIZER) -> str:
+    """Normalize a synonym or a user input for completion
+
+    This mimics the autocomplete analyzer
+    (see :py:func:`app.utils.analyzers.get_autocomplete_analyzer`)
+    along with `preserve_separators=False`:
+    we lower case, apply the normalizer of the language
+    (which removes accents, for most languages)
+    and remove anything that is not alphanumeric.
+
+    :param normalizer: the name of the normalizer,
+      a key of :py:data:`COMPLETION_NORMALIZERS`
+    """
+    return "".join(
+        c for c in COMPLETION_NORMALIZERS[normalizer](text.lower()) if c.isalnum()
+    )
+
+
+@dataclass(frozen=True)
+class CompletionEntry:
+    """A taxonomy entry, as stored in the taxonomy index"""
+
+    id: str
+    taxonomy_name: str
+    name: dict[str, str]
+    weight: int
+    # synonyms in all languages
+    synonyms: dict[str, list[str]]
+
+
+@dataclass
+class CompletionResult:
+    """An autocomplete response,
+    with what is needed to reuse it for longer inputs
+    """
+
+    response: JSONType
+    # normalized synonyms and synonyms,
+    # in requested languages, for each option of the response
+    option_keys: list[list[tuple[str, str]]]
+    # True if every entry matching the input is in the response
+    complete: bool
+
+    def restrict(
+        self, prefix: str, normalizer: str = DEFAULT_NORMALIZER
+    ) -> "CompletionResult":
+        """Derive the result for a longer normalized prefix
+
+        This is only valid if the result is complete,
+        as entries matching prefix must then be in this result.
+
+        :param normalizer: the normalizer of the requested languages
+        """
+        options = []
+        option_keys = []
+        for option, keys in zip(self.response["options"], self.option_keys):
+            if normalize_completion_input(option["text"], normalizer).startswith(
+                prefix
+            ):
+                text = option["text"]
+            else:
+                text = next(
+                    (text for key, text in keys if key.startswith(prefix)), None
+                )
+                if text is None:
+                    continue
+            options.append({**option, "text": text})
+            option_keys.append(keys)
+        return CompletionResult(
+            response={**self.response, "options": options},
+            option_keys=option_keys,
+            complete=True,
+        )
+
+    def response_for(self, q: str) -> JSONType:
+        """Get the response, for user input q"""
+        return {
+            **self.response,
+            "options": [{**option, "input": q} for option in self.response["options"]],
+        }
+
+
+def _option_keys(
+    synonyms: dict[str, list[str]], langs: list[str]
+) -> list[tuple[str, str]]:
+    """Normalized synonyms and synonyms of an entry, in requested languages
+
+    They are only used to derive results for longer inputs,
+    which requires languages to share a normalizer.
+    """
+    normalizer = completion_normalizer(langs)
+    if normalizer is None:
+        return []
+    return [
+        (normalize_completion_input(text, normalizer), text)
+        for lang in sorted(set(langs))
+        for text in synonyms.get(lang, [])
+    ]
+
+
+class SortedCompletionIndex:
+    """Sorted array of normalized synonyms, for one taxonomy and one language
+
+    :param items: the (synonym, entry) couples to index
+    :param normalizer: the normalizer of the language
+    """
+
+    def __init__(
+        self,
+        items: list[tuple[str, CompletionEntry]],
+        normalizer: str = DEFAULT_NORMALIZER,
+    ):
+        keyed = sorted(
+            (
+                (normalize_completion_input(text, normalizer), text, entry)
+                for text, entry in items
+            ),
+            key=lambda item: (item[0], item[1]),
+        )
+        # empty keys can't be completed
+        keyed = [item for item in keyed if item[0]]
+        self.keys: list[str] = [key for key, _, _ in keyed]
+        self.values: list[tuple[str, CompletionEntry]] = [
+            (text, entry) for _, text, entry in keyed
+        ]
+        self.weights: list[int] = [entry.weight for _, _, entry in keyed]
+        # positions by decreasing weight, to find best matches in large ranges
+        self.ranked: list[int] = sorted(
+            range(len(self.keys)), key=lambda position: -self.weights[position]
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _prefix_range(
+        self, prefix: str, lo: int = 0, hi: int | None = None
+    ) -> tuple[int, int]:
+        """Return the range of keys starting with prefix"""
+        hi = len(self.keys) if hi is None else hi
+        start = bisect.bisect_left(self.keys, prefix, lo, hi)
+        end = bisect.bisect_left(self.keys, prefix + _MAX_CHAR, start, hi)
+        return start, end
+
+    def iter_fuzzy(self, query: str, fuzziness: int):
+        """Iterate over keys having a prefix
+        within `fuzziness` edits (Damerau-Levenshtein) of query.
+
+        Keys are sorted, so consecutive keys share prefixes,
+        and we can re-use the rows of the edit distance matrix
+        computed for those prefixes.
+        Values in a row never decrease for longer prefixes,
+        so we can decide for all keys sharing a prefix at once,
+        either skipping them or matching them all.
+
+        :yield: (distance, start, end) ranges of matching keys
+        """
+        lo, hi = self._prefix_range(query[:FUZZY_PREFIX_LENGTH])
+        query_len = len(query)
+        cap = fuzziness + 1
+        # rows[i] is the edit distance row for the first i chars of the key,
+        # best[i] is the best distance of a prefix of at most i chars
+        rows: list[list[int]] = [[min(j, cap) for j in range(query_len + 1)]]
+        best: list[int] = [min(query_len, cap)]
+        previous_key = ""
+        position = lo
+        while position < hi:
+            key = self.keys[position]
+            # number of chars in common with previous key, whose rows are valid
+            common = 0
+            max_common = min(len(key), len(previous_key), len(rows) - 1)
+            while common < max_common and key[common] == previous_key[common]:
+                common += 1
+            del rows[common + 1 :]
+            del best[common + 1 :]
+            previous_key = key
+            decided_at = None
+            for i in range(common + 1, len(key) + 1):
+                char = key[i - 1]
+                previous_row = rows[i - 1]
+                # only cells near the diagonal can be within fuzziness,
+                # others are capped
+                row_min = i if i < cap else cap
+                row = [row_min] + [cap] * query_len
+                for j in range(
+                    max(1, i - fuzziness), min(query_len, i + fuzziness) + 1
+                ):
+                    value = previous_row[j - 1] + (query[j - 1] != char)
+                    if previous_row[j] < value:
+                        value = previous_row[j] + 1
+                    if row[j - 1] < value:
+                        value = row[j - 1] + 1
+                    if (
+                        i > 1
+                        and j > 1
+                        and char == query[j - 2]
+                        and key[i - 2] == query[j - 1]
+                        and rows[i - 2][j - 2] < value
+                    ):
+                        value = rows[i - 2][j - 2] + 1
+                    if value < cap:
+                        row[j] = value
+                        if value < row_min:
+                            row_min = value
+                rows.append(row)
+                best.append(min(best[i - 1], row[query_len]))
+                if row_min >= min(best[i], cap):
+                    # longer prefixes won't change the outcome
+                    decided_at = i
+                    break
+            if decided_at is None:
+                if best[-1] <= fuzziness:
+                    yield best[-1], position, position + 1
+                position += 1
+                continue
+            start, end = self._prefix_range(key[:decided_at], position, hi)
+            if best[decided_at] <= fuzziness:
+                yield best[decided_at], start, end
+            position = end
+
+    def best_positions(
+        self, ranges: list[tuple[int, int]], size: int, seen_ids: set[str]
+    ) -> list[int]:
+        """Find the positions of the keys with the highest weights in ranges
+
+        :param ranges: sorted, non overlapping, ranges of positions
+        :param size: the maximum number of positions to return
+        :param seen_ids: ids of entries to skip,
+          it is updated with returned entries, to keep one key per entry
+        """
+        total = sum(end - start for start, end in ranges)
+        candidates: Iterable[int]
+        if total * total <= size * len(self.keys):
+            # few candidates, sort them
+            candidates = sorted(
+                (position for start, end in ranges for position in range(start, end)),
+                key=lambda position: -self.weights[position],
+            )
+        else:
+            # a lot of candidates, scan by weight until we find enough of them
+            starts = [start for start, _ in ranges]
+            candidates = (
+                position
+                for position in self.ranked
+                if position >= starts[0]
+                and position < ranges[bisect.bisect_right(starts, position) - 1][1]
+            )
+        positions: list[int] = []
+        for position in candidates:
+            entry_id = self.values[position][1].id
+            if entry_id in seen_ids:
+                continue
+            seen_ids.add(entry_id)
+            positions.append(position)
+            if len(positions) >= size:
+                break
+        return positions
+
+    def complete(
+        self, query: str, size: int, fuzziness: int | None = None
+    ) -> list[tuple[int, str, CompletionEntry]]:
+        """Complete a normalized query
+
+        :param query: the normalized user input
+        :param size: the maximum number of entries to return
+        :param fuzziness: the maximum number of edits, None for exact prefix
+        :return: a list of (distance, text, entry),
+          at most one per entry, best matches first:
+          exact matches first, then by descending weight
+        """
+        if not query:
+            return []
+        ranges_by_distance: dict[int, list[tuple[int, int]]] = {}
+        if fuzziness and len(query) >= FUZZY_MIN_LENGTH:
+            for distance, start, end in self.iter_fuzzy(query, fuzziness):
+                ranges_by_distance.setdefault(distance, []).append((start, end))
+        else:
+            start, end = self._prefix_range(query)
+            if start < end:
+                ranges_by_distance[0] = [(start, end)]
+        results: list[tuple[int, str, CompletionEntry]] = []
+        seen_ids: set[str] = set()
+        for distance, ranges in sorted(ranges_by_distance.items()):
+            for position in self.best_positions(ranges, size - len(results), seen_ids):
+                results.append((distance, *self.values[position]))
+            if len(results) >= size:
+                break
+        return results
+
+
+class TaxonomyCompletionEngine:
+    """In-memory autocompletion on all taxonomies of an index
+
+    :param entries: the taxonomy entries,
+      as given by :py:func:`app._import.iter_taxonomy_entries`
+    """
+
+    def __init__(self, entries: Iterable[JSONType]):
+        items: dict[tuple[str, str], list[tuple[str, CompletionEntry]]] = {}
+        for entry in entries:
+            all_synonyms = {
+                lang: synonyms["input"] for lang, synonyms in entry["synonyms"].items()
+            }
+            for lang, synonyms in entry["synonyms"].items():
+                lang_entry = CompletionEntry(
+                    id=entry["id"],
+                    taxonomy_name=entry["taxonomy_name"],
+                    name=entry["name"],
+                    weight=synonyms["weight"],
+                    synonyms=all_synonyms,
+                )
+                items.setdefault((entry["taxonomy_name"], lang), []).extend(
+                    (text, lang_entry) for text in synonyms["input"]
+                )
+        # languages whose normalizer we don't mimic are left to Elasticsearch
+        self.indexes: dict[tuple[str, str], SortedCompletionIndex] = {
+            (taxonomy_name, lang): SortedCompletionIndex(
+                lang_items, lang_normalizer(lang)
+            )
+            for (taxonomy_name, lang), lang_items in items.items()
+            if can_complete_in_memory([lang])
+        }
+
+    @classmethod
+    def from_config(cls, config: IndexConfig) -> "TaxonomyCompletionEngine":
+        """Build the engine from the taxonomy sources of an index"""
+        start = time.perf_counter()
+        engine = cls(
+            iter_taxonomy_entries(
+                config,
+                iter_taxonomies(config.taxonomy),
+                set(config.supported_langs),
+            )
+        )
+        logger.info(
+            "Built in-memory autocomplete engine (%d synonyms) in %.2fs",
+            sum(len(index) for index in engine.indexes.values()),
+            time.perf_counter() - start,
+        )
+        return engine
+
+    def complete_result(
+        self,
+        q: str,
+        taxonomy_names: list[str],
+        langs: list[str],
+        size: int,
+        fuzziness: int | None = None,
+    ) -> CompletionResult:
+        """Complete user input,
+
+        The response has the same format as
+        :py:func:`app.postprocessing.process_taxonomy_completion_response`
+
+        :param q: the user autocomplete query
+        :param taxonomy_names: a list of taxonomies we want to search in
+        :param langs: the languages we want search in
+        :param size: number of results to return, per language
+        :param fuzziness: maximum number of edits, default to no fuzziness
+        """
+        start = time.perf_counter()
+        options: list[JSONType] = []
+        option_keys = []
+        ids = set()
+        complete = not fuzziness
+        # same order as suggestions in ES response
+        for lang in sorted(set(langs)):
+            lang_matches = []
+            query = (
+                normalize_completion_input(q, lang_normalizer(lang))
+                if can_complete_in_memory([lang])
+                else ""
+            )
+            for taxonomy_name in taxonomy_names:
+                index = self.indexes.get((taxonomy_name, lang))
+                if index is not None:
+                    lang_matches.extend(index.complete(query, size, fuzziness))
+            if len(lang_matches) >= size:
+                complete = False
+            lang_matches.sort(key=lambda match: (match[0], -match[2].weight))
+            for _, text, entry in lang_matches[:size]:
+                if entry.id in ids:
+                    continue
+                ids.add(entry.id)
+                options.append(
+                    {
+                        "id": entry.id,
+                        "text": text,
+                        "name": entry.name.get(langs[0], ""),
+                        "score": float(entry.weight),
+                        "input": q,
+                        "taxonomy_name": entry.taxonomy_name,
+                    }
+                )
+                option_keys.append(_option_keys(entry.synonyms, langs))
+        # highest score first
+        order = sorted(
+            range(len(options)), key=lambda i: options[i]["score"], reverse=True
+        )
+        return CompletionResult(
+            response={
+                "took": int((time.perf_counter() - start) * 1000),
+                "timed_out": False,
+                "options": [options[i] for i in order],
+            },
+            option_keys=[option_keys[i] for i in order],
+            complete=complete,
+        )
+
+    def complete(
+        self,
+        q: str,
+        taxonomy_names: list[str],
+        langs: list[str],
+        size: int,
+        fuzziness: int | None = None,
+    ) -> JSONType:
+        """Complete user input, see :py:meth:`complete_result`"""
+        return self.complete_result(q, taxonomy_names, langs, size, fuzziness).response
+
+
+def es_completion_result(
+    es_response: Response, q: str, langs: list[str], size: int, fuzziness: int | None
+) -> CompletionResult:
+    """Get the result of a completion query on the taxonomy index
+
+    :param es_response: the response to the query built by
+      :py:func:`app.query.build_completion_query`
+    :param q: the user autocomplete query
+    :param langs: the languages we searched in
+    :param size: number of results requested, per language
+    :param fuzziness: the fuzziness used in the query
+    """
+    response = process_taxonomy_completion_response(es_response, q, langs)
+    complete = not fuzziness
+    synonyms_by_id = {}
+    for suggestion_id in dir(es_response.suggest):
+        if not suggestion_id.startswith("taxonomy_suggest_"):
+            continue
+        for suggestion in getattr(es_response.suggest, suggestion_id):
+            if len(suggestion.options) >= size:
+                complete = False
+            for option in suggestion.options:
+                synonyms = option._source.to_dict().get("synonyms", {})
+                synonyms_by_id[option._source["id"]] = {
+                    lang: lang_synonyms.get("input", [])
+                    for lang, lang_synonyms in synonyms.items()
+                }
+    return CompletionResult(
+        response=response,
+        option_keys=[
+            _option_keys(synonyms_by_id[option["id"]], langs)
+            for option in response["options"]
+        ],
+        complete=complete,
+    )
+
+
+_TAXONOMY_GENERATIONS: dict[str, tuple[float, str | None]] = {}
+
+
+def taxonomy_generation(index_id: str, config: IndexConfig) -> str | None:
+    """Get an identifier of the taxonomies currently in use for an index
+
+    This is the name of the taxonomy index the alias points to,
+    with the date of its last incremental update, if any:
+    it changes each time taxonomies are imported or updated.
+    To avoid querying ElasticSearch on each call,
+    it is checked at most every `settings.taxonomy_generation_check_interval`.
+    """
+    now = time.monotonic()
+    checked = _TAXONOMY_GENERATIONS.get(index_id)
+    if (
+        checked is not None
+        and now - checked[0] < settings.taxonomy_generation_check_interval
+    ):
+        return checked[1]
+    generation: str | None
+    try:
+        current = get_index_meta(
+            connection.current_es_client(), config.taxonomy.index.name
+        )
+        if current is None:
+            generation = None
+        else:
+            index_name, meta = current
+            generation = (
+                f"{index_name}@{meta['updated']}" if "updated" in meta else index_name
+            )
+    except (elasticsearch.ApiError, elasticsearch.TransportError):
+        logger.exception("Unable to check taxonomy index for %s", index_id)
+        generation = checked[1] if checked is not None else None
+    _TAXONOMY_GENERATIONS[index_id] = (now, generation)
+    return generation
+
+
+class CompletionCacheKey(NamedTuple):
+    index_id: str
+    # see taxonomy_generation
+    generation: str | None
+    engine: AutocompleteEngine
+    taxonomy_names: tuple[str, ...]
+    langs: tuple[str, ...]
+    size: int
+    fuzziness: int | None
+    # normalized user input
+    prefix: str
+    # the normalizer of requested languages (see `completion_normalizer`),
+    # if None, prefix is the user input, and results are not derived
+    normalizer: str | None = DEFAULT_NORMALIZER
+
+
+class CompletionCache:
+    """Cache of autocomplete results
+
+    Short inputs are the most frequent, and identical across users.
+    Moreover, as users type, a longer input can often be answered
+    from the result for a shorter input, by filtering it,
+    if this result contained all matching entries.
+
+    :param maxsize: maximum number of results to keep, 0 to disable cache
+    :param ttl: time to live of results, in seconds
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.enabled = maxsize > 0
+        self.results: cachetools.TTLCache = cachetools.TTLCache(
+            maxsize=max(maxsize, 1), ttl=ttl
+        )
+        self.lock = threading.Lock()
+
+    def get(self, key: CompletionCacheKey) -> tuple[CompletionResult | None, str]:
+        """Get a result from cache
+
+        :return: the result, if any,
+          and how it was obtained: "hit", "prefix" or "miss"
+        """
+        if not self.enabled or not key.prefix:
+            return None, "miss"
+        with self.lock:
+            result = self.results.get(key)
+        if result is not None:
+            return result, "hit"
+        if key.fuzziness or key.normalizer is None:
+            # we can't derive fuzzy results,
+            # nor results in languages with different normalizations
+            return None, "miss"
+        for length in range(len(key.prefix) - 1, 0, -1):
+            shorter_key = key._replace(prefix=key.prefix[:length])
+            with self.lock:
+                shorter_result = self.results.get(shorter_key)
+            if shorter_result is not None and shorter_result.complete:
+                result = shorter_result.restrict(key.prefix, key.normalizer)
+                self.set(key, result)
+                return result, "prefix"
+        return None, "miss"
+
+    def set(self, key: CompletionCacheKey, result: CompletionResult):
+        if not self.enabled or not key.prefix:
+            return
+        with self.lock:
+            self.results[key] = result
+
+
+completion_cache = CompletionCache(
+    settings.autocomplete_cache_size, settings.autocomplete_cache_ttl
+)
+
+
+_COMPLETION_ENGINES: dict[str, tuple[str | None, TaxonomyCompletionEngine]] = {}
+# builds in progress, by index id
+_COMPLETION_ENGINE_BUILDS: dict[str, threading.Thread] = {}
+# time of the last failed build, by index id
+_COMPLETION_ENGINE_FAILURES: dict[str, float] = {}
+_COMPLETION_ENGINES_LOCK = threading.Lock()
+
+
+def _build_completion_engine(
+    index_id: str, config: IndexConfig, generation: str | None
+) -> None:
+    try:
+        if index_id in _COMPLETION_ENGINES:
+            # taxonomies were re-imported, reload them
+            clear_taxonomy_cache()
+        engine = TaxonomyCompletionEngine.from_config(config)
+        with _COMPLETION_ENGINES_LOCK:
+            _COMPLETION_ENGINES[index_id] = (generation, engine)
+            _COMPLETION_ENGINE_FAILURES.pop(index_id, None)
+    except Exception:
+        logger.exception("Unable to build in-memory autocomplete for %s", index_id)
+        with _COMPLETION_ENGINES_LOCK:
+            _COMPLETION_ENGINE_FAILURES[index_id] = time.monotonic()
+    finally:
+        with _COMPLETION_ENGINES_LOCK:
+            _COMPLETION_ENGINE_BUILDS.pop(index_id, None)
+
+
+def start_completion_engine_build(
+    index_id: str, config: IndexConfig, generation: str | None = None
+) -> threading.Thread | None:
+    """Build the in-memory completion engine of an index in a background thread
+
+    Nothing is done if a build is already in progress,
+    or if the last one failed less than
+    `settings.taxonomy_generation_check_interval` seconds ago.
+
+    :return: the thread building the engine, if a build was started
+    """
+    with _COMPLETION_ENGINES_LOCK:
+        if index_id in _COMPLETION_ENGINE_BUILDS:
+            return None
+        failed = _COMPLETION_ENGINE_FAILURES.get(index_id)
+        if (
+            failed is not None
+            and time.monotonic() - failed < settings.taxonomy_generation_check_interval
+        ):
+            return None
+        thread = threading.Thread(
+            target=_build_completion_engine,
+            args=(index_id, config, generation),
+            name=f"autocomplete-build-{index_id}",
+            daemon=True,
+        )
+        _COMPLETION_ENGINE_BUILDS[index_id] = thread
+        thread.start()
+    return thread
+
+
+def get_completion_engine(
+    index_id: str, config: IndexConfig, generation: str | None = None
+) -> TaxonomyCompletionEngine | None:
+    """Get the in-memory completion engine of an index, if it is ready
+
+    Building it takes time (taxonomies are downloaded and parsed),
+    so it is built in a background thread
+    (see :py:func:`start_completion_engine_build`),
+    meanwhile None is returned, and Elasticsearch must be used instead.
+
+    :param generation: the taxonomy generation (see `taxonomy_generation`),
+      the engine is rebuilt if it changed
+    """
+    built = _COMPLETION_ENGINES.get(index_id)
+    if built is not None and built[0] == generation:
+        return built[1]
+    start_completion_engine_build(index_id, config, generation)
+    return None
+
+
+def start_completion_engines(global_config: Config) -> None:
+    """Start building in-memory completion engines of all indices using them"""
+    for index_id, index_config in global_config.indices.items():
+        if index_config.taxonomy.autocomplete_engine == AutocompleteEngine.memory:
+            start_completion_engine_build(
+                index_id, index_config, taxonomy_generation(index_id, index_config)
+            )
@@ -0,0 +1,5 @@
+"""Benchmarks of the import and search code paths
+
+They run without Elasticsearch, to measure the cost of the Python side
+and get reproducible numbers when evaluating changes.
+"""
@@ -0,0 +1,205 @@
+"""Generate synthetic products, similar to Open Food Facts ones
+
+Products match the `off` index of `data/config/openfoodfacts.yml`:
+they have translated texts, taxonomy tags, nutriments and images,
+with sizes close to real products.
+Generation is deterministic for a given seed.
+"""
+
+import random
+from pathlib import Path
+from typing import Iterator
+
+import orjson
+
+from app._types import JSONType
+
+LANGS = ["en", "fr", "de", "es", "it", "nl", "pt", "pl"]
+WORDS = (
+    "organic chocolate milk dark hazelnut spread biscuits whole wheat flour "
+    "sugar salt butter cream cheese yogurt strawberry apple orange juice "
+    "tomato sauce pasta rice olive oil sunflower seeds vanilla cocoa honey "
+    "almond oat breakfast cereals crispy sparkling water lemon natural"
+).split()
+CATEGORIES = [
+    "en:plant-based-foods-and-beverages",
+    "en:plant-based-foods",
+    "en:snacks",
+    "en:sweet-snacks",
+    "en:biscuits-and-cakes",
+    "en:biscuits",
+    "en:beverages",
+    "en:dairies",
+    "en:fermented-foods",
+    "en:cheeses",
+    "en:spreads",
+    "en:breakfasts",
+    "en:cereals-and-potatoes",
+    "en:fruit-juices",
+    "en:chocolates",
+]
+LABELS = [
+    "en:organic",
+    "en:eu-organic",
+    "en:no-gluten",
+    "en:vegetarian",
+    "en:vegan",
+    "en:fair-trade",
+    "en:no-palm-oil",
+    "en:green-dot",
+]
+COUNTRIES = ["en:france", "en:germany", "en:spain", "en:italy", "en:united-states"]
+STATES = [
+    "en:to-be-completed",
+    "en:nutrition-facts-completed",
+    "en:ingredients-completed",
+    "en:product-name-completed",
+    "en:photos-uploaded",
+    "en:photos-validated",
+]
+INGREDIENTS = [
+    "en:sugar",
+    "en:wheat-flour",
+    "en:palm-oil",
+    "en:cocoa",
+    "en:milk",
+    "en:salt",
+    "en:water",
+    "en:hazelnut",
+    "en:emulsifier",
+    "en:e322",
+    "en:flavouring",
+    "en:egg",
+]
+ALLERGENS = ["en:milk", "en:gluten", "en:nuts", "en:eggs", "en:soybeans"]
+BRANDS = ["brand-a", "brand-b", "brand-c", "super-brand", "own-brand"]
+GRADES = ["a", "b", "c", "d", "e", "unknown"]
+NUTRIMENTS = [
+    "energy-kj_100g",
+    "energy-kcal_100g",
+    "fat_100g",
+    "saturated-fat_100g",
+    "carbohydrates_100g",
+    "sugars_100g",
+    "fiber_100g",
+    "proteins_100g",
+    "salt_100g",
+    "sodium_100g",
+]
+# nutriments that are not indexed, real products have a lot of them
+EXTRA_NUTRIMENTS = ["calcium", "iron", "vitamin-c", "potassium", "magnesium"]
+IMAGE_TYPES = ["front", "ingredients", "nutrition", "packaging"]
+
+
+def _text(rng: random.Random, min_words: int, max_words: int) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(min_words, max_words)))
+
+
+def _sample(rng: random.Random, values: list[str], max_num: int) -> list[str]:
+    return rng.sample(values, rng.randint(0, min(max_num, len(values))))
+
+
+def _image_sizes(rng: random.Random) -> JSONType:
+    return {
+        size: {"h": size_value, "w": int(size_value * rng.uniform(0.5, 1))}
+        for size, size_value in (("100", 100), ("200", 200), ("400", 400))
+    } | {"full": {"h": 1200, "w": rng.randint(600, 1200)}}
+
+
+def generate_product(rng: random.Random, num: int) -> JSONType:
+    """Generate a product
+
+    :param rng: the random generator
+    :param num: the number of the product, used to generate its barcode
+    """
+    lang = rng.choice(LANGS)
+    langs = [lang] + _sample(rng, [other for other in LANGS if other != lang], 2)
+    modified = 1500000000 + rng.randint(0, 200000000)
+    product: JSONType = {
+        "code": f"{2000000000000 + num:013d}",
+        "lang": lang,
+        "lc": lang,
+        "languages_codes": {code: rng.randint(1, 10) for code in langs},
+        "obsolete": "" if rng.random() > 0.01 else "on",
+        "categories_tags": CATEGORIES[: rng.randint(0, len(CATEGORIES))],
+        "labels_tags": _sample(rng, LABELS, 3),
+        "brands_tags": _sample(rng, BRANDS, 2),
+        "conutries_tags": _sample(rng, COUNTRIES, 3),
+        "states_tags": _sample(rng, STATES, 4),
+        "ingredients_tags": _sample(rng, INGREDIENTS, 10),
+        "allergens_tags": _sample(rng, ALLERGENS, 2),
+        "traces_tags": _sample(rng, ALLERGENS, 2),
+        "ingredients_analysis_tags": ["en:palm-oil-free", "en:vegetarian"],
+        "stores": ",".join(_sample(rng, ["Carrefour", "Lidl", "Auchan", "Aldi"], 2)),
+        "quantity": f"{rng.randint(1, 20) * 50} g",
+        "owner": "",
+        "unique_scans_n": rng.randint(0, 5000),
+        "scans_n": rng.randint(0, 10000),
+        "popularity_key": rng.randint(0, 10**10),
+        "nutrition_grades": rng.choice(GRADES),
+        "nutriscore_grade": rng.choice(GRADES),
+        "nutriscore_score": rng.randint(-15, 40),
+        "ecoscore_grade": rng.choice(GRADES),
+        "ecoscore_score": rng.randint(0, 100),
+        "nova_groups": str(rng.randint(1, 4)),
+        "nova_group": rng.randint(1, 4),
+        "additives_n": rng.randint(0, 10),
+        "ingredients_n": rng.randint(1, 30),
+        "unknown_ingredients_n": rng.randint(0, 3),
+        "completeness": rng.random(),
+        "created_t": modified - rng.randint(0, 100000000),
+        "last_modified_t": modified,
+        "nutriments": {name: round(rng.uniform(0, 100), 2) for name in NUTRIMENTS}
+        | {
+            f"{name}{suffix}": round(rng.uniform(0, 1), 4)
+            for name in EXTRA_NUTRIMENTS
+            for suffix in ("", "_100g", "_serving", "_unit", "_value")
+        },
+        "nutrient_levels": {"fat": "low", "salt": "moderate", "sugars": "high"},
+    }
+    for code in langs:
+        product[f"product_name_{code}"] = _text(rng, 2, 6)
+        product[f"generic_name_{code}"] = _text(rng, 0, 8)
+        product[f"ingredients_text_{code}"] = _text(rng, 10, 60)
+    product["product_name"] = product[f"product_name_{lang}"]
+    product["generic_name"] = product[f"generic_name_{lang}"]
+    # uploaded images, then selected images
+    num_images = rng.randint(0, 8)
+    images: JSONType = {
+        str(imgid): {
+            "sizes": _image_sizes(rng),
+            "uploaded_t": modified - rng.randint(0, 1000000),
+            "uploader": "synthetic",
+        }
+        for imgid in range(1, num_images + 1)
+    }
+    if num_images:
+        for image_type in IMAGE_TYPES:
+            for code in langs:
+                if rng.random() < 0.5:
+                    images[f"{image_type}_{code}"] = {
+                        "imgid": str(rng.randint(1, num_images)),
+                        "rev": str(rng.randint(1, 50)),
+                        "sizes": _image_sizes(rng),
+                        "geometry": "0x0-0-0",
+                    }
+    product["images"] = images
+    return product
+
+
+def generate_products(num: int, seed: int = 0) -> Iterator[JSONType]:
+    """Generate `num` products
+
+    :param num: number of products
+    :param seed: seed of the random generator, for reproducible data
+    """
+    rng = random.Random(seed)
+    for i in range(num):
+        yield generate_product(rng, i)
+
+
+def write_products(file_path: Path, num: int, seed: int = 0) -> None:
+    """Write generated products to a JSONL file"""
+    with file_path.open("wb") as f:
+        for product in generate_products(num, seed):
+            f.write(orjson.dumps(product) + b"\n")
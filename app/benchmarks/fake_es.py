@@ -0,0 +1,290 @@
+"""A fake Elasticsearch client, answering searches from a set of documents
+
+Answers are not real search results: hits are taken in order from documents,
+and aggregations are computed on all documents.
+But they have the same structure as real ones,
+so that the code processing them does a realistic amount of work.
+"""
+
+import math
+import statistics
+import time
+from collections import Counter
+from typing import Any, Iterable
+
+import orjson
+from elasticsearch_dsl.connections import connections
+
+from app._types import FetcherResult, FetcherStatus, JSONType
+from app.config import IndexConfig
+from app.indexing import DocumentProcessor
+
+from .data_generation import generate_products
+
+# number of documents matching each search, as reported in responses
+DEFAULT_TOTAL = 123456
+
+
+def indexed_documents(config: IndexConfig, num: int, seed: int = 0) -> list[JSONType]:
+    """Generate synthetic documents, as they are stored in the index"""
+    processor = DocumentProcessor(config)
+    documents = []
+    for product in generate_products(num, seed):
+        result = processor.from_result(
+            FetcherResult(status=FetcherStatus.FOUND, document=product)
+        )
+        if result.status == FetcherStatus.FOUND and result.document:
+            documents.append(result.document)
+    return documents
+
+
+def _field_values(document: JSONType, field: str) -> list[Any]:
+    value: Any = document
+    for key in field.split("."):
+        if not isinstance(value, dict):
+            return []
+        value = value.get(key)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _numeric_values(documents: Iterable[JSONType], field: str) -> list[float]:
+    return [
+        float(value)
+        for document in documents
+        for value in _field_values(document, field)
+        if isinstance(value, (int, float))
+    ]
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+def fake_aggregation(agg: JSONType, documents: list[JSONType]) -> JSONType:
+    """Compute an aggregation result on documents
+
+    Supports the aggregations used by search-a-licious
+    (terms, histogram, variable width histogram, and filter with metrics).
+    """
+    agg_type, agg_params = next(
+        (name, value) for name, value in agg.items() if name != "aggs"
+    )
+    result: JSONType
+    if agg_type == "terms":
+        counts = Counter(
+            value
+            for document in documents
+            for value in _field_values(document, agg_params["field"])
+        )
+        size = agg_params.get("size", 10)
+        top = counts.most_common(size)
+        result = {
+            "doc_count_error_upper_bound": 0,
+            "sum_other_doc_count": sum(counts.values()) - sum(c for _, c in top),
+            "buckets": [{"key": key, "doc_count": count} for key, count in top],
+        }
+    elif agg_type == "histogram":
+        interval = agg_params["interval"]
+        counts = Counter(
+            math.floor(value / interval) * interval
+            for value in _numeric_values(documents, agg_params["field"])
+        )
+        result = {
+            "buckets": [
+                {"key": key, "doc_count": count}
+                for key, count in sorted(counts.items())
+            ]
+        }
+    elif agg_type == "variable_width_histogram":
+        values = sorted(_numeric_values(documents, agg_params["field"]))
+        num_buckets = agg_params.get("buckets", 10)
+        bucket_size = max(1, math.ceil(len(values) / num_buckets))
+        buckets = []
+        for i in range(0, len(values), bucket_size):
+            bucket_values = values[i : i + bucket_size]
+            buckets.append(
+                {
+                    "min": bucket_values[0],
+                    "key": statistics.fmean(bucket_values),
+                    "max": bucket_values[-1],
+                    "doc_count": len(bucket_values),
+                }
+            )
+        result = {"buckets": buckets}
+    elif agg_type == "stats":
+        values = _numeric_values(documents, agg_params["field"])
+        result = {
+            "count": len(values),
+            "min": min(values, default=None),
+            "max": max(values, default=None),
+            "avg": statistics.fmean(values) if values else None,
+            "sum": sum(values),
+        }
+    elif agg_type == "percentiles":
+        values = sorted(_numeric_values(documents, agg_params["field"]))
+        result = {
+            "values": {
+                str(float(percent)): (_percentile(values, percent) if values else None)
+                for percent in agg_params.get("percents", [])
+            }
+        }
+    else:
+        # filter, or other bucket aggregations: don't filter anything
+        result = {"doc_count": len(documents)}
+    for name, sub_agg in agg.get("aggs", {}).items():
+        result[name] = fake_aggregation(sub_agg, documents)
+    return result
+
+
+def fake_search_response(
+    body: JSONType, documents: list[JSONType], took: int = 5
+) -> JSONType:
+    """Build a search response for a query, from documents"""
+    size = body.get("size", 10)
+    start = body.get("from", 0)
+    hits = []
+    if documents:
+        for i in range(start, start + size):
+            document = documents[i % len(documents)]
+            hits.append(
+                {
+                    "_index": "fake",
+                    "_id": str(i),
+                    "_score": 1.0,
+                    "_source": document,
+                }
+            )
+    return {
+        "took": took,
+        "timed_out": False,
+        "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+        "hits": {
+            "total": {"value": DEFAULT_TOTAL, "relation": "eq"},
+            "max_score": 1.0,
+            "hits": hits,
+        },
+        "aggregations": {
+            name: fake_aggregation(agg, documents)
+            for name, agg in body.get("aggs", {}).items()
+        },
+    }
+
+
+def _taxonomy_entries(body: JSONType) -> list[JSONType]:
+    """Taxonomy entries requested by `app.taxonomy_es.get_taxonomy_names`"""
+    entries = []
+    for should in body["query"]["bool"]["filter"][0]["bool"]["should"]:
+        terms: JSONType = {}
+        for clause in should["bool"]["must"]:
+            if "term" in clause:
+                terms |= clause["term"]
+            elif "wildcard" in clause:
+                # ids without language prefix
+                terms["id"] = "en" + clause["wildcard"]["id"]["value"][1:]
+        name = terms["id"].split(":", 1)[-1].replace("-", " ").capitalize()
+        entries.append(
+            {
+                "id": terms["id"],
+                "taxonomy_name": terms["taxonomy_name"],
+                "name": {"en": name, "fr": name, "main": name},
+            }
+        )
+    return entries
+
+
+def _suggest_response(suggest: JSONType) -> JSONType:
+    """Completion suggestions, for queries built by
+    `app.query.build_completion_query`"""
+    response = {}
+    for name, suggestion in suggest.items():
+        completion = suggestion["completion"]
+        lang = completion["field"].split(".", 1)[-1]
+        text = suggestion["text"]
+        options = []
+        for taxonomy_name in completion["contexts"]["taxonomy_name"]:
+            for i in range(completion.get("size", 5)):
+                synonym = f"{text}{i}"
+                options.append(
+                    {
+                        "text": synonym,
+                        "_index": "fake",
+                        "_id": f"{taxonomy_name}-{synonym}",
+                        "_score": 1.0 / (i + 1),
+                        "_source": {
+                            "id": f"{lang}:{synonym}",
+                            "taxonomy_name": taxonomy_name,
+                            "name": {lang: synonym},
+                            "synonyms": {lang: {"input": [synonym]}},
+                        },
+                    }
+                )
+        response[name] = [
+            {"text": text, "offset": 0, "length": len(text), "options": options}
+        ]
+    return response
+
+
+class FakeIndices:
+    """Mimic the indices API of the Elasticsearch client"""
+
+    def get(self, index: str, **params) -> JSONType:
+        # aliases point to an index with a fixed name, without metadata
+        return {f"{index}-fake": {"aliases": {index: {}}}}
+
+
+class FakeResponse:
+    """Mimic the response of the Elasticsearch client"""
+
+    def __init__(self, body: JSONType) -> None:
+        self.body = body
+
+
+class FakeElasticsearch:
+    """Fake Elasticsearch client, answering searches from documents
+
+    Searches in the taxonomy index (to translate facets values)
+    are answered with made up entries for the requested ids,
+    and completion suggestions with made up synonyms.
+
+    :param documents: documents to take hits from and compute aggregations on
+    :param taxonomy_index: name of the taxonomy index
+    :param latency: time to wait before answering, in seconds,
+      to simulate the time spent by Elasticsearch
+    """
+
+    def __init__(
+        self,
+        documents: list[JSONType],
+        taxonomy_index: str | None = None,
+        latency: float = 0.0,
+    ) -> None:
+        self.documents = documents
+        self.taxonomy_index = taxonomy_index
+        self.latency = latency
+        self.searches = 0
+        self.indices = FakeIndices()
+
+    def search(self, index: Any = None, body: JSONType | None = None, **params):
+        self.searches += 1
+        body = body or {}
+        if self.latency:
+            time.sleep(self.latency)
+        documents = self.documents
+        if "suggest" in body:
+            # only suggestions are used
+            documents = []
+        elif self.taxonomy_index in (index if isinstance(index, list) else [index]):
+            documents = _taxonomy_entries(body)
+        response = fake_search_response(body, documents, took=int(self.latency * 1000))
+        if "suggest" in body:
+            response["suggest"] = _suggest_response(body["suggest"])
+        # like the real client, return a fresh object, parsed from JSON
+        return FakeResponse(orjson.loads(orjson.dumps(response)))
+
+
+def use_fake_elasticsearch(es_client: FakeElasticsearch) -> None:
+    """Make elasticsearch-dsl use the fake client as default connection"""
+    connections.add_connection("default", es_client)
@@ -0,0 +1,98 @@
+"""Benchmark of the import pipeline, without Elasticsearch
+
+Documents are read, parsed, preprocessed, transformed and serialized
+as in a real import, but bulk requests are sent to a null sink.
+"""
+
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import cast
+
+from elasticsearch import Elasticsearch
+
+from app._import import gen_documents
+from app._types import JSONType
+from app.bulk_writer import BulkWriter
+from app.config import IndexConfig
+from app.import_metrics import ImportMetrics
+from app.indexing import DocumentProcessor
+
+BENCHMARK_INDEX = "benchmark"
+
+
+class NullElasticsearch:
+    """Stand-in for the Elasticsearch client, acknowledging all bulk actions"""
+
+    def bulk(self, operations: list[bytes]) -> JSONType:
+        # index actions are followed by the document line
+        items = []
+        lines = iter(operations)
+        for line in lines:
+            op_type = "delete" if line.startswith(b'{"delete"') else "index"
+            if op_type != "delete":
+                next(lines)
+            items.append({op_type: {"status": 201}})
+        return {"errors": False, "items": items}
+
+
+def peak_rss() -> int:
+    """Peak resident set size of the current process, in bytes"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _timed_preprocess(processor: DocumentProcessor, metrics: ImportMetrics) -> None:
+    """Measure time spent in the preprocessor, in the `preprocess` stage"""
+    preprocessor = processor.preprocessor
+    if preprocessor is None:
+        return
+    preprocess = preprocessor.preprocess
+
+    def timed_preprocess(document):
+        with metrics.stage("preprocess"):
+            return preprocess(document)
+
+    preprocessor.preprocess = timed_preprocess  # type: ignore[method-assign]
+
+
+def benchmark_import(
+    config: IndexConfig, file_path: Path, num_items: int | None = None
+) -> JSONType:
+    """Run the import pipeline on a file, in the current process
+
+    :param config: the index configuration
+    :param file_path: the JSONL file to import
+    :param num_items: max number of items to import, default to no limit
+    :return: a report with the time spent and throughput of each stage
+      (`transform` includes `preprocess`), and the peak RSS
+    """
+    # no periodic logs
+    metrics = ImportMetrics(log_interval=float("inf"))
+    processor = DocumentProcessor(config)
+    _timed_preprocess(processor, metrics)
+    writer = BulkWriter(cast(Elasticsearch, NullElasticsearch()), metrics)
+    start = time.perf_counter()
+    success, errors = writer.write(
+        gen_documents(processor, file_path, BENCHMARK_INDEX, num_items, 1, 0, metrics)
+    )
+    metrics.stop()
+    duration = time.perf_counter() - start
+    stages = {}
+    for name, stage_duration in metrics.timings.items():
+        stages[name] = {
+            "seconds": stage_duration,
+            "docs_per_sec": success / stage_duration if stage_duration else None,
+        }
+    return {
+        "file": str(file_path),
+        "documents": success,
+        "errors": len(errors),
+        "duration": duration,
+        "docs_per_sec": success / duration if duration else None,
+        "stages": stages,
+        "counts": dict(metrics.counts),
+        "peak_rss_bytes": peak_rss(),
+    }
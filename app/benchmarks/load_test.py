@@ -0,0 +1,233 @@
+"""Load test of the API, replaying recorded requests
+
+Requests are sent at a target rate, whatever the response times
+(an "open" model, like real users), so that latencies include
+the time spent waiting for a free API worker.
+
+The API can be a running server, or the FastAPI app run in process,
+optionally with a fake Elasticsearch (see :py:mod:`app.benchmarks.fake_es`).
+"""
+
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+try:
+    import httpx
+except ImportError:
+    # httpx is only a development dependency
+    raise RuntimeError(
+        "The load test requires the httpx python package, "
+        "install development dependencies with `poetry install --with dev`"
+    )
+
+from app import config
+from app._types import JSONType
+from app.utils.io import jsonl_iter
+
+from .fake_es import FakeElasticsearch, indexed_documents, use_fake_elasticsearch
+from .search_benchmark import QUERIES
+
+# recorded requests used when none are provided
+DEFAULT_REQUESTS: list[JSONType] = [
+    {"method": "POST", "path": "/search", "json": query["params"]} for query in QUERIES
+] + [
+    {
+        "method": "GET",
+        "path": "/autocomplete",
+        "params": {"q": prefix, "taxonomy_names": "categories,labels", "langs": "en"},
+    }
+    for prefix in ("c", "ch", "cho", "choc", "choco", "b", "bi", "bis")
+]
+
+
+@dataclass
+class RecordedRequest:
+    """A request to the API
+
+    :param method: the HTTP method
+    :param path: the path, eg. `/search`
+    :param params: query parameters
+    :param json: JSON body
+    """
+
+    method: str
+    path: str
+    params: dict[str, Any] | None = None
+    json: JSONType | None = None
+
+
+def load_requests(file_path: Path | None = None) -> list[RecordedRequest]:
+    """Load recorded requests from a JSONL file, or default ones
+
+    Each line is a request, with `method`, `path`,
+    and eventually `params` (query parameters) and `json` (JSON body).
+    """
+    items = jsonl_iter(file_path) if file_path is not None else DEFAULT_REQUESTS
+    return [RecordedRequest(**item) for item in items]
+
+
+def remote_client(url: str) -> httpx.AsyncClient:
+    """A client sending requests to a running API
+
+    :param url: the base URL of the API
+    """
+    return httpx.AsyncClient(base_url=url)
+
+
+def in_process_client(
+    fake_es: bool = True,
+    es_latency: float = 0.0,
+    index_id: str | None = None,
+    num_documents: int = 200,
+) -> httpx.AsyncClient:
+    """A client sending requests to the API app, run in the current process
+
+    :param fake_es: if True, Elasticsearch is replaced by a fake client
+    :param es_latency: latency of the fake Elasticsearch, in seconds
+    :param index_id: the index the fake Elasticsearch generates documents for
+    :param num_documents: number of documents used to build fake responses
+    """
+    from app.api import app
+
+    if fake_es:
+        _, index_config = config.get_config().get_index_config(index_id)
+        use_fake_elasticsearch(
+            FakeElasticsearch(
+                indexed_documents(index_config, num_documents),
+                taxonomy_index=index_config.taxonomy.index.name,
+                latency=es_latency,
+            )
+        )
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+        base_url="http://api",
+    )
+
+
+def percentile(values: list[float], percent: float) -> float | None:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+@dataclass
+class LoadTestResults:
+    """Latencies and errors of a load test, by endpoint"""
+
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    statuses: dict[str, Counter[str]] = field(default_factory=dict)
+
+    def add(self, endpoint: str, latency: float, status: str) -> None:
+        self.latencies.setdefault(endpoint, []).append(latency)
+        self.statuses.setdefault(endpoint, Counter())[status] += 1
+
+    def endpoint_report(
+        self, latencies: list[float], statuses: Counter[str], duration: float
+    ) -> JSONType:
+        latencies = sorted(latencies)
+        num_requests = sum(statuses.values())
+        num_errors = sum(
+            count for status, count in statuses.items() if not status.startswith("2")
+        )
+        return {
+            "requests": num_requests,
+            "throughput": num_requests / duration if duration else None,
+            "error_rate": num_errors / num_requests if num_requests else None,
+            "statuses": dict(statuses),
+            "latency_ms": {
+                name: (value * 1000 if value is not None else None)
+                for name, value in (
+                    ("p50", percentile(latencies, 50)),
+                    ("p95", percentile(latencies, 95)),
+                    ("p99", percentile(latencies, 99)),
+                    ("max", latencies[-1] if latencies else None),
+                )
+            },
+        }
+
+    def report(self, duration: float) -> JSONType:
+        all_statuses: Counter[str] = Counter()
+        for statuses in self.statuses.values():
+            all_statuses.update(statuses)
+        return {
+            "duration": duration,
+            **self.endpoint_report(
+                [
+                    latency
+                    for latencies in self.latencies.values()
+                    for latency in latencies
+                ],
+                all_statuses,
+                duration,
+            ),
+            "endpoints": {
+                endpoint: self.endpoint_report(
+                    self.latencies[endpoint], self.statuses[endpoint], duration
+                )
+                for endpoint in self.latencies
+            },
+        }
+
+
+async def run_load_test(
+    client: httpx.AsyncClient,
+    requests: list[RecordedRequest],
+    rate: float,
+    duration: float,
+    concurrency: int = 100,
+    warmup: bool = True,
+) -> JSONType:
+    """Send requests at a target rate, and report latencies and errors
+
+    Requests are replayed in order, cycling through them.
+
+    :param client: the client to send requests with
+    :param requests: the requests to replay
+    :param rate: the number of requests to send per second
+    :param duration: the duration of the test, in seconds
+    :param concurrency: max number of pending requests,
+      further requests wait (and their latency includes this wait)
+    :param warmup: if True, first send each request once, without measuring,
+      so that caches built on first use don't skew results
+    :return: for all requests and by endpoint: throughput, error rate,
+      statuses (or exception names) and latency percentiles
+    """
+    if warmup:
+        for request in requests:
+            await client.request(
+                request.method, request.path, params=request.params, json=request.json
+            )
+    results = LoadTestResults()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(request: RecordedRequest, scheduled: float) -> None:
+        async with semaphore:
+            try:
+                response = await client.request(
+                    request.method,
+                    request.path,
+                    params=request.params,
+                    json=request.json,
+                )
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+        # latency since the request should have been sent
+        results.add(request.path, time.perf_counter() - scheduled, status)
+
+    num_requests = int(rate * duration)
+    start = time.perf_counter()
+    tasks = []
+    for i in range(num_requests):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(requests[i % len(requests)], scheduled)))
+    await asyncio.gather(*tasks)
+    return results.report(time.perf_counter() - start)
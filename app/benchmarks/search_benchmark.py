@@ -0,0 +1,213 @@
+"""Benchmark of the search pipeline, without Elasticsearch
+
+A corpus of queries is run through `app.search.search`,
+with a fake Elasticsearch client answering with canned responses,
+then serialized like the API does.
+Durations of each stage are measured by a `StageTimer`,
+and optionally the peak of memory allocated by each stage,
+with an `AllocationTimer`.
+"""
+
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+from fastapi.encoders import jsonable_encoder
+
+from app import config
+from app._types import JSONType, PostSearchParameters
+from app.metrics import StageTimer
+from app.search import search
+
+from .fake_es import FakeElasticsearch, indexed_documents, use_fake_elasticsearch
+
+# realistic queries, on the Open Food Facts configuration
+QUERIES: list[JSONType] = [
+    {"name": "free_text", "params": {"q": "chocolate milk", "langs": ["en"]}},
+    {
+        "name": "free_text_langs",
+        "params": {
+            "q": "chocolat noir bio",
+            "langs": ["fr", "en", "de"],
+            "boost_phrase": True,
+        },
+    },
+    {
+        "name": "filters",
+        "params": {
+            "q": 'categories:"en:biscuits" AND labels:"en:organic" '
+            "AND nutriscore_grade:(a OR b)",
+            "langs": ["en"],
+        },
+    },
+    {
+        "name": "ranges_sort",
+        "params": {
+            "q": "cereals unique_scans_n:>100 AND nutriments.fat_100g:[1 TO 20]",
+            "langs": ["en"],
+            "sort_by": "-unique_scans_n",
+        },
+    },
+    {
+        "name": "sort_script",
+        "params": {
+            "q": "biscuits",
+            "langs": ["en", "fr"],
+            "sort_by": "personal_score",
+            "sort_params": {"eco_score": 1, "nutri_score": 2, "nova_group": 1},
+        },
+    },
+    {
+        "name": "facets",
+        "params": {
+            "q": "sugar",
+            "langs": ["en"],
+            "facets": [
+                "categories",
+                "labels",
+                "brands",
+                "nutrition_grades",
+                "ecoscore_grade",
+                "nova_groups",
+            ],
+        },
+    },
+    {
+        "name": "charts",
+        "params": {
+            "q": "juice",
+            "langs": ["en"],
+            "charts": [
+                {"chart_type": "DistributionChart", "field": "nutriscore_grade"},
+                {"chart_type": "HistogramChart", "field": "nutriments.sugars_100g"},
+                {"chart_type": "StatsChart", "field": "unique_scans_n"},
+                {
+                    "chart_type": "ScatterChart",
+                    "x": "nutriments.sugars_100g",
+                    "y": "nutriments.fat_100g",
+                },
+            ],
+        },
+    },
+    {
+        "name": "large_page",
+        "params": {"q": "organic", "langs": ["en", "fr"], "page_size": 100},
+    },
+]
+
+
+def _stage_stats(durations: list[float]) -> JSONType:
+    """Statistics of a stage durations (in seconds), in milliseconds"""
+    durations = sorted(durations)
+    mean = statistics.fmean(durations)
+    return {
+        "mean_ms": mean * 1000,
+        "p50_ms": durations[len(durations) // 2] * 1000,
+        "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000,
+        "ops_per_sec": 1 / mean if mean else None,
+    }
+
+
+class AllocationTimer(StageTimer):
+    """A `StageTimer` which also measures the peak of memory allocated
+    during each stage, in bytes
+
+    tracemalloc must be tracing memory allocations.
+    Stages must not be nested.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.peak_allocs: dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        tracemalloc.reset_peak()
+        start_size = tracemalloc.get_traced_memory()[0]
+        try:
+            with super().stage(name):
+                yield
+        finally:
+            peak = tracemalloc.get_traced_memory()[1] - start_size
+            self.peak_allocs[name] = max(self.peak_allocs.get(name, 0), peak)
+
+
+def run_search(
+    params: PostSearchParameters, timer: StageTimer | None = None
+) -> StageTimer:
+    """Run a search and serialize its result, like the API does"""
+    timer = timer or StageTimer()
+    start = time.perf_counter()
+    result = search(params, timer)
+    with timer.stage("serialization"):
+        json.dumps(jsonable_encoder(result))
+    timer.add("total", time.perf_counter() - start)
+    return timer
+
+
+def benchmark_search(
+    index_id: str,
+    queries: Iterable[JSONType] = QUERIES,
+    iterations: int = 100,
+    warmup: int = 5,
+    num_documents: int = 200,
+    allocations: bool = False,
+) -> JSONType:
+    """Run each query `iterations` times and report durations of each stage
+
+    Elasticsearch is replaced by a fake client, so `es_request` only measures
+    the fake answer and the parsing of the response by elasticsearch-dsl.
+
+    :param index_id: the index to search, in the global configuration
+    :param queries: queries to run, each with a `name` and search `params`
+    :param iterations: number of measured runs of each query
+    :param warmup: number of runs before measuring (to fill caches)
+    :param num_documents: number of documents used to build responses
+    :param allocations: if True, also measure the peak of memory allocations
+      of a search, and of each of its stages
+      (it runs the query one more time, with tracemalloc)
+    """
+    index_config = config.get_config().indices[index_id]
+    use_fake_elasticsearch(
+        FakeElasticsearch(
+            indexed_documents(index_config, num_documents),
+            taxonomy_index=index_config.taxonomy.index.name,
+        )
+    )
+    report: JSONType = {"iterations": iterations, "queries": {}}
+    all_durations: dict[str, list[float]] = {}
+    for query in queries:
+        params = PostSearchParameters(index_id=index_id, **query["params"])
+        for _ in range(warmup):
+            run_search(params)
+        durations: dict[str, list[float]] = {}
+        for _ in range(iterations):
+            timer = run_search(params)
+            for stage, duration in timer.durations.items():
+                durations.setdefault(stage, []).append(duration)
+                all_durations.setdefault(stage, []).append(duration)
+        query_report: JSONType = {
+            "stages": {
+                stage: _stage_stats(stage_durations)
+                for stage, stage_durations in durations.items()
+            }
+        }
+        if allocations:
+            timer = AllocationTimer()
+            tracemalloc.start()
+            try:
+                run_search(params, timer)
+                query_report["peak_alloc_bytes"] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            for stage, peak_alloc in timer.peak_allocs.items():
+                query_report["stages"][stage]["peak_alloc_bytes"] = peak_alloc
+        report["queries"][query["name"]] = query_report
+    report["stages"] = {
+        stage: _stage_stats(stage_durations)
+        for stage, stage_durations in all_durations.items()
+    }
+    return report
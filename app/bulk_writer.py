@@ -0,0 +1,314 @@
+"""Send documents to Elasticsearch with bulk requests
+
+This is similar to :py:func:`elasticsearch.helpers.bulk`,
+but it also reports metrics on bulk requests and errors,
+and adapts to the load of the cluster:
+
+* chunks are sized in bytes, they shrink when bulk requests are slow
+  or rejected, and grow back when they are fast
+* items rejected because the cluster is overloaded are retried with backoff
+* a semaphore can be shared between processes to limit concurrent bulk requests
+* chunks can be sent by several threads, so that preparing documents
+  continues while Elasticsearch processes previous chunks
+
+Actions are serialized with orjson, and the resulting bytes
+are sent as is by the client.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Iterable, Iterator
+
+import elasticsearch
+import orjson
+from elasticsearch import Elasticsearch, JsonSerializer
+from elasticsearch.helpers import expand_action
+
+from app._types import JSONType
+from app.config import settings
+from app.import_metrics import ImportMetrics
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_BYTES = 5 * 1024 * 1024
+MIN_CHUNK_BYTES = 256 * 1024
+MAX_CHUNK_BYTES = 32 * 1024 * 1024
+# to avoid too many small documents in a request
+MAX_CHUNK_ACTIONS = 10000
+# chunk size factor, when a bulk request was fast
+CHUNK_GROWTH = 1.25
+INITIAL_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+# status of items rejected because the cluster is overloaded
+REJECTED_STATUS = 429
+# max number of chunks waiting to be sent, per sender thread
+PENDING_CHUNKS_PER_SENDER = 2
+
+# the lines of a serialized action
+ActionLines = list[bytes]
+
+
+# used for types orjson does not support
+_ES_SERIALIZER = JsonSerializer()
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize data to JSON, like the Elasticsearch client but faster"""
+    return orjson.dumps(data, default=_ES_SERIALIZER.default)
+
+
+def action_size(lines: ActionLines) -> int:
+    # + 1 for the newline
+    return sum(len(line) + 1 for line in lines)
+
+
+class BulkWriter:
+    """Send actions to Elasticsearch using bulk requests
+
+    Actions are in the format accepted by :py:func:`elasticsearch.helpers.bulk`,
+    or already serialized, as the lines of the action (see `serialize`).
+
+    :param es_client: the Elasticsearch client
+    :param metrics: metrics to report to
+    :param chunk_bytes: initial size of chunks, in bytes
+    :param target_latency: target duration of bulk requests, in seconds,
+      chunks shrink when requests are slower,
+      and grow when they take less than half of it
+    :param max_retries: max number of retries of rejected items
+    :param semaphore: if provided, acquired during bulk requests,
+      this enables to limit concurrent requests across processes
+    :param senders: number of threads sending chunks,
+      if 1, chunks are sent by the calling thread
+    """
+
+    def __init__(
+        self,
+        es_client: Elasticsearch,
+        metrics: ImportMetrics | None = None,
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+        target_latency: float | None = None,
+        max_retries: int | None = None,
+        semaphore: ContextManager | None = None,
+        senders: int = 1,
+    ) -> None:
+        self.es_client = es_client
+        self.metrics = metrics or ImportMetrics()
+        self.chunk_bytes = chunk_bytes
+        self.target_latency = (
+            settings.import_bulk_target_latency
+            if target_latency is None
+            else target_latency
+        )
+        self.max_retries = (
+            settings.import_bulk_max_retries if max_retries is None else max_retries
+        )
+        self.semaphore = semaphore or nullcontext()
+        self.senders = senders
+
+    def serialize(self, action: JSONType | ActionLines) -> ActionLines:
+        """Serialize an action to the lines of a bulk request
+
+        Already serialized actions are returned as is.
+        """
+        if isinstance(action, list):
+            return action
+        header, data = expand_action(action)
+        lines = [dumps(header)]
+        if data is not None:
+            lines.append(dumps(data))
+        return lines
+
+    def chunks(
+        self, actions: Iterable[JSONType | ActionLines]
+    ) -> Iterator[list[ActionLines]]:
+        """Group serialized actions in chunks of (about) `self.chunk_bytes`
+
+        As chunks are generated lazily,
+        a change of `self.chunk_bytes` applies to the next chunk.
+
+        :yield: the serialized actions of the chunk
+        """
+        chunk: list[ActionLines] = []
+        size = 0
+        for action in actions:
+            with self.metrics.stage("serialize"):
+                lines = self.serialize(action)
+            lines_size = action_size(lines)
+            if chunk and (
+                len(chunk) >= MAX_CHUNK_ACTIONS or size + lines_size > self.chunk_bytes
+            ):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(lines)
+            size += lines_size
+        if chunk:
+            yield chunk
+
+    def adapt_chunk_bytes(self, duration: float, rejected: bool) -> None:
+        """Shrink chunks if the cluster is overloaded, grow them if it is fast"""
+        previous = self.chunk_bytes
+        if rejected or duration > self.target_latency:
+            self.chunk_bytes = max(MIN_CHUNK_BYTES, self.chunk_bytes // 2)
+        elif duration < self.target_latency / 2:
+            self.chunk_bytes = min(
+                MAX_CHUNK_BYTES, int(self.chunk_bytes * CHUNK_GROWTH)
+            )
+        if self.chunk_bytes != previous:
+            logger.debug(
+                "[%d] Bulk chunk size: %d bytes (request took %.2fs, rejected: %s)",
+                self.metrics.worker,
+                self.chunk_bytes,
+                duration,
+                rejected,
+            )
+
+    def send(
+        self, chunk: list[ActionLines]
+    ) -> tuple[int, list[JSONType], list[ActionLines]]:
+        """Send a chunk of serialized actions in one bulk request
+
+        :return: the number of successful actions, the failed items,
+          and the actions rejected because the cluster is overloaded
+        """
+        lines = [line for action_lines in chunk for line in action_lines]
+        num_bytes = sum(action_size(action_lines) for action_lines in chunk)
+        start = time.perf_counter()
+        try:
+            with self.semaphore:
+                # lines are already serialized, the client sends them as is
+                response = self.es_client.bulk(
+                    operations=lines  # type: ignore[arg-type]
+                )
+        except elasticsearch.ApiError as e:
+            if e.meta.status != REJECTED_STATUS:
+                self.metrics.record_error(type(e).__name__)
+                raise
+            # the whole request was rejected
+            self.metrics.record_error(f"status_{REJECTED_STATUS}", len(chunk))
+            self.adapt_chunk_bytes(time.perf_counter() - start, rejected=True)
+            return 0, [], chunk
+        except Exception as e:
+            self.metrics.record_error(type(e).__name__)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.metrics.record_bulk(num_bytes, duration)
+        success = 0
+        errors = []
+        rejected = []
+        for action_lines, item in zip(chunk, response["items"]):
+            op_type, result = next(iter(item.items()))
+            status = result.get("status", 500)
+            if 200 <= status < 300:
+                success += 1
+                continue
+            error = result.get("error")
+            self.metrics.record_error(
+                error["type"] if isinstance(error, dict) else f"status_{status}"
+            )
+            if status == REJECTED_STATUS:
+                rejected.append(action_lines)
+            else:
+                errors.append({op_type: result})
+        self.adapt_chunk_bytes(duration, rejected=bool(rejected))
+        self.metrics.count("acknowledged", success)
+        self.metrics.count("failed", len(errors))
+        return success, errors, rejected
+
+    def send_with_retries(self, chunk: list[ActionLines]) -> tuple[int, list[JSONType]]:
+        """Send a chunk, retrying rejected actions with exponential backoff
+
+        :return: the number of successful actions and the failed items
+        """
+        success = 0
+        errors: list[JSONType] = []
+        for attempt in range(self.max_retries + 1):
+            chunk_success, chunk_errors, chunk = self.send(chunk)
+            success += chunk_success
+            errors.extend(chunk_errors)
+            if not chunk:
+                break
+            if attempt < self.max_retries:
+                self.metrics.record_retry(f"status_{REJECTED_STATUS}", len(chunk))
+                time.sleep(min(MAX_BACKOFF, INITIAL_BACKOFF * 2**attempt))
+        else:
+            # still rejected after max retries
+            self.metrics.count("failed", len(chunk))
+            for action_lines in chunk:
+                op_type, meta = next(iter(orjson.loads(action_lines[0]).items()))
+                errors.append(
+                    {
+                        op_type: {
+                            **meta,
+                            "status": REJECTED_STATUS,
+                            "error": f"rejected after {self.max_retries} retries",
+                        }
+                    }
+                )
+        return success, errors
+
+    def write(
+        self,
+        actions: Iterable[JSONType | ActionLines],
+        on_chunk_sent: Callable[[int], None] | None = None,
+    ) -> tuple[int, list[JSONType]]:
+        """Send actions to Elasticsearch
+
+        With several senders, actions are serialized in chunks by the calling
+        thread while sender threads send previous chunks.
+        At most `PENDING_CHUNKS_PER_SENDER` chunks per sender are kept in memory.
+
+        :param actions: the actions to send
+        :param on_chunk_sent: if provided, called with the number of actions
+          of each chunk, once Elasticsearch processed it (successfully or not).
+          It is called from the calling thread, in the order of chunks.
+        :return: the number of successful actions and the failed items,
+          like :py:func:`elasticsearch.helpers.bulk` with `raise_on_error=False`
+        """
+        success = 0
+        errors: list[JSONType] = []
+
+        def chunk_done(chunk_result: tuple[int, list[JSONType]], size: int) -> None:
+            nonlocal success
+            success += chunk_result[0]
+            errors.extend(chunk_result[1])
+            if on_chunk_sent is not None:
+                on_chunk_sent(size)
+            self.metrics.maybe_log()
+
+        if self.senders <= 1:
+            for chunk in self.chunks(actions):
+                chunk_done(self.send_with_retries(chunk), len(chunk))
+            return success, errors
+        max_pending = self.senders * PENDING_CHUNKS_PER_SENDER
+        # chunks being sent, in order
+        pending: deque[tuple[Future, int]] = deque()
+        with ThreadPoolExecutor(
+            self.senders, thread_name_prefix="bulk-sender"
+        ) as executor:
+            try:
+                for chunk in self.chunks(actions):
+                    pending.append(
+                        (executor.submit(self.send_with_retries, chunk), len(chunk))
+                    )
+                    # wait for the oldest chunk if too many are pending,
+                    # and report chunks that are already sent
+                    while pending and (
+                        len(pending) >= max_pending or pending[0][0].done()
+                    ):
+                        future, size = pending.popleft()
+                        with self.metrics.stage("wait_senders"):
+                            chunk_result = future.result()
+                        chunk_done(chunk_result, size)
+                while pending:
+                    future, size = pending.popleft()
+                    with self.metrics.stage("wait_senders"):
+                        chunk_result = future.result()
+                    chunk_done(chunk_result, size)
+            except BaseException:
+                executor.shutdown(cancel_futures=True)
+                raise
+        return success, errors
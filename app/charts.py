@@ -1,11 +1,15 @@
 from functools import reduce
+from typing import Any, Callable
 
 from . import config
 from ._types import (
     ChartsInfos,
     ChartType,
     DistributionChart,
+    HistogramChart,
+    JSONType,
     ScatterChart,
+    StatsChart,
     SuccessSearchResponse,
 )
 
@@ -43,8 +47,18 @@ def empty_chart(chart_name):
     }
 
 
+def distribution_values(agg_data: JSONType | None):
+    """Transform terms aggregation buckets to chart values"""
+    buckets = agg_data.get("buckets", []) if agg_data else []
+    values = [
+        {"category": bucket["key"], "amount": bucket["doc_count"]} for bucket in buckets
+    ]
+    values.sort(key=lambda x: x["category"])
+    return values
+
+
 def build_distribution_chart(
-    chart: DistributionChart, values, index_config: config.IndexConfig
+    chart: DistributionChart, index_config: config.IndexConfig
 ):
     """
     Return the vega structure for a Bar Chart
@@ -54,7 +68,7 @@ def build_distribution_chart(
     vega_chart["data"] = [
         {
             "name": "table",
-            "values": values,
+            "values": [],
             "transform": [{"type": "filter", "expr": "datum['category'] != 'unknown'"}],
         },
     ]
@@ -138,32 +152,44 @@ def build_distribution_chart(
     return vega_chart
 
 
-def build_scatter_chart(
-    chart_option: ScatterChart, search_result, index_config: config.IndexConfig
-):
+def _vega_field(field: str) -> str:
+    """Field name to use in vega
+
+    nutriments.xxx is broken in vega.
+    I think it searches for nutriments[xxx]
+    might be expected ^^
     """
-    Build a scatter plot only for values from search_results
+    return field.replace(".", "__")
+
+
+def scatter_values(chart_option: ScatterChart, search_result: SuccessSearchResponse):
+    """Get scatter plot values from search_results
     (only values in the current page)
     TODO: use values from the whole search?
-    Inspiration: https://vega.github.io/vega/examples/scatter-plot/
     """
 
     def _get(v, path):
         return reduce(lambda c, k: c.get(k, {}), path.split("."), v)
 
-    chart = empty_chart(f"{chart_option.x} x {chart_option.y}")
-
-    # nutriments.xxx is broken in vega.
-    # I think it searches for nutriments[xxx]
-    # might be expected ^^
-    vega_x = chart_option.x.replace(".", "__")
-    vega_y = chart_option.y.replace(".", "__")
-    values = [
+    vega_x = _vega_field(chart_option.x)
+    vega_y = _vega_field(chart_option.y)
+    return [
         {vega_x: _get(v, chart_option.x), vega_y: _get(v, chart_option.y)}
         for v in search_result.hits
     ]
 
-    chart["data"] = [{"name": "source", "values": values}]
+
+def build_scatter_chart(chart_option: ScatterChart, index_config: config.IndexConfig):
+    """
+    Return the vega structure for a scatter plot
+    Inspiration: https://vega.github.io/vega/examples/scatter-plot/
+    """
+    chart = empty_chart(f"{chart_option.x} x {chart_option.y}")
+
+    vega_x = _vega_field(chart_option.x)
+    vega_y = _vega_field(chart_option.y)
+
+    chart["data"] = [{"name": "source", "values": []}]
     chart["scales"] = [
         {
             "name": "x",
@@ -225,42 +251,264 @@ def build_scatter_chart(
     return chart
 
 
+def histogram_values(chart: HistogramChart, agg_data: JSONType | None):
+    """Transform histogram aggregation buckets to chart values"""
+    buckets = agg_data.get("buckets", []) if agg_data else []
+    if chart.interval is not None:
+        return [
+            {
+                "start": bucket["key"],
+                "end": bucket["key"] + chart.interval,
+                "amount": bucket["doc_count"],
+            }
+            for bucket in buckets
+        ]
+    # variable width histogram gives us the boundaries
+    return [
+        {"start": bucket["min"], "end": bucket["max"], "amount": bucket["doc_count"]}
+        for bucket in buckets
+    ]
+
+
+def build_histogram_chart(chart: HistogramChart, index_config: config.IndexConfig):
+    """
+    Return the vega structure for an histogram on a numeric field
+    Inspiration: https://vega.github.io/vega/examples/histogram/
+    """
+    vega_chart = empty_chart(chart.field)
+    vega_chart["data"] = [{"name": "table", "values": []}]
+    vega_chart["scales"] = [
+        {
+            "name": "xscale",
+            "type": "linear",
+            "domain": {"data": "table", "fields": ["start", "end"]},
+            "range": "width",
+            "nice": True,
+            "zero": False,
+        },
+        {
+            "name": "yscale",
+            "domain": {"data": "table", "field": "amount"},
+            "nice": True,
+            "range": "height",
+        },
+    ]
+    vega_chart["axes"] = [
+        {"orient": "bottom", "scale": "xscale", "tickCount": 10},
+        {"orient": "left", "scale": "yscale", "tickCount": 5},
+    ]
+    vega_chart["marks"] = [
+        {
+            "type": "rect",
+            "from": {"data": "table"},
+            "encode": {
+                "enter": {
+                    "x": {"scale": "xscale", "field": "start", "offset": 1},
+                    "x2": {"scale": "xscale", "field": "end"},
+                    "y": {"scale": "yscale", "field": "amount"},
+                    "y2": {"scale": "yscale", "value": 0},
+                    "tooltip": {"field": "amount"},
+                },
+                "update": {
+                    "fill": {"value": index_config.primary_color},
+                },
+                "hover": {
+                    "fill": {"value": index_config.accent_color},
+                },
+            },
+        },
+    ]
+    return vega_chart
+
+
+def stats_values(agg_data: JSONType | None):
+    """Transform statistics aggregation to chart values"""
+    if not agg_data or not agg_data.get("stats", {}).get("count"):
+        return []
+    stats = agg_data["stats"]
+    percentiles = agg_data.get("percentiles", {}).get("values", {})
+    return [
+        {
+            "count": stats["count"],
+            "min": stats["min"],
+            "max": stats["max"],
+            "avg": stats["avg"],
+            "p5": percentiles.get("5.0"),
+            "q1": percentiles.get("25.0"),
+            "median": percentiles.get("50.0"),
+            "q3": percentiles.get("75.0"),
+            "p95": percentiles.get("95.0"),
+        }
+    ]
+
+
+def build_stats_chart(chart: StatsChart, index_config: config.IndexConfig):
+    """
+    Return the vega structure for a box plot, showing statistics of a numeric field
+
+    Whiskers goes from 5th to 95th percentile, the box from 1st to 3rd quartile.
+    Inspiration: https://vega.github.io/vega/examples/box-plot/
+    """
+    vega_chart = empty_chart(chart.field)
+    vega_chart["height"] = 60
+    vega_chart["data"] = [{"name": "table", "values": []}]
+    vega_chart["scales"] = [
+        {
+            "name": "xscale",
+            "type": "linear",
+            "domain": {"data": "table", "fields": ["min", "max"]},
+            "range": "width",
+            "nice": True,
+            "zero": False,
+        },
+    ]
+    vega_chart["axes"] = [{"orient": "bottom", "scale": "xscale", "tickCount": 10}]
+    vega_chart["marks"] = [
+        {
+            "type": "rule",
+            "from": {"data": "table"},
+            "encode": {
+                "enter": {
+                    "x": {"scale": "xscale", "field": "p5"},
+                    "x2": {"scale": "xscale", "field": "p95"},
+                    "y": {"signal": "height / 2"},
+                    "stroke": {"value": index_config.accent_color},
+                },
+            },
+        },
+        {
+            "type": "rect",
+            "from": {"data": "table"},
+            "encode": {
+                "enter": {
+                    "x": {"scale": "xscale", "field": "q1"},
+                    "x2": {"scale": "xscale", "field": "q3"},
+                    "y": {"signal": "height / 4"},
+                    "y2": {"signal": "height * 3 / 4"},
+                    "fill": {"value": index_config.primary_color},
+                    "tooltip": {"signal": "datum"},
+                },
+            },
+        },
+        {
+            "type": "rect",
+            "from": {"data": "table"},
+            "encode": {
+                "enter": {
+                    "x": {"scale": "xscale", "field": "median"},
+                    "width": {"value": 2},
+                    "y": {"signal": "height / 4"},
+                    "y2": {"signal": "height * 3 / 4"},
+                    "fill": {"value": index_config.accent_color},
+                },
+            },
+        },
+    ]
+    return vega_chart
+
+
+_CHART_BUILDERS: dict[str, Callable[[Any, config.IndexConfig], JSONType]] = {
+    "DistributionChart": build_distribution_chart,
+    "ScatterChart": build_scatter_chart,
+    "HistogramChart": build_histogram_chart,
+    "StatsChart": build_stats_chart,
+}
+
+#: vega specifications, without values, by index and chart
+_CHART_TEMPLATES: dict[tuple[str, str, str], JSONType] = {}
+
+
+def chart_key(chart: ChartType) -> str:
+    """Key of the chart in search results"""
+    if isinstance(chart, ScatterChart):
+        return f"{chart.x}:{chart.y}"
+    elif isinstance(chart, DistributionChart):
+        return chart.field
+    return chart.name
+
+
+def chart_template(chart: ChartType, index_config: config.IndexConfig) -> JSONType:
+    """Return the vega specification of a chart, without values
+
+    Specifications only depend on the chart definition and on the index,
+    so they are built once.
+    They are shared, so they must not be modified.
+    """
+    key = (index_config.index.name, chart.chart_type, chart_key(chart))
+    template = _CHART_TEMPLATES.get(key)
+    if template is None:
+        template = _CHART_BUILDERS[chart.chart_type](chart, index_config)
+        _CHART_TEMPLATES[key] = template
+    return template
+
+
+def chart_data(template: JSONType, values: list[JSONType]) -> list[JSONType]:
+    """Return the data section of a chart template, with values injected
+
+    Values always go to the first data source.
+    Only the modified parts of the template are copied.
+    """
+    return [{**template["data"][0], "values": values}, *template["data"][1:]]
+
+
+def build_charts_templates(
+    index_config: config.IndexConfig, requested_charts: list[ChartType]
+) -> ChartsInfos:
+    """Return vega specifications, without values, for the requested charts"""
+    return {
+        chart_key(chart): chart_template(chart, index_config)
+        for chart in requested_charts
+    }
+
+
+def chart_values(
+    chart: ChartType, search_result: SuccessSearchResponse
+) -> list[JSONType] | None:
+    """Compute values of a chart from search results
+
+    :return: values, or None if the chart can't be computed
+    """
+    aggregations = search_result.aggregations
+    if isinstance(chart, ScatterChart):
+        return scatter_values(chart, search_result)
+    elif isinstance(chart, HistogramChart):
+        # histograms are computed by aggregations
+        return histogram_values(chart, (aggregations or {}).get(chart.name))
+    elif isinstance(chart, StatsChart):
+        # statistics are computed by aggregations
+        return stats_values((aggregations or {}).get(chart.name))
+    # distribution charts are created from aggregations
+    if aggregations is None:
+        return None
+    return distribution_values(aggregations.get(chart.field, {}))
+
+
 def build_charts(
     search_result: SuccessSearchResponse,
     index_config: config.IndexConfig,
     requested_charts: list[ChartType] | None,
+    data_only: bool = False,
 ) -> ChartsInfos:
     """
     Build and return vega charts representations for the given
     requested charts
+
+    :param data_only: if True, only return the data section of each chart,
+      specifications can be fetched separately (see `build_charts_templates`)
     """
     charts: ChartsInfos = {}
 
     if requested_charts is None:
         return charts
 
-    aggregations = search_result.aggregations
-
     for requested_chart in requested_charts:
-        if requested_chart.chart_type == "ScatterChart":
-            charts[f"{requested_chart.x}:{requested_chart.y}"] = build_scatter_chart(
-                requested_chart, search_result, index_config
-            )
-        else:
-            # distribution charts are created from aggregations
-            if aggregations is not None:
-                agg_data = aggregations.get(requested_chart.field, {})
-
-                buckets = agg_data.get("buckets", []) if agg_data else []
-
-                values = [
-                    {"category": bucket["key"], "amount": bucket["doc_count"]}
-                    for bucket in buckets
-                ]
-                values.sort(key=lambda x: x["category"])
-
-                charts[requested_chart.field] = build_distribution_chart(
-                    requested_chart, values, index_config
-                )
+        values = chart_values(requested_chart, search_result)
+        if values is None:
+            continue
+        template = chart_template(requested_chart, index_config)
+        data = chart_data(template, values)
+        charts[chart_key(requested_chart)] = (
+            {"data": data} if data_only else {**template, "data": data}
+        )
 
     return charts
@@ -66,6 +66,27 @@ def import_data(
             """
         ),
     ),
+    differential: bool = typer.Option(
+        default=False,
+        help=cd_(
+            """Only send documents whose content changed since last import,
+            and remove documents that are not in the file anymore.
+
+            This implies --partial.
+            """
+        ),
+    ),
+    resume: Optional[str] = typer.Option(
+        default=None,
+        help=cd_(
+            """Name of the temporary index of an interrupted import to resume.
+
+            Run it with the same input file and number of processes:
+            each process continues from its last checkpoint
+            instead of starting over in a new index.
+            """
+        ),
+    ),
     num_processes: int = typer.Option(
         default=2, help="How many import processes to run in parallel"
     ),
@@ -106,7 +127,10 @@ def import_data(
         index_config,
         num_items=num_items,
         skip_updates=skip_updates,
-        partial=partial,
+        partial=partial or differential,
+        resume_index=resume,
+        differential=differential,
+        index_id=index_id,
     )
     end_time = time.perf_counter()
     logger.info("Import time: %s seconds", end_time - start_time)
@@ -136,6 +160,13 @@ def import_taxonomies(
         default=False,
         help="Skip creating synonyms files for ES analyzers",
     ),
+    incremental: bool = typer.Option(
+        default=False,
+        help=(
+            "Download taxonomies again if they changed, "
+            "and only update changed taxonomies in the current index"
+        ),
+    ),
 ):
     """Import taxonomies into Elasticsearch.
 
@@ -162,7 +193,7 @@ def import_taxonomies(
         logger.info("Skipping indexing of taxonomies")
     else:
         start_time = time.perf_counter()
-        perform_taxonomy_import(index_config)
+        perform_taxonomy_import(index_config, incremental=incremental)
         end_time = time.perf_counter()
         logger.info("Import time: %s seconds", end_time - start_time)
     if skip_synonyms:
@@ -287,6 +318,206 @@ def run_update_daemon(
     run_update_daemon(global_config)
 
 
+@cli.command()
+def benchmark_import(
+    input_path: Optional[Path] = typer.Option(
+        default=None,
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+        help="Path of a JSONL data file, if not provided synthetic data is generated",
+    ),
+    num_items: int = typer.Option(
+        default=10000, help="How many items to generate or import"
+    ),
+    seed: int = typer.Option(default=0, help="Seed used to generate data"),
+    output: Optional[Path] = typer.Option(
+        default=None,
+        dir_okay=False,
+        file_okay=True,
+        help="Path of a JSON file to write the report to",
+    ),
+    config_path: Optional[Path] = typer.Option(
+        default=None,
+        help="path of the yaml configuration file, it overrides CONFIG_PATH envvar",
+        dir_okay=False,
+        file_okay=True,
+        exists=True,
+    ),
+    index_id: Optional[str] = typer.Option(
+        default=None,
+        help=INDEX_ID_HELP,
+    ),
+):
+    """Measure import throughput, without Elasticsearch.
+
+    Documents go through the import pipeline (read, parse, preprocess,
+    transform and serialization), but bulk requests are discarded.
+    The report gives the time spent and documents per second for each stage,
+    and the peak memory usage.
+
+    Synthetic data match the Open Food Facts configuration,
+    use --input-path with other configurations.
+    """
+    import json
+    import tempfile
+
+    from app.benchmarks.data_generation import write_products
+    from app.benchmarks.import_benchmark import benchmark_import
+
+    _, index_config = _get_index_config(config_path, index_id)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if input_path is None:
+            input_path = Path(tmp_dir) / "products.jsonl"
+            write_products(input_path, num_items, seed)
+        report = benchmark_import(index_config, input_path, num_items)
+    report_json = json.dumps(report, indent=2)
+    print(report_json)
+    if output is not None:
+        output.write_text(report_json)
+
+
+@cli.command()
+def benchmark_search(
+    queries_path: Optional[Path] = typer.Option(
+        default=None,
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+        help=cd_(
+            """Path of a JSONL file of queries, each with a `name`
+            and search `params` (as in a POST request).
+            Default to a built-in set of queries on the Open Food Facts index.
+            """
+        ),
+    ),
+    iterations: int = typer.Option(
+        default=100, help="How many times each query is run"
+    ),
+    allocations: bool = typer.Option(
+        default=False, help="Also measure the peak of memory allocations, by stage"
+    ),
+    output: Optional[Path] = typer.Option(
+        default=None,
+        dir_okay=False,
+        file_okay=True,
+        help="Path of a JSON file to write the report to",
+    ),
+    config_path: Optional[Path] = typer.Option(
+        default=None,
+        help="path of the yaml configuration file, it overrides CONFIG_PATH envvar",
+        dir_okay=False,
+        file_okay=True,
+        exists=True,
+    ),
+    index_id: Optional[str] = typer.Option(
+        default=None,
+        help=INDEX_ID_HELP,
+    ),
+):
+    """Measure the time spent in each stage of searches, without Elasticsearch.
+
+    Queries go through the search pipeline, from query parsing
+    to facets, charts and serialization of the response,
+    but a fake Elasticsearch answers with synthetic documents.
+    """
+    import json
+
+    from app.benchmarks import search_benchmark
+    from app.utils.io import jsonl_iter
+
+    index_id, _ = _get_index_config(config_path, index_id)
+    queries = (
+        list(jsonl_iter(queries_path))
+        if queries_path is not None
+        else search_benchmark.QUERIES
+    )
+    report = search_benchmark.benchmark_search(
+        index_id, queries, iterations=iterations, allocations=allocations
+    )
+    report_json = json.dumps(report, indent=2)
+    print(report_json)
+    if output is not None:
+        output.write_text(report_json)
+
+
+@cli.command()
+def load_test(
+    requests_path: Optional[Path] = typer.Option(
+        default=None,
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+        help=cd_(
+            """Path of a JSONL file of recorded requests,
+            each with `method`, `path`, and eventually `params` and `json`.
+            Default to a built-in set of searches and autocompletions.
+            """
+        ),
+    ),
+    rate: float = typer.Option(default=50, help="Requests to send per second"),
+    duration: float = typer.Option(default=10, help="Duration of the test, in seconds"),
+    concurrency: int = typer.Option(default=100, help="Max number of pending requests"),
+    url: Optional[str] = typer.Option(
+        default=None,
+        help="URL of a running API, if not provided the API is run in process",
+    ),
+    fake_es: bool = typer.Option(
+        default=True,
+        help="When running the API in process, replace Elasticsearch by a fake one",
+    ),
+    es_latency: float = typer.Option(
+        default=0.02, help="Latency of the fake Elasticsearch, in seconds"
+    ),
+    output: Optional[Path] = typer.Option(
+        default=None,
+        dir_okay=False,
+        file_okay=True,
+        help="Path of a JSON file to write the report to",
+    ),
+    config_path: Optional[Path] = typer.Option(
+        default=None,
+        help="path of the yaml configuration file, it overrides CONFIG_PATH envvar",
+        dir_okay=False,
+        file_okay=True,
+        exists=True,
+    ),
+    index_id: Optional[str] = typer.Option(
+        default=None,
+        help=INDEX_ID_HELP,
+    ),
+):
+    """Replay requests against the API at a target rate.
+
+    The report gives the throughput, error rate and latency percentiles
+    (p50, p95, p99), for all requests and by endpoint.
+    Latencies include the time requests wait when the API is saturated.
+    """
+    import asyncio
+    import json
+
+    from app.benchmarks import load_test as load_test_module
+
+    requests = load_test_module.load_requests(requests_path)
+    if url is not None:
+        client = load_test_module.remote_client(url)
+    else:
+        index_id, _ = _get_index_config(config_path, index_id)
+        client = load_test_module.in_process_client(fake_es, es_latency, index_id)
+
+    async def run():
+        async with client:
+            return await load_test_module.run_load_test(
+                client, requests, rate, duration, concurrency
+            )
+
+    report = asyncio.run(run())
+    report_json = json.dumps(report, indent=2)
+    print(report_json)
+    if output is not None:
+        output.write_text(report_json)
+
+
 @cli.command()
 def export_openapi(
     target_path: Path = typer.Argument(
@@ -57,6 +57,18 @@ class ScriptType(StrEnum):
     painless = "painless"
 
 
+class AutocompleteEngine(StrEnum):
+    """Engine serving taxonomy autocompletion
+
+    * elasticsearch - use completion suggesters on the taxonomy index
+    * memory - use an in-process index of taxonomy synonyms,
+      built from the taxonomy sources
+    """
+
+    elasticsearch = "elasticsearch"
+    memory = "memory"
+
+
 class Settings(BaseSettings):
     """Settings for Search-a-licious
 
@@ -129,12 +141,180 @@ class Settings(BaseSettings):
             description="User-Agent used when fetching resources (taxonomies) or documents"
         ),
     ] = "search-a-licious"
+    taxonomy_download_concurrency: Annotated[
+        int,
+        Field(description="Max number of taxonomies downloaded at the same time"),
+    ] = 4
     synonyms_path: Annotated[
         Path,
         Field(
             description="Path of the directory that will contain synonyms for ElasticSearch instances"
         ),
     ] = Path("/opt/search/synonyms")
+    autocomplete_cache_size: Annotated[
+        int,
+        Field(
+            description=cd_(
+                """Maximum number of autocomplete responses kept in cache
+                (per API worker), 0 disables the cache.
+                """
+            )
+        ),
+    ] = 10000
+    autocomplete_cache_ttl: Annotated[
+        int,
+        Field(description="Time to live, in seconds, of cached autocomplete responses"),
+    ] = 3600
+    taxonomy_generation_check_interval: Annotated[
+        int,
+        Field(
+            description=cd_(
+                """Interval, in seconds, between checks of the taxonomy index
+                currently in use.
+
+                When taxonomies are re-imported,
+                autocomplete cache and in-memory engine are renewed
+                after at most this delay.
+                """
+            )
+        ),
+    ] = 30
+    slow_query_threshold: Annotated[
+        float | None,
+        Field(
+            description=cd_(
+                """Duration, in seconds, above which a search is written
+                to the slow query log.
+
+                If None, slow queries are not logged.
+                """
+            )
+        ),
+    ] = None
+    slow_query_log_path: Annotated[
+        Path,
+        Field(
+            description=cd_(
+                """Path of the slow query log, a JSONL file.
+
+                It is rotated when it reaches `slow_query_log_max_bytes`.
+                """
+            )
+        ),
+    ] = Path("data/logs/slow_queries.jsonl")
+    slow_query_log_max_bytes: Annotated[
+        int,
+        Field(description="Size, in bytes, at which the slow query log is rotated"),
+    ] = 10_000_000
+    slow_query_log_backup_count: Annotated[
+        int,
+        Field(description="Number of rotated slow query log files to keep"),
+    ] = 5
+    slow_query_profile: Annotated[
+        bool,
+        Field(
+            description=cd_(
+                """If True, slow queries are executed again with `profile: true`,
+                and the profile returned by Elasticsearch is added to the slow log.
+
+                This adds load to Elasticsearch, use it for a limited time.
+                """
+            )
+        ),
+    ] = False
+    import_reports_dir: Annotated[
+        Path,
+        Field(
+            description="Directory where to write the JSON summary report of imports"
+        ),
+    ] = Path("data/import_reports")
+    import_checkpoints_dir: Annotated[
+        Path,
+        Field(
+            description=cd_(
+                """Directory where import processes save their progress,
+                to be able to resume an interrupted import.
+                """
+            )
+        ),
+    ] = Path("data/import_checkpoints")
+    import_metrics_log_interval: Annotated[
+        int,
+        Field(description="Interval, in seconds, between logs of import throughput"),
+    ] = 60
+    import_bulk_target_latency: Annotated[
+        float,
+        Field(
+            description=cd_(
+                """Target duration, in seconds, of bulk requests during imports.
+
+                Chunks of documents shrink when requests are slower
+                (or rejected because Elasticsearch is overloaded),
+                and grow when they take less than half of it.
+                """
+            )
+        ),
+    ] = 2.0
+    import_bulk_max_retries: Annotated[
+        int,
+        Field(
+            description=cd_(
+                """Max number of retries, with exponential backoff,
+                of documents rejected because Elasticsearch is overloaded.
+                """
+            )
+        ),
+    ] = 8
+    import_bulk_senders: Annotated[
+        int,
+        Field(
+            description=cd_(
+                """Number of threads sending bulk requests, in each import process.
+
+                With more than one, documents continue to be transformed
+                while Elasticsearch processes previous bulk requests.
+                """
+            )
+        ),
+    ] = 2
+    import_warmup_rounds: Annotated[
+        int,
+        Field(
+            description=cd_(
+                """Number of times warm-up queries are run on a newly imported index,
+                before the alias points to it, 0 disables the warm-up.
+
+                This avoids slow searches right after an import, because of cold caches.
+                """
+            )
+        ),
+    ] = 1
+    import_warmup_queries_path: Annotated[
+        Path | None,
+        Field(
+            description=cd_(
+                """Path of a JSONL file of queries used to warm up a newly imported index.
+
+                Each line contains search parameters, as in a POST request,
+                or is an entry of the slow query log.
+                If None, a query with all facets is used.
+                """
+            )
+        ),
+    ] = None
+    import_bulk_concurrency: Annotated[
+        int | None,
+        Field(
+            description=cd_(
+                """Max number of concurrent bulk requests,
+                across all processes of an import.
+
+                Use it to limit the load of an import on a live cluster.
+                If None, each process can send a bulk request at any time.
+                """
+            )
+        ),
+    ] = None
 
 
 settings = Settings()
@@ -288,6 +468,9 @@ class FieldType(StrEnum):
 if FieldType.__doc__:
     FieldType.__doc__ += f"\n\n[Elasticsearch help]: {ES_DOCS_URL}/enabled.html"
 
+#: suffix of the field containing values and their ancestors (see `expand_ancestors`)
+HIERARCHY_FIELD_SUFFIX = "_hierarchy"
+
 
 class FieldConfig(BaseModel):
     # name of the field (internal field), it's added here for convenience.
@@ -373,6 +556,24 @@ class FieldConfig(BaseModel):
             )
         ),
     ] = None
+    expand_ancestors: Annotated[
+        bool,
+        Field(
+            description=cd_(
+                """also index the values with all their ancestors in the taxonomy.
+
+                Only valid for taxonomy field type.
+
+                Values and their ancestors (direct and indirect parents)
+                are stored in a separate keyword field, named `<field name>_hierarchy`,
+                so that, for example, `categories_hierarchy:"en:dairies"`
+                matches all dairy products, without listing all the sub-categories.
+
+                Values that are not in the taxonomy are kept as is.
+                """
+            )
+        ),
+    ] = False
     fields: Annotated[
         dict[str, "FieldConfig"] | None,
         Field(
@@ -406,6 +607,14 @@ class FieldConfig(BaseModel):
             )
         return self
 
+    @model_validator(mode="after")
+    def expand_ancestors_should_be_used_for_taxonomy_type_only(self):
+        """Validator that checks that `expand_ancestors` is only provided for
+        fields with type `taxonomy`."""
+        if self.expand_ancestors and self.type is not FieldType.taxonomy:
+            raise ValueError("expand_ancestors should be provided for taxonomy only")
+        return self
+
     @model_validator(mode="after")
     def subfields_only_if_object_or_nested(self):
         """If we have an object or nested field, and only in these cases,
@@ -427,6 +636,11 @@ class FieldConfig(BaseModel):
         """Return the name of the field to use in input data."""
         return self.input_field or self.name
 
+    def get_hierarchy_field_name(self) -> str:
+        """Return the name of the field containing values and their ancestors,
+        (see `expand_ancestors`)"""
+        return f"{self.name}{HIERARCHY_FIELD_SUFFIX}"
+
     def has_lang_subfield(self) -> bool:
         """Return wether this field type is supposed to have different values
         per languages"""
@@ -577,6 +791,26 @@ class TaxonomyConfig(BaseModel):
         ]
         | None
     ) = None
+    autocomplete_engine: Annotated[
+        AutocompleteEngine,
+        Field(
+            description=cd_(
+                """The engine used by the autocomplete API,
+                either `elasticsearch` (completion suggesters)
+                or `memory` (in-process index).
+
+                The memory engine avoids a round trip to ElasticSearch
+                on every keystroke.
+                It is built, in each API worker, in the background
+                at startup (and when taxonomies change),
+                using the same names, synonyms and weights
+                as the ones imported in the taxonomy index.
+                Elasticsearch is used until it is ready,
+                and for languages whose normalization it does not mimic.
+                """
+            )
+        ),
+    ] = AutocompleteEngine.elasticsearch
 
 
 class ScriptConfig(BaseModel):
@@ -853,9 +1087,21 @@ class IndexConfig(BaseModel):
     @classmethod
     def ensure_no_fields_use_reserved_name(cls, fields: dict[str, FieldConfig]):
         """Verify that no field name clashes with a reserved name"""
-        used_reserved = set(["last_indexed_datetime", "_id"]) & set(fields.keys())
+        used_reserved = set(["last_indexed_datetime", "content_hash", "_id"]) & set(
+            fields.keys()
+        )
         if used_reserved:
             raise ValueError(f"The field names {','.join(used_reserved)} are reserved")
+        used_hierarchy = {
+            f"{field_name}{HIERARCHY_FIELD_SUFFIX}"
+            for field_name, field in fields.items()
+            if field.expand_ancestors
+        } & set(fields.keys())
+        if used_hierarchy:
+            raise ValueError(
+                f"The field names {','.join(used_hierarchy)} are used "
+                "for ancestors of taxonomy fields"
+            )
         return fields
 
     @field_validator("fields")
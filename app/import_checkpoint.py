@@ -0,0 +1,118 @@
+"""Checkpoints of import workers, to be able to resume an interrupted import
+
+Each worker regularly saves the number of the last line of the input file
+whose document was sent to Elasticsearch.
+"""
+
+import json
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from app.config import settings
+
+
+class ImportCheckpoint:
+    """Progress of an import worker, saved as a JSON file
+
+    Lines are numbered from 0, in the same way as in `gen_documents`.
+    `line` is the last line that was fully processed: all documents
+    generated from previous lines were sent to Elasticsearch.
+
+    :param index_name: the index documents are imported to
+    :param file_path: the imported file
+    :param num_processes: total number of import processes
+    :param process_num: the index of the process
+    """
+
+    def __init__(
+        self,
+        index_name: str,
+        file_path: Path,
+        num_processes: int,
+        process_num: int,
+        checkpoints_dir: Path | None = None,
+    ) -> None:
+        self.index_name = index_name
+        self.file_path = file_path
+        self.num_processes = num_processes
+        self.process_num = process_num
+        self.path = checkpoint_path(index_name, process_num, checkpoints_dir)
+        self.line = -1
+        self.sent = 0
+        self.done = False
+        # lines of the documents that were generated but not yet sent
+        self.pending: deque[int] = deque()
+
+    def to_dict(self):
+        return {
+            "index": self.index_name,
+            "file_path": str(self.file_path),
+            "num_processes": self.num_processes,
+            "process_num": self.process_num,
+            "line": self.line,
+            "sent": self.sent,
+            "done": self.done,
+            "updated": datetime.now().isoformat(),
+        }
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first, to never leave a truncated checkpoint
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.to_dict()))
+        tmp_path.replace(self.path)
+
+    def load(self) -> None:
+        """Load saved progress, if any
+
+        :raises ValueError: if the checkpoint is not compatible
+          with the import parameters
+        """
+        if not self.path.exists():
+            return
+        data = json.loads(self.path.read_text())
+        if (
+            data["file_path"] != str(self.file_path)
+            or data["num_processes"] != self.num_processes
+        ):
+            raise ValueError(
+                f"Checkpoint {self.path} was saved importing {data['file_path']} "
+                f"with {data['num_processes']} processes, "
+                "resume with the same file and number of processes"
+            )
+        self.line = data["line"]
+        self.sent = data["sent"]
+        self.done = data["done"]
+
+    def add_pending(self, line: int) -> None:
+        """Register the line of a document that will be sent"""
+        self.pending.append(line)
+
+    def chunk_sent(self, num_documents: int) -> None:
+        """Save progress after a chunk of documents was sent"""
+        for _ in range(num_documents):
+            self.line = self.pending.popleft()
+        self.sent += num_documents
+        self.save()
+
+    def finish(self) -> None:
+        self.done = True
+        self.save()
+
+
+def checkpoint_path(
+    index_name: str, process_num: int, checkpoints_dir: Path | None = None
+) -> Path:
+    checkpoints_dir = checkpoints_dir or settings.import_checkpoints_dir
+    return checkpoints_dir / f"{index_name}-{process_num}.json"
+
+
+def remove_checkpoints(
+    index_name: str, num_processes: int, checkpoints_dir: Path | None = None
+) -> None:
+    """Remove checkpoints of an import, once it is complete"""
+    for process_num in range(num_processes):
+        checkpoint_path(index_name, process_num, checkpoints_dir).unlink(
+            missing_ok=True
+        )
@@ -0,0 +1,206 @@
+"""Metrics of the import pipeline
+
+Each import worker measures its throughput, the time spent in each stage
+and bulk requests statistics. Metrics are logged periodically while running
+and a summary report is written at the end of the import.
+"""
+
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from app._types import JSONType
+from app.config import settings
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+# counters reported as rates in logs, in pipeline order
+RATE_COUNTERS = ("read", "parsed", "transformed", "acknowledged")
+
+
+class ImportMetrics:
+    """Counters and timings of an import worker
+
+    Counters are:
+
+    * read: lines of the input file read for this worker
+    * parsed: lines parsed
+    * transformed: documents transformed and ready to be sent
+    * skipped: documents that were not sent (eg. invalid ones)
+    * acknowledged: documents acknowledged by Elasticsearch
+    * failed: documents rejected by Elasticsearch
+
+    Timings are the time spent (in seconds) in each stage.
+
+    Metrics can be updated from several threads.
+    """
+
+    def __init__(self, worker: int = 0, log_interval: float | None = None) -> None:
+        self.worker = worker
+        self.log_interval = (
+            settings.import_metrics_log_interval
+            if log_interval is None
+            else log_interval
+        )
+        self.start = time.perf_counter()
+        self.end: float | None = None
+        self.counts: Counter[str] = Counter()
+        self.timings: defaultdict[str, float] = defaultdict(float)
+        # errors reported by Elasticsearch, by error type
+        self.errors: Counter[str] = Counter()
+        # retried items, by error type
+        self.retries: Counter[str] = Counter()
+        self.bulk_requests = 0
+        self.bulk_bytes = 0
+        self.bulk_max_duration = 0.0
+        self._last_log = self.start
+        self._lock = threading.Lock()
+        self._last_counts: Counter[str] = Counter()
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counts[name] += value
+
+    def add_time(self, name: str, duration: float) -> None:
+        with self._lock:
+            self.timings[name] += duration
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Context manager measuring the time spent in a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def record_bulk(self, num_bytes: int, duration: float) -> None:
+        """Record a bulk request to Elasticsearch"""
+        with self._lock:
+            self.bulk_requests += 1
+            self.bulk_bytes += num_bytes
+            self.timings["bulk"] += duration
+            self.bulk_max_duration = max(self.bulk_max_duration, duration)
+
+    def record_error(self, error_type: str, value: int = 1) -> None:
+        """Record an error reported by Elasticsearch"""
+        with self._lock:
+            self.errors[error_type] += value
+
+    def record_retry(self, error_type: str, value: int = 1) -> None:
+        """Record items sent again to Elasticsearch"""
+        with self._lock:
+            self.retries[error_type] += value
+
+    def maybe_log(self) -> None:
+        """Log throughput since last log, if log interval is elapsed"""
+        now = time.perf_counter()
+        elapsed = now - self._last_log
+        if elapsed < self.log_interval:
+            return
+        rates = ", ".join(
+            f"{name}: {(self.counts[name] - self._last_counts[name]) / elapsed:.1f}/s"
+            for name in RATE_COUNTERS
+        )
+        stages = ", ".join(
+            f"{name}: {duration:.1f}s" for name, duration in self.timings.items()
+        )
+        logger.info("[%d] Import rates %s (time spent %s)", self.worker, rates, stages)
+        if self.errors:
+            logger.info(
+                "[%d] Import errors: %s, retries: %s",
+                self.worker,
+                dict(self.errors),
+                dict(self.retries),
+            )
+        self._last_log = now
+        self._last_counts = Counter(self.counts)
+
+    def stop(self) -> None:
+        self.end = time.perf_counter()
+
+    def to_dict(self) -> JSONType:
+        duration = (self.end or time.perf_counter()) - self.start
+        return {
+            "worker": self.worker,
+            "duration": duration,
+            "counts": dict(self.counts),
+            "rates": {
+                name: self.counts[name] / duration if duration else 0.0
+                for name in RATE_COUNTERS
+            },
+            "timings": dict(self.timings),
+            "errors": dict(self.errors),
+            "retries": dict(self.retries),
+            "bulk": {
+                "requests": self.bulk_requests,
+                "bytes": self.bulk_bytes,
+                "mean_bytes": (
+                    self.bulk_bytes / self.bulk_requests if self.bulk_requests else 0
+                ),
+                "mean_duration": (
+                    self.timings["bulk"] / self.bulk_requests
+                    if self.bulk_requests
+                    else 0.0
+                ),
+                "max_duration": self.bulk_max_duration,
+            },
+        }
+
+
+def import_report(
+    index_name: str, duration: float, workers: list[JSONType], **extra
+) -> JSONType:
+    """Build a summary report from workers metrics (see `ImportMetrics.to_dict`)
+
+    :param index_name: the index documents were imported to
+    :param duration: the total duration of the import, in seconds
+    :param workers: the metrics of each worker
+    :param extra: additional data to add to the report
+    """
+    counts: Counter[str] = Counter()
+    errors: Counter[str] = Counter()
+    retries: Counter[str] = Counter()
+    timings: defaultdict[str, float] = defaultdict(float)
+    for worker in workers:
+        counts.update(worker["counts"])
+        errors.update(worker["errors"])
+        retries.update(worker["retries"])
+        for name, stage_duration in worker["timings"].items():
+            timings[name] += stage_duration
+    return {
+        "index": index_name,
+        "duration": duration,
+        "counts": dict(counts),
+        "rates": {
+            name: counts[name] / duration if duration else 0.0 for name in RATE_COUNTERS
+        },
+        # summed over workers
+        "timings": dict(timings),
+        "errors": dict(errors),
+        "retries": dict(retries),
+        "workers": workers,
+        **extra,
+    }
+
+
+def write_import_report(report: JSONType, reports_dir: Path | None = None) -> Path:
+    """Write an import report as JSON, and return its path
+
+    :param report: the report, see `import_report`
+    :param reports_dir: the directory to write to,
+      defaults to `settings.import_reports_dir`
+    """
+    reports_dir = reports_dir or settings.import_reports_dir
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    date = datetime.now().strftime("%Y-%m-%d-%H-%M-%S-%f")
+    path = reports_dir / f"import-{report['index']}-{date}.json"
+    with path.open("w") as f:
+        json.dump(report, f, indent=2)
+    return path
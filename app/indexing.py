@@ -1,8 +1,10 @@
 import abc
 import datetime
+import hashlib
 import re
 from typing import Iterable
 
+import orjson
 from elasticsearch_dsl import Index, Mapping, analyzer
 from elasticsearch_dsl import field as dsl_field
 
@@ -14,7 +16,7 @@ from app.config import (
     IndexConfig,
     TaxonomyConfig,
 )
-from app.taxonomy import Taxonomy, TaxonomyNode, TaxonomyNodeResult
+from app.taxonomy import Taxonomy, TaxonomyNode, TaxonomyNodeResult, get_taxonomy
 from app.utils import load_class_object_from_string
 from app.utils.analyzers import (
     get_autocomplete_analyzer,
@@ -39,6 +41,14 @@ FIELD_TYPE_TO_DSL_TYPE = {
 }
 
 
+def eager_ordinals(field: FieldConfig) -> dict[str, bool]:
+    """Mapping parameters to load global ordinals of keyword fields used in facets
+    at refresh time, rather than on the first search using them
+    (which would be slow right after an import)
+    """
+    return {"eager_global_ordinals": True} if field.bucket_agg else {}
+
+
 def generate_dsl_field(
     field: FieldConfig, supported_langs: Iterable[str]
 ) -> dsl_field.Field:
@@ -71,7 +81,9 @@ def generate_dsl_field(
             )
             for lang in supported_langs
         }
-        return dsl_field.Keyword(required=field.required, fields=sub_fields)
+        return dsl_field.Keyword(
+            required=field.required, fields=sub_fields, **eager_ordinals(field)
+        )
     elif field.type is FieldType.text_lang:
         properties = {
             lang: dsl_field.Text(
@@ -100,9 +112,27 @@ def generate_dsl_field(
         cls_ = FIELD_TYPE_TO_DSL_TYPE.get(field.type)
         if cls_ is None:
             raise ValueError(f"unsupported field type: {field.type}")
+        if field.type is FieldType.keyword:
+            return cls_(**eager_ordinals(field))
         return cls_()
 
 
+def content_hash(inputs: JSONType) -> str:
+    """A stable hash of the data to be indexed in ES
+
+    It does not depend on keys order,
+    and ignores `_id`, `last_indexed_datetime` and `content_hash` itself.
+    """
+    content = {
+        k: v
+        for k, v in inputs.items()
+        if k not in ("_id", "last_indexed_datetime", "content_hash")
+    }
+    return hashlib.blake2b(
+        orjson.dumps(content, option=orjson.OPT_SORT_KEYS), digest_size=16
+    ).hexdigest()
+
+
 def preprocess_field_value(
     d: JSONType, input_field: str, split: bool, split_separator: str
 ):
@@ -252,6 +282,20 @@ def process_taxonomy_field(
     return input_value if input_value else None
 
 
+def expand_ancestors(values: str | Iterable[str], taxonomy: Taxonomy) -> list[str]:
+    """Return values of a taxonomy field followed by all their ancestors,
+    without duplicates
+
+    :param values: the processed value of the field
+    :param taxonomy: the taxonomy of the field
+    """
+    values = [values] if isinstance(values, str) else list(values)
+    expanded = dict.fromkeys(values)
+    for value in values:
+        expanded.update(dict.fromkeys(taxonomy.get_ancestor_ids(value)))
+    return list(expanded)
+
+
 class DocumentProcessor:
     """`DocumentProcessor` is responsible of converting an item to index
     into a dict that is ready to be indexed by Elasticsearch.
@@ -267,6 +311,22 @@ class DocumentProcessor:
             self.preprocessor = preprocessor_cls(config)
         else:
             self.preprocessor = None
+        # taxonomies used to expand ancestors, loaded on first use
+        self.taxonomies: dict[str, Taxonomy] = {}
+
+    def get_taxonomy(self, taxonomy_name: str) -> Taxonomy:
+        """Get a taxonomy of the configuration, loading it on first use"""
+        taxonomy = self.taxonomies.get(taxonomy_name)
+        if taxonomy is None:
+            source = next(
+                source
+                for source in self.config.taxonomy.sources
+                if source.name == taxonomy_name
+            )
+            taxonomy = self.taxonomies[taxonomy_name] = get_taxonomy(
+                taxonomy_name, str(source.url)
+            )
+        return taxonomy
 
     def inputs_from_data(self, id_, processed_data: JSONType) -> JSONType:
         """Generate a dict with the data to be indexed in ES"""
@@ -295,6 +355,10 @@ class DocumentProcessor:
                     taxonomy_config=self.config.taxonomy,
                     split_separator=self.config.split_separator,
                 )
+                if field_input and field.expand_ancestors and field.taxonomy_name:
+                    inputs[field.get_hierarchy_field_name()] = expand_ancestors(
+                        field_input, self.get_taxonomy(field.taxonomy_name)
+                    )
 
             else:
                 field_input = preprocess_field_value(
@@ -307,6 +371,8 @@ class DocumentProcessor:
             if field_input:
                 inputs[field.name] = field_input
 
+        # enables to skip unchanged documents in differential imports
+        inputs["content_hash"] = content_hash(inputs)
         return inputs
 
     def from_result(self, result: FetcherResult) -> FetcherResult:
@@ -366,10 +432,15 @@ def generate_mapping_object(config: IndexConfig) -> Mapping:
             field.name,
             generate_dsl_field(field, supported_langs=supported_langs),
         )
+        if field.expand_ancestors:
+            # values and their ancestors, for filters on taxonomy hierarchies
+            mapping.field(field.get_hierarchy_field_name(), dsl_field.Keyword())
 
     # date of last index for the purposes of search
     # this is a field internal to Search-a-licious and independent of the project
     mapping.field("last_indexed_datetime", dsl_field.Date(required=True))
+    # hash of the document content, only used to compare it on import
+    mapping.field("content_hash", dsl_field.Keyword(index=False))
     return mapping
 
 
@@ -0,0 +1,170 @@
+"""Latency metrics, exported in the Prometheus text exposition format
+
+We don't depend on prometheus_client, as we only need histograms.
+Note that metrics are kept in memory per process,
+so each API worker exports its own metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# in seconds, a search stage commonly takes less than a millisecond
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels)
+    return "{" + inner + "}"
+
+
+def _format_float(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Histogram:
+    """A Prometheus histogram, with labels"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...],
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._lock = threading.Lock()
+        # label values -> (count per bucket, sum)
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Add an observation
+
+        :param value: the observed value (eg. a duration in seconds)
+        :param labels: value for each label of the histogram
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            if key not in self._series:
+                self._series[key] = ([0] * len(self.buckets), [0.0])
+            counts, total = self._series[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            total[0] += value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> str:
+        """Render the histogram in Prometheus text format"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = [
+                (key, list(counts), total[0])
+                for key, (counts, total) in sorted(self._series.items())
+            ]
+        for key, counts, total in series:
+            labels = tuple(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_labels = _format_labels(labels + (("le", _format_float(bound)),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+SEARCH_STAGE_DURATION = Histogram(
+    "search_stage_duration_seconds",
+    "Time spent in each stage of search requests",
+    ("index_id", "endpoint", "has_facets", "has_charts", "stage"),
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent to answer HTTP requests",
+    ("endpoint", "method", "status"),
+)
+REGISTRY = [SEARCH_STAGE_DURATION, REQUEST_DURATION]
+
+
+def render_metrics() -> str:
+    """Render all metrics in Prometheus text format"""
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+class StageTimer:
+    """Measure time spent in the successive stages of a request
+
+    Durations are in seconds.
+    """
+
+    def __init__(self) -> None:
+        self.durations: dict[str, float] = {}
+        # labels describing the request, set by the measured code
+        self.labels: dict[str, str] = {}
+        self.end: float | None = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Context manager measuring the time spent in a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, duration: float) -> None:
+        """Add a duration to a stage"""
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def stop(self) -> None:
+        """Mark the end of the measured code"""
+        self.end = time.perf_counter()
+
+    def timings_ms(self) -> dict[str, float]:
+        """Stage durations, in milliseconds"""
+        return {
+            name: round(duration * 1000, 3) for name, duration in self.durations.items()
+        }
+
+    def observe(
+        self, histogram: Histogram = SEARCH_STAGE_DURATION, **labels: str
+    ) -> None:
+        """Report stage durations to a histogram"""
+        labels = self.labels | labels
+        for name, duration in self.durations.items():
+            histogram.observe(duration, stage=name, **labels)
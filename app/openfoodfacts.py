@@ -20,6 +20,9 @@ COUNTRIES_TAXONOMY_URL = (
 
 BARCODE_PATH_REGEX = re.compile(r"^(...)(...)(...)(.*)$")
 
+# non indexed field where DocumentPreprocessor stores image URL fields
+IMAGE_FIELDS_FIELD = "image_fields"
+
 
 def split_barcode(barcode: str) -> list[str]:
     """Split barcode in the same way as done by Product Opener to generate a
@@ -264,8 +267,26 @@ class DocumentPreprocessor(BaseDocumentPreprocessor):
         self.add_main_language(document)
         # Don't keep all nutriment values
         self.select_nutriments(document)
+        # compute image URLs once, instead of at each search
+        self.add_image_fields(document)
         return FetcherResult(status=FetcherStatus.FOUND, document=document)
 
+    def add_image_fields(self, document: JSONType) -> None:
+        """Store image URL fields (see `ResultProcessor.build_image_fields`)
+        in the (non indexed) `image_fields` field.
+
+        Update `document` in place.
+        """
+        if not document.get("code"):
+            return
+        try:
+            document[IMAGE_FIELDS_FIELD] = ResultProcessor.build_image_fields(document)
+        except ValueError as e:
+            # invalid barcode, fields will be computed (and fail) at search time
+            logger.info(
+                "Unable to compute image fields for %s: %s", document["code"], e
+            )
+
     def add_main_language(self, document: JSONType) -> None:
         """We add a "main" language to translated fields (text_lang and
         taxonomies)
@@ -306,8 +327,14 @@ class DocumentPreprocessor(BaseDocumentPreprocessor):
 
 
 class ResultProcessor(BaseResultProcessor):
+    internal_fields = [IMAGE_FIELDS_FIELD]
+
     def process_after(self, result: JSONType) -> JSONType:
-        result |= ResultProcessor.build_image_fields(result)
+        image_fields = result.pop(IMAGE_FIELDS_FIELD, None)
+        if image_fields is None:
+            # document indexed before image fields were precomputed
+            image_fields = ResultProcessor.build_image_fields(result)
+        result |= image_fields
         return result
 
     @staticmethod
@@ -320,14 +347,15 @@ class ResultProcessor(BaseResultProcessor):
         code = product["code"]
         fields: JSONType = {}
 
+        images = convert_to_legacy_schema(product.get("images", {}))
+        lang = product.get("lang")
+
         for image_type in ["front", "ingredients", "nutrition", "packaging"]:
             display_ids = []
-            lang = product.get("lang")
             if lang:
                 display_ids.append(f"{image_type}_{lang}")
 
             display_ids.append(image_type)
-            images = convert_to_legacy_schema(product.get("images", {}))
 
             for display_id in display_ids:
                 if display_id in images and images[display_id].get("sizes"):
@@ -355,6 +383,7 @@ class ResultProcessor(BaseResultProcessor):
                 for language_code in product["languages_codes"]:
                     image_id = f"{image_type}_{language_code}"
                     if images and images.get(image_id) and images[image_id]["sizes"]:
+                        rev_id = images[image_id]["rev"]
                         if "selected_images" not in fields:
                             fields["selected_images"] = {}
                         fields["selected_images"].update(
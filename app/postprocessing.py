@@ -6,6 +6,10 @@ from app.utils import load_class_object_from_string
 
 
 class BaseResultProcessor:
+    #: fields stored in documents for post-processing only,
+    #: they must not be returned as is
+    internal_fields: list[str] = []
+
     def __init__(self, config: IndexConfig) -> None:
         self.config = config
 
@@ -10,7 +10,9 @@ from luqum.parser import parser
 from luqum.utils import OpenRangeTransformer, UnknownOperationResolver
 
 from ._types import (
+    ChartType,
     ErrorSearchResponse,
+    HistogramChart,
     JSONType,
     PostSearchParameters,
     QueryAnalysis,
@@ -18,6 +20,7 @@ from ._types import (
     SearchResponse,
     SearchResponseDebug,
     SearchResponseError,
+    StatsChart,
     SuccessSearchResponse,
 )
 from .config import FieldType, IndexConfig
@@ -25,6 +28,7 @@ from .es_query_builder import FullTextQueryBuilder
 from .es_scripts import get_script_id
 from .exceptions import InvalidLuceneQueryError, QueryCheckError, UnknownScriptError
 from .indexing import generate_index_object
+from .metrics import StageTimer
 from .postprocessing import BaseResultProcessor
 from .query_transformers import (
     LanguageSuffixTransformer,
@@ -186,6 +190,49 @@ def create_aggregation_clauses(
     return clauses
 
 
+#: percentiles computed for statistics charts
+STATS_CHART_PERCENTS = [5, 25, 50, 75, 95]
+
+
+def create_chart_aggregation_clauses(
+    charts: list[ChartType] | None,
+) -> dict[str, Agg]:
+    """Create aggregation clauses for numeric charts
+    (histograms and statistics).
+
+    Aggregations are named after the chart name.
+    """
+    clauses: dict[str, Agg] = {}
+    if charts is None:
+        return clauses
+    for chart in charts:
+        if isinstance(chart, HistogramChart):
+            if chart.interval is not None:
+                clauses[chart.name] = A(
+                    "histogram", field=chart.field, interval=chart.interval
+                )
+            else:
+                # let ES choose buckets boundaries
+                clauses[chart.name] = A(
+                    "variable_width_histogram",
+                    field=chart.field,
+                    buckets=chart.buckets,
+                )
+        elif isinstance(chart, StatsChart):
+            # a filter bucket which does not filter anything,
+            # just to group both metrics under the same name
+            agg = A("filter", filter={"match_all": {}})
+            agg.metric("stats", "stats", field=chart.field)
+            agg.metric(
+                "percentiles",
+                "percentiles",
+                field=chart.field,
+                percents=STATS_CHART_PERCENTS,
+            )
+            clauses[chart.name] = agg
+    return clauses
+
+
 def add_languages_suffix(
     analysis: QueryAnalysis, langs: list[str], config: IndexConfig
 ) -> QueryAnalysis:
@@ -245,32 +292,39 @@ def resolve_open_ranges(analysis: QueryAnalysis) -> QueryAnalysis:
 def build_search_query(
     params: SearchParameters,
     es_query_builder: ElasticsearchQueryBuilder,
+    timer: StageTimer | None = None,
 ) -> QueryAnalysis:
     """Build an elasticsearch_dsl Query.
 
     :param params: SearchParameters containing all search parameters
     :param es_query_builder: the builder to transform
       the luqum tree to an elasticsearch query
+    :param timer: if provided, used to measure time spent in each stage
     :return: the built Search query
     """
-    analysis = parse_query(params.q)
-    analysis = compute_facets_filters(analysis)
-    analysis = resolve_unknown_operation(analysis)
-    analysis = resolve_open_ranges(analysis)
-    if params.boost_phrase and params.sort_by is None:
-        analysis = boost_phrases(
-            analysis,
-            params.index_config.match_phrase_boost,
-            params.index_config.match_phrase_boost_proximity,
-        )
-    # add languages for localized fields
-    analysis = add_languages_suffix(analysis, params.langs, params.index_config)
-    # we are at a goop point to check the query
-    check_query(params, analysis)
+    timer = timer or StageTimer()
+    with timer.stage("parse"):
+        analysis = parse_query(params.q)
+    with timer.stage("transform"):
+        analysis = compute_facets_filters(analysis)
+        analysis = resolve_unknown_operation(analysis)
+        analysis = resolve_open_ranges(analysis)
+        if params.boost_phrase and params.sort_by is None:
+            analysis = boost_phrases(
+                analysis,
+                params.index_config.match_phrase_boost,
+                params.index_config.match_phrase_boost_proximity,
+            )
+        # add languages for localized fields
+        analysis = add_languages_suffix(analysis, params.langs, params.index_config)
+    with timer.stage("check"):
+        # we are at a goop point to check the query
+        check_query(params, analysis)
 
     logger.debug("luqum query: %s", analysis.luqum_tree)
 
-    return build_es_query(analysis, params, es_query_builder)
+    with timer.stage("es_query_build"):
+        return build_es_query(analysis, params, es_query_builder)
 
 
 def build_es_query(
@@ -302,6 +356,8 @@ def build_es_query(
         )
     for agg_name, agg in create_aggregation_clauses(config, agg_fields).items():
         es_query.aggs.bucket(agg_name, agg)
+    for agg_name, agg in create_chart_aggregation_clauses(params.charts).items():
+        es_query.aggs.bucket(agg_name, agg)
 
     sort_by: JSONType | str | None = None
     if (
@@ -359,8 +415,12 @@ def build_completion_query(
             q,
             completion=completion_clause,
         )
-    # limit returned fields
-    query.source(fields=["id", "taxonomy_name", "name"])
+    # limit returned fields,
+    # synonyms in requested languages are used to reuse the response for longer inputs
+    query = query.source(
+        includes=["id", "taxonomy_name", "name"]
+        + [f"synonyms.{lang}" for lang in langs]
+    )
     return query
 
 
@@ -370,11 +430,14 @@ def execute_query(
     page: int,
     page_size: int,
     projection: set[str] | None = None,
+    timer: StageTimer | None = None,
 ) -> SearchResponse:
+    timer = timer or StageTimer()
     errors = []
     debug = SearchResponseDebug(es_query=query.to_dict())
     try:
-        results = query.execute()
+        with timer.stage("es_request"):
+            results = query.execute()
     except elasticsearch.ApiError as e:
         logger.error("Error while running query: %s %s", str(e), str(e.body))
         errors.append(SearchResponseError(title="es_api_error", description=str(e)))
@@ -385,7 +448,11 @@ def execute_query(
         )
         return ErrorSearchResponse(debug=debug, errors=errors)
 
-    response = result_processor.process(results, projection)
+    # time spent in Elasticsearch,
+    # the rest of es_request is network and (de)serialization
+    timer.add("es_took", results.took / 1000)
+    with timer.stage("result_processing"):
+        response = result_processor.process(results, projection)
     count = response["count"]
     return SuccessSearchResponse(
         page=page,
@@ -4,7 +4,7 @@ import luqum.check
 import luqum.visitor
 from luqum import tree
 
-from .config import IndexConfig
+from .config import HIERARCHY_FIELD_SUFFIX, IndexConfig
 
 
 class LanguageSuffixTransformer(luqum.visitor.TreeTransformer):
@@ -214,5 +214,18 @@ class QueryCheck(luqum.check.LuceneCheck):
         is_sub_field = len(field_names) > 1
         # check field exists in config, but only for non sub-field
         # (TODO until we implement them in config)
-        if not is_sub_field and (field_names[0] not in self.index_config.fields):
+        if not is_sub_field and not self.is_config_field(field_names[0]):
             yield f"Search field '{'.'.join(field_names)}' not found in index config"
+
+    def is_config_field(self, field_name: str) -> bool:
+        """Tell if a field is in the index config,
+        either as a field or as the hierarchy field of a taxonomy field
+        (see `expand_ancestors`)"""
+        if field_name in self.index_config.fields:
+            return True
+        if field_name.endswith(HIERARCHY_FIELD_SUFFIX):
+            field = self.index_config.fields.get(
+                field_name.removesuffix(HIERARCHY_FIELD_SUFFIX)
+            )
+            return field is not None and field.expand_ancestors
+        return False
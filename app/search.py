@@ -1,4 +1,5 @@
 import logging
+import time
 from typing import cast
 
 from . import config
@@ -15,8 +16,10 @@ from ._types import (
 from .charts import build_charts
 from .exceptions import QueryCheckError
 from .facets import build_facets
+from .metrics import StageTimer
 from .postprocessing import BaseResultProcessor, load_result_processor
 from .query import build_elasticsearch_query_builder, build_search_query, execute_query
+from .slow_log import log_slow_query
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +47,7 @@ def add_debug_info(
     search_result: SuccessSearchResponse,
     analysis: QueryAnalysis,
     params: SearchParameters,
+    timer: StageTimer,
 ) -> SearchResponseDebug | None:
     if not params.debug_info:
         return None
@@ -60,13 +64,31 @@ def add_debug_info(
                 )
             case DebugInfo.aggregations:
                 data[debug_info.value] = search_result.aggregations
+            case DebugInfo.timings:
+                data[debug_info.value] = timer.timings_ms()
     return SearchResponseDebug(**data)
 
 
 def search(
     params: SearchParameters,
+    timer: StageTimer | None = None,
 ) -> SearchResponse:
-    """Run a search"""
+    """Run a search
+
+    :param params: the search parameters
+    :param timer: if provided, used to measure time spent in each stage
+      (it also gets index_id, has_facets and has_charts labels)
+
+    Searches slower than `settings.slow_query_threshold`
+    are written to the slow query log (see :py:mod:`app.slow_log`).
+    """
+    start = time.perf_counter()
+    timer = timer or StageTimer()
+    timer.labels.update(
+        index_id=params.valid_index_id,
+        has_facets=str(bool(params.facets)).lower(),
+        has_charts=str(bool(params.charts)).lower(),
+    )
     result_processor = cast(
         BaseResultProcessor, get_result_processor(params.valid_index_id)
     )
@@ -88,8 +110,10 @@ def search(
             # ES query builder is generated from elasticsearch mapping and
             # takes ~40ms to generate, build-it before hand to avoid this delay
             es_query_builder=get_es_query_builder(params.valid_index_id),
+            timer=timer,
         )
     except QueryCheckError as e:
+        timer.stop()
         return ErrorSearchResponse(
             debug=SearchResponseDebug(),
             errors=[SearchResponseError(title="QueryCheckError", description=str(e), status=400)],
@@ -111,13 +135,26 @@ def search(
         page=params.page,
         page_size=params.page_size,
         projection=projection,
+        timer=timer,
     )
     if isinstance(search_result, SuccessSearchResponse):
-        search_result.facets = build_facets(
-            search_result, query, params.main_lang, index_config, params.facets
-        )
-        search_result.charts = build_charts(search_result, index_config, params.charts)
-        search_result.debug = add_debug_info(search_result, query, params)
+        with timer.stage("facets"):
+            search_result.facets = build_facets(
+                search_result, query, params.main_lang, index_config, params.facets
+            )
+        with timer.stage("charts"):
+            search_result.charts = build_charts(
+                search_result, index_config, params.charts, params.charts_data_only
+            )
+        search_result.debug = add_debug_info(search_result, query, params, timer)
         # remove aggregations
         search_result.aggregations = None
+    timer.stop()
+    log_slow_query(
+        params,
+        query,
+        time.perf_counter() - start,
+        timer,
+        took=getattr(search_result, "took", None),
+    )
     return search_result
@@ -0,0 +1,206 @@
+"""Log of slow searches, to be able to analyze them later
+
+Searches taking more than `settings.slow_query_threshold` are written,
+one JSON object per line, to a rotating log file, with what is needed
+to reproduce them: normalized parameters, the Elasticsearch query,
+the time reported by Elasticsearch and the duration of each stage.
+
+Optionally, the query is executed again with `profile: true`,
+and the profile returned by Elasticsearch is added to the entry.
+This is done in a background thread, one query at a time,
+so that it does not delay the response nor add much load to Elasticsearch.
+
+Entries waiting for the background thread are bounded:
+when profiling is busy, entries are written without profile,
+and when too many entries are waiting, new ones are dropped
+(their number is added to the next written entry).
+"""
+
+import json
+import logging
+import logging.handlers
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+from elasticsearch_dsl import Search
+
+from ._types import JSONType, QueryAnalysis, SearchParameters
+from .config import settings
+from .metrics import StageTimer
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# entries are written to a dedicated file, independently of logging configuration
+_handler: logging.handlers.RotatingFileHandler | None = None
+_executor: ThreadPoolExecutor | None = None
+
+# max number of entries waiting to be written, further entries are dropped
+MAX_PENDING_ENTRIES = 100
+# max number of entries waiting to be profiled,
+# further entries are written without profile
+MAX_PENDING_PROFILES = 2
+# counters of entries, protected by _lock
+_pending_entries = 0
+_pending_profiles = 0
+_dropped_entries = 0
+
+
+def _get_handler() -> logging.handlers.RotatingFileHandler:
+    """Get the handler writing to the slow query log, creating it on first use"""
+    global _handler
+    with _lock:
+        if _handler is None:
+            settings.slow_query_log_path.parent.mkdir(parents=True, exist_ok=True)
+            _handler = logging.handlers.RotatingFileHandler(
+                settings.slow_query_log_path,
+                maxBytes=settings.slow_query_log_max_bytes,
+                backupCount=settings.slow_query_log_backup_count,
+            )
+            _handler.setFormatter(logging.Formatter("%(message)s"))
+        return _handler
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(1, thread_name_prefix="slow-query-log")
+        return _executor
+
+
+def reset() -> None:
+    """Close the log file and stop the background thread
+
+    Settings changes (eg. the log path) apply to the next entries.
+    """
+    global _handler, _executor, _dropped_entries
+    with _lock:
+        handler, _handler = _handler, None
+        executor, _executor = _executor, None
+        _dropped_entries = 0
+    # pending entries need the lock to be written, so wait for them outside it
+    if executor is not None:
+        executor.shutdown()
+    if handler is not None:
+        handler.close()
+
+
+def is_slow(duration: float) -> bool:
+    """Tell if a search taking `duration` seconds must be logged"""
+    threshold = settings.slow_query_threshold
+    return threshold is not None and duration >= threshold
+
+
+def slow_query_entry(
+    params: SearchParameters,
+    query: QueryAnalysis,
+    duration: float,
+    timer: StageTimer,
+    took: int | None,
+) -> JSONType:
+    """Build the log entry of a slow search
+
+    :param params: the search parameters
+    :param query: the analyzed query
+    :param duration: the duration of the search, in seconds
+    :param timer: the timer of the search stages
+    :param took: time spent in Elasticsearch, in milliseconds, as it reported it
+    """
+    return {
+        "date": datetime.now().isoformat(),
+        "duration_ms": round(duration * 1000, 3),
+        "took_ms": took,
+        "timings_ms": timer.timings_ms(),
+        # only parameters that were set, with their normalized values
+        "params": params.model_dump(mode="json", exclude_defaults=True),
+        "lucene_query": str(query.luqum_tree) if query.luqum_tree else None,
+        "es_query": query.es_query.to_dict() if query.es_query else None,
+    }
+
+
+def profile_query(es_query: Search) -> JSONType | None:
+    """Execute a query again with `profile: true`, and return the profile"""
+    response = es_query.extra(profile=True).execute()
+    return response.to_dict().get("profile")
+
+
+def _reserve_entry(profile: bool) -> tuple[bool, bool, int]:
+    """Reserve a place for an entry in the queue of the background thread
+
+    :param profile: if the entry should be profiled
+    :return: if the entry can be written, if it can be profiled,
+      and the number of entries dropped since the last written one
+    """
+    global _pending_entries, _pending_profiles, _dropped_entries
+    with _lock:
+        if _pending_entries >= MAX_PENDING_ENTRIES:
+            # the background thread can't keep up
+            _dropped_entries += 1
+            return False, False, 0
+        profile = profile and _pending_profiles < MAX_PENDING_PROFILES
+        _pending_entries += 1
+        if profile:
+            _pending_profiles += 1
+        dropped, _dropped_entries = _dropped_entries, 0
+        return True, profile, dropped
+
+
+def _release_entry(profile: bool) -> None:
+    global _pending_entries, _pending_profiles
+    with _lock:
+        _pending_entries -= 1
+        if profile:
+            _pending_profiles -= 1
+
+
+def _write_entry(entry: JSONType, es_query: Search | None) -> None:
+    try:
+        if es_query is not None:
+            try:
+                entry["profile"] = profile_query(es_query)
+            except Exception as e:
+                logger.warning("Could not profile slow query: %s", e)
+                entry["profile_error"] = str(e)
+        _get_handler().handle(
+            logging.makeLogRecord({"msg": json.dumps(entry, default=str)})
+        )
+    finally:
+        _release_entry(es_query is not None)
+
+
+def log_slow_query(
+    params: SearchParameters,
+    query: QueryAnalysis,
+    duration: float,
+    timer: StageTimer,
+    took: int | None = None,
+) -> Future | None:
+    """Log a search, if it is slow
+
+    See :py:func:`slow_query_entry` for parameters.
+
+    :return: the future of the writing of the entry,
+      if the search is slow and the entry was not dropped
+    """
+    if not is_slow(duration):
+        return None
+    entry = slow_query_entry(params, query, duration, timer, took)
+    want_profile = settings.slow_query_profile and query.es_query is not None
+    reserved, profile, dropped = _reserve_entry(want_profile)
+    if not reserved:
+        return None
+    if want_profile and not profile:
+        # profiling is busy
+        entry["profile_skipped"] = True
+    if dropped:
+        entry["dropped_entries"] = dropped
+    try:
+        return _get_executor().submit(
+            _write_entry, entry, query.es_query if profile else None
+        )
+    except RuntimeError:
+        # interpreter is shutting down
+        _release_entry(profile)
+        return None
@@ -3,18 +3,21 @@
 See also :py:mod:`app.taxonomy_es`
 """
 
+import threading
+import time
 from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Set, Union
 
 import cachetools
 import requests
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 from app._types import FetcherStatus, JSONType
 from app.config import TaxonomyConfig, settings
 from app.utils import get_logger
-from app.utils.download import download_file, http_session, should_download_file
+from app.utils.download import download_file, get_file_etag, http_session
 from app.utils.io import load_json
 
 DEFAULT_CACHE_DIR = settings.taxonomy_cache_dir.expanduser()
@@ -22,6 +25,9 @@ DEFAULT_CACHE_DIR = settings.taxonomy_cache_dir.expanduser()
 
 logger = get_logger(__name__)
 
+# protects the computation of ancestors and descendants of taxonomies
+_CLOSURES_LOCK = threading.Lock()
+
 
 class TaxonomyNode(BaseModel):
     """A taxonomy element.
@@ -41,10 +47,12 @@ class TaxonomyNode(BaseModel):
 
     id: str
     names: Dict[str, str]
-    parents: List["TaxonomyNode"] = []
-    children: List["TaxonomyNode"] = []
-    synonyms: Dict[str, List[str]] = {}
-    properties: Dict[str, Any] = {}
+    # default factories are much faster than copying default values,
+    # which matters when loading large taxonomies
+    parents: List["TaxonomyNode"] = Field(default_factory=list)
+    children: List["TaxonomyNode"] = Field(default_factory=list)
+    synonyms: Dict[str, List[str]] = Field(default_factory=dict)
+    properties: Dict[str, Any] = Field(default_factory=dict)
 
     def is_child_of(self, item: "TaxonomyNode") -> bool:
         """Return True if `item` is a child of `self` in the taxonomy."""
@@ -124,7 +132,8 @@ class TaxonomyNode(BaseModel):
 
     def add_parents(self, parents: Iterable["TaxonomyNode"]):
         for parent in parents:
-            if parent not in self.parents:
+            # compare identities, comparing nodes would compare their relatives
+            if not any(parent is p for p in self.parents):
                 self.parents.append(parent)
                 parent.children.append(self)
 
@@ -153,6 +162,9 @@ class Taxonomy:
     def __init__(self, name: str) -> None:
         self.nodes: Dict[str, TaxonomyNode] = {}
         self.name = name
+        # ancestors ("parents") and descendants ("children") ids, by node id,
+        # see get_ancestor_ids
+        self._closures: Dict[str, Dict[str, tuple[str, ...]]] = {}
 
     def add(self, key: str, node: TaxonomyNode) -> None:
         """Add a node to the taxonomy under the id `key`.
@@ -182,6 +194,131 @@ class Taxonomy:
         """Return all node IDs from the taxonomy."""
         return self.nodes.keys()
 
+    def _iter_components(self, relatives: str) -> Iterator[List[TaxonomyNode]]:
+        """Iterate over strongly connected components of the graph of
+        `relatives` (parents or children) of the taxonomy
+
+        A component is generated after all components reachable from it.
+        This is Tarjan's algorithm, without recursion,
+        as taxonomies can be deep.
+        """
+        index: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        stack: List[TaxonomyNode] = []
+        on_stack: Set[str] = set()
+
+        def visit(node: TaxonomyNode) -> tuple[TaxonomyNode, Iterator[TaxonomyNode]]:
+            index[node.id] = lowlink[node.id] = len(index)
+            stack.append(node)
+            on_stack.add(node.id)
+            return node, iter(getattr(node, relatives))
+
+        for root in self.nodes.values():
+            if root.id in index:
+                continue
+            path = [visit(root)]
+            while path:
+                node, relatives_iter = path[-1]
+                for relative in relatives_iter:
+                    if relative.id not in index:
+                        path.append(visit(relative))
+                        break
+                    if relative.id in on_stack:
+                        lowlink[node.id] = min(lowlink[node.id], index[relative.id])
+                else:
+                    path.pop()
+                    if path:
+                        previous = path[-1][0]
+                        lowlink[previous.id] = min(
+                            lowlink[previous.id], lowlink[node.id]
+                        )
+                    if lowlink[node.id] == index[node.id]:
+                        component: List[TaxonomyNode] = []
+                        while not component or component[-1] is not node:
+                            component.append(stack.pop())
+                            on_stack.discard(component[-1].id)
+                        # in order of discovery
+                        component.reverse()
+                        yield component
+
+    def _compute_closures(self, relatives: str) -> Dict[str, tuple[str, ...]]:
+        """Compute the ids of `relatives` (parents or children) of all elements,
+        recursively, direct relatives first
+
+        Closures are computed by strongly connected component,
+        so that all elements of a cycle get the same relatives,
+        whatever the element the computation starts from.
+        """
+        closures: Dict[str, tuple[str, ...]] = {}
+        for component in self._iter_components(relatives):
+            members = dict.fromkeys(node.id for node in component)
+            is_cycle = len(component) > 1 or any(
+                relative is component[0]
+                for relative in getattr(component[0], relatives)
+            )
+            # relatives of the component, and their own relatives,
+            # their closures were already computed
+            reachable: Dict[str, None] = {}
+            for node in component:
+                for relative in getattr(node, relatives):
+                    if relative.id not in members:
+                        reachable[relative.id] = None
+                        reachable.update(dict.fromkeys(closures[relative.id]))
+            for node in component:
+                closure = dict.fromkeys(
+                    relative.id for relative in getattr(node, relatives)
+                )
+                if is_cycle:
+                    closure.update(members)
+                closure.update(reachable)
+                closure.pop(node.id, None)
+                closures[node.id] = tuple(closure)
+        return closures
+
+    def _get_closure(self, key: str, relatives: str) -> tuple[str, ...]:
+        """Ids of `relatives` (parents or children) of an element, recursively
+
+        Closures of all elements are computed on first call,
+        and published at once, so that threads never see partial results.
+        """
+        closures = self._closures.get(relatives)
+        if closures is None:
+            with _CLOSURES_LOCK:
+                closures = self._closures.get(relatives)
+                if closures is None:
+                    closures = self._compute_closures(relatives)
+                    self._closures[relatives] = closures
+        return closures.get(key, ())
+
+    def get_ancestor_ids(self, key: str) -> tuple[str, ...]:
+        """Return the ids of all the ancestors (direct and indirect parents)
+        of a taxonomy element, direct parents first.
+
+        Ancestors of all elements are computed on first call,
+        from the ancestors of parents, so that it is cheap.
+        In a cycle, all elements are ancestors of each other.
+
+        :param key: the taxonomy element id
+        :return: the ancestors ids, empty if `key` is not in the taxonomy
+        """
+        return self._get_closure(key, "parents")
+
+    def get_descendant_ids(self, key: str) -> tuple[str, ...]:
+        """Return the ids of all the descendants (direct and indirect children)
+        of a taxonomy element, direct children first.
+
+        Results are computed like for :py:meth:`get_ancestor_ids`.
+
+        :param key: the taxonomy element id
+        :return: the descendants ids, empty if `key` is not in the taxonomy
+        """
+        return self._get_closure(key, "children")
+
+    def compute_closures(self) -> None:
+        """Compute ancestors and descendants of all elements in advance"""
+        self._get_closure("", "parents")
+        self._get_closure("", "children")
+
     def find_deepest_nodes(self, nodes: List[TaxonomyNode]) -> List[TaxonomyNode]:
         """Given a list of nodes, returns the list of nodes where all the
         parents within the list have been removed.
@@ -316,53 +453,245 @@ class Taxonomy:
         return cls.from_dict(name, data)
 
 
-@cachetools.cached(cachetools.TTLCache(maxsize=100, ttl=3600))
-def get_taxonomy(
+def fetch_taxonomy_file(
     taxonomy_name: str,
     taxonomy_url: str,
     force_download: bool = False,
     download_newer: bool = False,
     cache_dir: Optional[Path] = None,
-) -> Taxonomy:
-    """Return the taxonomy of the provided name.
+) -> Path:
+    """Download a taxonomy file, if needed, and return its local path
 
-    The taxonomy file is downloaded and cached locally.
-
-    :param taxonomy_name: the requested taxonomy name
-    :param taxonomy_url: the URL of the taxonomy
-    :param force_download: if True, (re)download the taxonomy even if it was
-        cached, defaults to False
-    :param download_newer: if True, download the taxonomy if a more recent
-        version is available (based on file Etag)
-    :param cache_dir: the cache directory to use, defaults to
-        ~/.cache/openfoodfacts/taxonomy
-    :return: a Taxonomy
+    See :py:func:`get_taxonomy` for parameters.
     """
     if taxonomy_url.startswith("file://"):
         # just use the file, it's already local
         fpath = taxonomy_url[len("file://") :]
         if not fpath.startswith("/"):
             raise RuntimeError("Relative path (not yet) supported for taxonomy url")
-        return Taxonomy.from_path(taxonomy_name, fpath.rstrip("/"))
+        return Path(fpath.rstrip("/"))
     filename = f"{taxonomy_name}.json"
 
     cache_dir = DEFAULT_CACHE_DIR if cache_dir is None else cache_dir
     taxonomy_path = cache_dir / filename
 
-    if not should_download_file(
-        taxonomy_url, taxonomy_path, force_download, download_newer
-    ):
-        return Taxonomy.from_path(taxonomy_name, taxonomy_path)
-
+    if taxonomy_path.is_file() and not force_download:
+        return taxonomy_path
+    # a conditional request only downloads the file if it changed,
+    # the stored Etag is only valid if the file is still there
+    etag = (
+        get_file_etag(taxonomy_path)
+        if download_newer and taxonomy_path.is_file()
+        else None
+    )
     cache_dir.mkdir(parents=True, exist_ok=True)
-    logger.info("Downloading taxonomy, saving it in %s", taxonomy_path)
-    download_file(taxonomy_url, taxonomy_path)
-    return Taxonomy.from_path(taxonomy_name, taxonomy_path)
+    if download_file(taxonomy_url, taxonomy_path, etag=etag):
+        logger.info("Downloaded taxonomy, saved it in %s", taxonomy_path)
+    return taxonomy_path
+
+
+@cachetools.cached(cachetools.TTLCache(maxsize=100, ttl=3600))
+def _load_taxonomy(taxonomy_name: str, file_path: Path, mtime_ns: int) -> Taxonomy:
+    # the modification time is part of the cache key,
+    # so that a file downloaded again is loaded again
+    return Taxonomy.from_path(taxonomy_name, file_path)
+
+
+def load_taxonomy(taxonomy_name: str, file_path: Path) -> Taxonomy:
+    """Load a taxonomy file, loaded taxonomies are cached"""
+    return _load_taxonomy(taxonomy_name, file_path, file_path.stat().st_mtime_ns)
+
+
+def clear_taxonomy_cache() -> None:
+    """Clear the cache of loaded taxonomies"""
+    _load_taxonomy.cache_clear()
+
+
+def get_taxonomy(
+    taxonomy_name: str,
+    taxonomy_url: str,
+    force_download: bool = False,
+    download_newer: bool = False,
+    cache_dir: Optional[Path] = None,
+) -> Taxonomy:
+    """Return the taxonomy of the provided name.
 
+    The taxonomy file is downloaded and cached locally.
 
-def iter_taxonomies(taxonomy_config: TaxonomyConfig) -> Iterator[Taxonomy]:
-    for taxonomy_source_config in taxonomy_config.sources:
-        yield get_taxonomy(taxonomy_source_config.name, str(taxonomy_source_config.url))
+    :param taxonomy_name: the requested taxonomy name
+    :param taxonomy_url: the URL of the taxonomy
+    :param force_download: if True, (re)download the taxonomy even if it was
+        cached, defaults to False
+    :param download_newer: (with `force_download`) if True, only download
+        the taxonomy if a more recent version is available (based on file Etag)
+    :param cache_dir: the cache directory to use, defaults to
+        ~/.cache/openfoodfacts/taxonomy
+    :return: a Taxonomy
+    """
+    return load_taxonomy(
+        taxonomy_name,
+        fetch_taxonomy_file(
+            taxonomy_name, taxonomy_url, force_download, download_newer, cache_dir
+        ),
+    )
+
+
+def taxonomy_entry_result(
+    taxonomy: Taxonomy, node: TaxonomyNode, page: int = 1, page_size: int = 100
+) -> JSONType:
+    """Describe a taxonomy entry and its place in the taxonomy
+
+    Parents and ancestors are all listed,
+    while children and descendants, that can be numerous, are paged.
+
+    :param taxonomy: the taxonomy
+    :param node: the taxonomy entry
+    :param page: the page of children and descendants, starting at 1
+    :param page_size: the number of children and descendants per page
+    """
+    start = (page - 1) * page_size
+    children = node.children
+    descendants = taxonomy.get_descendant_ids(node.id)
+    return {
+        "taxonomy_name": taxonomy.name,
+        "id": node.id,
+        "names": node.names,
+        "parents": [parent.id for parent in node.parents],
+        "ancestors": list(taxonomy.get_ancestor_ids(node.id)),
+        "children": [child.id for child in children[start : start + page_size]],
+        "children_count": len(children),
+        "descendants": list(descendants[start : start + page_size]),
+        "descendants_count": len(descendants),
+        "page": page,
+        "page_size": page_size,
+    }
+
+
+def iter_taxonomies(
+    taxonomy_config: TaxonomyConfig, download_newer: bool = False
+) -> Iterator[Taxonomy]:
+    """Iterate over the taxonomies of the configuration, in order
+
+    Taxonomy files are fetched concurrently
+    (at most `settings.taxonomy_download_concurrency` at a time),
+    while taxonomies that are already downloaded are loaded.
+
+    :param download_newer: if True, download taxonomies again
+      if a more recent version is available (based on file Etag)
+    """
+    sources = taxonomy_config.sources
+    with ThreadPoolExecutor(
+        settings.taxonomy_download_concurrency,
+        thread_name_prefix="taxonomy-download",
+    ) as executor:
+        futures = [
+            executor.submit(
+                fetch_taxonomy_file,
+                source.name,
+                str(source.url),
+                force_download=download_newer,
+                download_newer=download_newer,
+            )
+            for source in sources
+        ]
+        try:
+            for source, future in zip(sources, futures):
+                yield load_taxonomy(source.name, future.result())
+        finally:
+            # do not wait for downloads that are not needed anymore
+            for future in futures:
+                future.cancel()
+
+
+# taxonomies of each index, with their closures computed,
+# and the generation they were loaded for, see get_preloaded_taxonomy
+_PRELOADED_TAXONOMIES: dict[str, tuple[str | None, dict[str, Taxonomy]]] = {}
+# preloads in progress, by index id
+_PRELOADS: dict[str, threading.Thread] = {}
+# time of the last failed preload, by index id
+_PRELOAD_FAILURES: dict[str, float] = {}
+_PRELOAD_LOCK = threading.Lock()
+
+
+def _preload_taxonomies(
+    index_id: str, taxonomy_config: TaxonomyConfig, generation: str | None
+) -> None:
+    try:
+        taxonomies = {}
+        for taxonomy in iter_taxonomies(taxonomy_config):
+            taxonomy.compute_closures()
+            taxonomies[taxonomy.name] = taxonomy
+        with _PRELOAD_LOCK:
+            _PRELOADED_TAXONOMIES[index_id] = (generation, taxonomies)
+            _PRELOAD_FAILURES.pop(index_id, None)
+    except Exception:
+        logger.exception("Unable to preload taxonomies of %s", index_id)
+        with _PRELOAD_LOCK:
+            _PRELOAD_FAILURES[index_id] = time.monotonic()
+    finally:
+        with _PRELOAD_LOCK:
+            _PRELOADS.pop(index_id, None)
+
+
+def start_taxonomies_preload(
+    index_id: str, taxonomy_config: TaxonomyConfig, generation: str | None = None
+) -> threading.Thread | None:
+    """Load the taxonomies of an index, and compute the ancestors and
+    descendants of their entries, in a background thread
+
+    Nothing is done if a preload is already in progress,
+    or if the last one failed less than
+    `settings.taxonomy_generation_check_interval` seconds ago.
+
+    :param generation: the taxonomy generation
+      (see :py:func:`app.autocomplete.taxonomy_generation`)
+    :return: the thread loading taxonomies, if a preload was started
+    """
+    with _PRELOAD_LOCK:
+        if index_id in _PRELOADS:
+            return None
+        failed = _PRELOAD_FAILURES.get(index_id)
+        if (
+            failed is not None
+            and time.monotonic() - failed < settings.taxonomy_generation_check_interval
+        ):
+            return None
+        thread = threading.Thread(
+            target=_preload_taxonomies,
+            args=(index_id, taxonomy_config, generation),
+            name=f"taxonomy-preload-{index_id}",
+            daemon=True,
+        )
+        _PRELOADS[index_id] = thread
+        thread.start()
+    return thread
+
+
+def get_preloaded_taxonomy(
+    index_id: str,
+    taxonomy_config: TaxonomyConfig,
+    taxonomy_name: str,
+    generation: str | None = None,
+) -> Optional[Taxonomy]:
+    """Get a taxonomy of an index, with the ancestors and descendants
+    of its entries already computed, if it is loaded
+
+    Taxonomies are loaded in a background thread
+    (see :py:func:`start_taxonomies_preload`), never while answering a request.
+    If the generation changed, taxonomies are loaded again,
+    meanwhile previous ones are returned.
+
+    :param generation: the taxonomy generation
+      (see :py:func:`app.autocomplete.taxonomy_generation`)
+    :return: the taxonomy, None if taxonomies are not loaded yet,
+      or if the taxonomy does not exist
+    """
+    preloaded = _PRELOADED_TAXONOMIES.get(index_id)
+    if preloaded is None or preloaded[0] != generation:
+        start_taxonomies_preload(index_id, taxonomy_config, generation)
+    if preloaded is None:
+        return None
+    return preloaded[1].get(taxonomy_name)
 
 
 class TaxonomyNodeResult(BaseModel):
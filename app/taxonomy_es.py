@@ -3,6 +3,8 @@
 See also :py:mod:`app.taxonomy`
 """
 
+import hashlib
+import json
 import os
 import re
 import shutil
@@ -13,9 +15,11 @@ from elasticsearch_dsl.query import Q
 
 from app.config import IndexConfig
 from app.taxonomy import Taxonomy, iter_taxonomies
-from app.utils import connection
+from app.utils import connection, get_logger
 from app.utils.io import safe_replace_dir
 
+logger = get_logger(__name__)
+
 
 def get_taxonomy_names(
     items: list[tuple[str, str]],
@@ -55,6 +59,10 @@ def get_taxonomy_names(
     return translations
 
 
+# runs of characters that are not word chars
+_NON_WORD_RE = re.compile(r"\W+")
+
+
 def _normalize_synonym(token: str) -> str:
     """Normalize a synonym,
 
@@ -63,14 +71,27 @@ def _normalize_synonym(token: str) -> str:
     """
     # make lower case
     token = token.lower()
-    # changes anything that is neither a word char nor a space for space
-    token = re.sub(r"[^\w\s]+", " ", token)
-    # normalize spaces
-    token = re.sub(r"\s+", " ", token)
+    # changes anything that is not a word char for a single space
+    # (this also normalizes spaces)
+    token = _NON_WORD_RE.sub(" ", token)
     # TODO: should we also run asciifolding or so ? Or depends on language ?
     return token
 
 
+class _NormalizedSynonyms(dict[str, str]):
+    """Normalized synonyms, by synonym, computed on first access
+
+    Synonyms with nothing left after normalization are empty strings.
+    """
+
+    def __missing__(self, synonym: str) -> str:
+        normalized = _normalize_synonym(synonym)
+        if not normalized.strip():
+            normalized = ""
+        self[synonym] = normalized
+        return normalized
+
+
 def create_synonyms_files(taxonomy: Taxonomy, langs: list[str], target_dir: Path):
     """Create a set of files that can be used to define a Synonym Graph Token Filter
 
@@ -80,38 +101,66 @@ def create_synonyms_files(taxonomy: Taxonomy, langs: list[str], target_dir: Path
 
     Also the special xx language is added to every languages if it exists.
 
+    The same synonyms appear in many entries and languages,
+    so each distinct synonym is only normalized once.
+    Files are written at once, at the end.
+
     see:
     https://www.elastic.co/guide/en/elasticsearch/reference/current/search-with-synonyms.html#synonyms-store-synonyms-file
     """
-
-    # auto-generate synonyms files for each language, ready to write to
-    synonyms_paths = {lang: (target_dir / f"{lang}.txt") for lang in langs}
-    synonyms_files = {lang: fpath.open("w") for lang, fpath in synonyms_paths.items()}
-
+    # lines of the synonyms file of each language
+    lines: dict[str, list[str]] = {lang: [] for lang in langs}
+    normalized = _NormalizedSynonyms()
     for node in taxonomy.iter_nodes():
         # we add multi lang synonyms to every language
-        multi_lang_synonyms = node.synonyms.get("xx", [])
-        multi_lang_synonyms = [_normalize_synonym(s) for s in multi_lang_synonyms]
+        multi_lang_synonyms = [normalized[s] for s in node.synonyms.get("xx", [])]
         # also node id without prefix
-        multi_lang_synonyms.append(_normalize_synonym(node.id.split(":", 1)[-1]))
-        multi_lang_synonyms = [s for s in multi_lang_synonyms if s.strip()]
+        multi_lang_synonyms.append(normalized[node.id.split(":", 1)[-1]])
+        multi_lang_synonyms = [s for s in multi_lang_synonyms if s]
         for lang, synonyms in node.synonyms.items():
-            if (not synonyms and not multi_lang_synonyms) or lang not in langs:
+            if (not synonyms and not multi_lang_synonyms) or lang not in lines:
                 continue
             # avoid commas in synonyms… add multilang syns and identifier without prefix
-            synonyms_ = (_normalize_synonym(s) for s in synonyms)
-            synonyms = [s for s in synonyms_ if s.strip()]
-            synonyms = sorted(set(synonyms + multi_lang_synonyms))
-            synonyms = [s for s in synonyms if s.strip()]
-            if synonyms:
-                synonyms_files[lang].write(f"{','.join(synonyms)} => {node.id}\n")
+            lang_synonyms = {normalized[s] for s in synonyms}
+            lang_synonyms.update(multi_lang_synonyms)
+            lang_synonyms.discard("")
+            if lang_synonyms:
+                lines[lang].append(f"{','.join(sorted(lang_synonyms))} => {node.id}\n")
+
+    for lang, lang_lines in lines.items():
+        (target_dir / f"{lang}.txt").write_text("".join(lang_lines))
+
+
+def _files_hashes(directory: Path) -> dict[str, str]:
+    """Content hash of each file of a directory"""
+    if not directory.is_dir():
+        return {}
+    return {
+        path.name: hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+        for path in directory.iterdir()
+        if path.is_file()
+    }
+
+
+def _synonyms_hash(index_config: IndexConfig, target_dir: Path) -> str:
+    """Content hash of the synonyms files of all taxonomies of an index"""
+    files_hashes = {
+        source.name: _files_hashes(target_dir / source.name)
+        for source in index_config.taxonomy.sources
+    }
+    return hashlib.blake2b(
+        json.dumps(files_hashes, sort_keys=True).encode(), digest_size=16
+    ).hexdigest()
 
-    # close files
-    for f in synonyms_files.values():
-        f.close()
 
+def create_synonyms(index_config: IndexConfig, target_dir: Path) -> bool:
+    """Create synonyms files of all taxonomies
 
-def create_synonyms(index_config: IndexConfig, target_dir: Path):
+    Files of a taxonomy are only replaced if their content changed.
+
+    :return: True if files of at least one taxonomy changed
+    """
+    changed = False
     for taxonomy in iter_taxonomies(index_config.taxonomy):
         target = target_dir / taxonomy.name
         # a temporary directory, we move at the end
@@ -121,17 +170,42 @@ def create_synonyms(index_config: IndexConfig, target_dir: Path):
         os.makedirs(target_tmp, mode=0o775, exist_ok=True)
         # generate synonyms files
         create_synonyms_files(taxonomy, index_config.supported_langs, target_tmp)
+        if _files_hashes(target_tmp) == _files_hashes(target):
+            logger.info("Synonyms of taxonomy %s are unchanged", taxonomy.name)
+            shutil.rmtree(target_tmp)
+            continue
+        changed = True
         # move to final location, overriding previous files
         safe_replace_dir(target, target_tmp)
         # Note: in current deployment, file are shared between ES instance,
         # so we don't need to replicate the files
+    return changed
+
 
+def refresh_synonyms(
+    index_name: str, index_config: IndexConfig, target_dir: Path
+) -> bool:
+    """Create synonyms files, and reload them in the index if they changed
 
-def refresh_synonyms(index_name: str, index_config: IndexConfig, target_dir: Path):
+    Reloading search analyzers and clearing the request cache
+    slows down searches for a while, so this is only done if needed:
+    the hash of reloaded synonyms is saved in a marker file, once the reload
+    succeeded, so that synonyms are reloaded again if a reload failed.
+
+    :return: True if synonyms were reloaded
+    """
     create_synonyms(index_config, target_dir)
+    synonyms_hash = _synonyms_hash(index_config, target_dir)
+    marker = target_dir / f".{index_name}.reloaded"
+    if marker.is_file() and marker.read_text() == synonyms_hash:
+        logger.info("Synonyms are unchanged, not reloading them")
+        return False
     es = connection.current_es_client()
-    if es.indices.exists(index=index_name):
-        # trigger update of synonyms in token filters by reloading search analyzers
-        # and clearing relevant cache
-        es.indices.reload_search_analyzers(index=index_name)
-        es.indices.clear_cache(index=index_name, request=True)
+    if not es.indices.exists(index=index_name):
+        return False
+    # trigger update of synonyms in token filters by reloading search analyzers
+    # and clearing relevant cache
+    es.indices.reload_search_analyzers(index=index_name)
+    es.indices.clear_cache(index=index_name, request=True)
+    marker.write_text(synonyms_hash)
+    return True
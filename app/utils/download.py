@@ -14,6 +14,9 @@ import tqdm
 
 from ..config import settings
 
+# size of chunks written while downloading a file
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
 http_session = requests.Session()
 http_session.headers.update({"User-Agent": settings.user_agent})
 
@@ -42,55 +45,31 @@ def get_file_etag(dataset_path: Path) -> Optional[str]:
     return None
 
 
-def fetch_etag(url: str) -> str:
-    """Get the Etag of a remote file.
-
-    :param url: the file URL
-    :return: the Etag
-    """
-    r = http_session.head(url)
-    return r.headers.get("ETag", "").strip("'\"")
-
-
-def should_download_file(
-    url: str, filepath: Path, force_download: bool, download_newer: bool
-) -> bool:
-    """Return True if the file located at `url` should be downloaded again
-    based on file Etag.
-
-    :param url: the file URL
-    :param filepath: the file cached location
-    :param force_download: if True, (re)download the file even if it was
-        cached, defaults to False
-    :param download_newer: if True, download the file if a more recent
-        version is available (based on file Etag)
-    :return: True if the file should be downloaded again, False otherwise
-    """
-    if filepath.is_file():
-        if not force_download:
-            return False
+def _quote_etag(etag: str) -> str:
+    """Quote an Etag, stored without quotes, for a If-None-Match header"""
+    weak = etag.startswith("W/")
+    value = etag[2:].strip('"') if weak else etag
+    return f'{"W/" if weak else ""}"{value}"'
 
-        if download_newer:
-            cached_etag = get_file_etag(filepath)
-            current_etag = fetch_etag(url)
 
-            if cached_etag == current_etag:
-                # The file is up to date, return cached file path
-                return False
-
-    return True
-
-
-def download_file(url: str, output_path: Path):
+def download_file(url: str, output_path: Path, etag: Optional[str] = None) -> bool:
     """Download a dataset file and store it in `output_path`.
 
     The file metadata (`etag`, `url`, `created_at`) are stored in a JSON
         file whose name is derived from `output_path`
     :param url: the file URL
     :param output_path: the file output path
+    :param etag: the Etag of the current file, if provided,
+        the file is only downloaded if it changed (using a conditional request)
+    :return: True if the file was downloaded, False if it did not change
     """
-    r = http_session.get(url, stream=True)
-    etag = r.headers.get("ETag", "").strip("'\"")
+    headers = {"If-None-Match": _quote_etag(etag)} if etag else {}
+    r = http_session.get(url, stream=True, headers=headers)
+    if r.status_code == 304:
+        r.close()
+        return False
+    r.raise_for_status()
+    new_etag = r.headers.get("ETag", "").strip("'\"")
 
     tmp_output_path = output_path.with_name(output_path.name + ".part")
     with tmp_output_path.open("wb") as f, tqdm.tqdm(
@@ -101,7 +80,7 @@ def download_file(url: str, output_path: Path):
         desc=str(output_path),
         total=int(r.headers.get("content-length", 0)),
     ) as pbar:
-        for chunk in r.iter_content(chunk_size=4096):
+        for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
             f.write(chunk)
             pbar.update(len(chunk))
 
@@ -110,9 +89,10 @@ def download_file(url: str, output_path: Path):
     _sanitize_file_path(output_path, ".json").write_text(
         json.dumps(
             {
-                "etag": etag,
+                "etag": new_etag,
                 "created_at": int(time.time()),
                 "url": url,
             }
         )
     )
+    return True
@@ -1,10 +1,28 @@
 import gzip
+import queue
 import shutil
+import subprocess
+import threading
 from pathlib import Path
-from typing import Callable, Iterable
+from typing import Callable, Iterable, Iterator
 
 import orjson
 
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+# size of blocks read from (possibly compressed) files
+READ_BLOCK_SIZE = 1024 * 1024
+# max number of decompressed blocks waiting to be consumed
+MAX_PENDING_BLOCKS = 16
+# external programs used to decompress files, by file suffix,
+# they are faster than python modules, and run in parallel with the parser
+DECOMPRESS_COMMANDS = {
+    ".gz": [["pigz", "-dc"], ["gzip", "-dc"]],
+    ".zst": [["zstd", "-dcq"]],
+}
+
 
 def load_json(filepath: str | Path) -> dict | list:
     """Load a JSON file, support gzipped JSON files.
@@ -23,10 +41,143 @@ def jsonl_iter(jsonl_path: str | Path) -> Iterable[dict]:
         gzipped (jsonl.gz) files are supported.
     :yield: dict contained in the JSONL file
     """
-    open_fn = get_open_fn(jsonl_path)
+    for line in jsonl_lines(jsonl_path):
+        yield orjson.loads(line)
+
 
-    with open_fn(str(jsonl_path), "rt", encoding="utf-8") as f:
-        yield from jsonl_iter_fp(f)
+def jsonl_lines(
+    jsonl_path: str | Path, block_size: int = READ_BLOCK_SIZE, external: bool = True
+) -> Iterator[bytes]:
+    """Iterate over non empty lines of a JSONL file, without parsing them.
+
+    Lines are not decoded, as orjson parses bytes directly.
+
+    :param jsonl_path: the path of the JSONL file. Plain (.jsonl),
+        gzipped (.jsonl.gz) and zstd compressed (.jsonl.zst) files are supported.
+    :param block_size: size of blocks to read
+    :param external: use an external program to decompress the file, if available
+    :yield: each line of the file, without the line ending
+    """
+    remainder = b""
+    for block in read_blocks(jsonl_path, block_size, external):
+        lines = block.split(b"\n")
+        lines[0] = remainder + lines[0]
+        remainder = lines.pop()
+        for line in lines:
+            line = line.rstrip(b"\r")
+            if line:
+                yield line
+    remainder = remainder.rstrip(b"\r")
+    if remainder:
+        yield remainder
+
+
+def read_blocks(
+    filepath: str | Path, block_size: int = READ_BLOCK_SIZE, external: bool = True
+) -> Iterator[bytes]:
+    """Iterate over decompressed blocks of a file
+
+    Compressed files are decompressed in parallel with the consumer of blocks:
+    either by an external program (pigz, gzip or zstd) if `external` is True
+    and the program is available, or else in a background thread.
+
+    :param filepath: the path of the file, plain, gzipped (.gz)
+        or zstd compressed (.zst)
+    :param block_size: size of blocks to read
+    :param external: use an external program to decompress the file, if available
+    """
+    filepath = Path(filepath)
+    suffix = filepath.suffix
+    if suffix not in DECOMPRESS_COMMANDS:
+        with filepath.open("rb") as f:
+            while block := f.read(block_size):
+                yield block
+        return
+    if external:
+        for command in DECOMPRESS_COMMANDS[suffix]:
+            if shutil.which(command[0]):
+                yield from _command_blocks(command + [str(filepath)], block_size)
+                return
+    if suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(
+                f"Reading {filepath} requires the zstd program "
+                "or the zstandard python package"
+            )
+        open_fn: Callable = zstandard.open
+    else:
+        open_fn = gzip.open
+    yield from _threaded_blocks(lambda: open_fn(filepath, "rb"), block_size)
+
+
+def _command_blocks(command: list[str], block_size: int) -> Iterator[bytes]:
+    """Iterate over blocks of the output of a command"""
+    logger.debug("Decompressing with %s", " ".join(command))
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=block_size
+    )
+    assert process.stdout is not None
+    completed = False
+    try:
+        while block := process.stdout.read(block_size):
+            yield block
+        completed = True
+    finally:
+        if not completed:
+            # the consumer stopped early
+            process.kill()
+        process.stdout.close()
+        _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise OSError(
+            f"{command[0]} failed with status {process.returncode}: "
+            f"{stderr.decode(errors='replace').strip()}"
+        )
+
+
+def _threaded_blocks(open_fn: Callable, block_size: int) -> Iterator[bytes]:
+    """Iterate over blocks of a file read in a background thread
+
+    This is used for compressed files: zlib and zstandard release the GIL
+    while decompressing, so it runs in parallel with the consumer.
+
+    :param open_fn: function returning the opened file
+    """
+    blocks: queue.Queue[bytes | BaseException | None] = queue.Queue(MAX_PENDING_BLOCKS)
+    stop = threading.Event()
+
+    def put(item: bytes | BaseException | None) -> bool:
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        try:
+            with open_fn() as f:
+                while block := f.read(block_size):
+                    if not put(block):
+                        return
+        except BaseException as e:
+            put(e)
+        else:
+            put(None)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while (item := blocks.get()) is not None:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
 
 
 def get_open_fn(filepath: str | Path) -> Callable:
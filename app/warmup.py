@@ -0,0 +1,154 @@
+"""Warm up a freshly imported index, before the alias points to it
+
+Right after an import, caches of the new index are cold
+(global ordinals used by facets, filesystem cache, query cache),
+so the first searches are slow.
+Running representative queries before the alias swap avoids this.
+"""
+
+import string
+import time
+from pathlib import Path
+from typing import Iterable, cast
+
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import Search
+
+from ._types import JSONType, PostSearchParameters
+from .config import IndexConfig, settings
+from .query import build_completion_query, build_search_query
+from .search import get_es_query_builder
+from .utils import get_logger
+from .utils.io import jsonl_iter
+
+logger = get_logger(__name__)
+
+# prefixes used to warm up completion suggesters of the taxonomy index
+DEFAULT_COMPLETION_PREFIXES = tuple(string.ascii_lowercase)
+
+
+def default_warmup_queries(config: IndexConfig) -> list[JSONType]:
+    """Queries used when no warm-up queries are provided:
+    all documents, with all facets
+    """
+    return [{"facets": config.get_fields_with_bucket_agg()}]
+
+
+def load_warmup_queries(file_path: Path) -> list[JSONType]:
+    """Load warm-up queries from a JSONL file
+
+    Each line contains search parameters, as in a POST request,
+    or is an entry of the slow query log (see :py:mod:`app.slow_log`),
+    whose parameters are used.
+    """
+    return [item.get("params", item) for item in jsonl_iter(file_path)]
+
+
+def warmup_index(
+    es_client: Elasticsearch,
+    index_name: str,
+    index_id: str,
+    queries: Iterable[JSONType],
+    rounds: int = 1,
+) -> int:
+    """Run search queries on an index, to warm up its caches
+
+    Failing queries are logged, but do not stop the warm-up.
+
+    :param es_client: the Elasticsearch client
+    :param index_name: the index to warm up, eg. the new index of an import
+    :param index_id: the id of the index in configuration
+    :param queries: search parameters, as in a POST request
+    :param rounds: number of times queries are run
+    :return: the number of failed queries
+    """
+    searches = []
+    errors = 0
+    for query in queries:
+        try:
+            params = PostSearchParameters(**{**query, "index_id": index_id})
+            analysis = build_search_query(params, get_es_query_builder(index_id))
+        except Exception as e:
+            logger.warning("Invalid warm-up query %s: %s", query, e)
+            errors += 1
+            continue
+        es_query = cast(Search, analysis.es_query)
+        # replace the alias by the new index
+        searches.append(es_query.index().index(index_name).using(es_client))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for search in searches:
+            try:
+                # the response of a previous round would be returned otherwise
+                search.execute(ignore_cache=True)
+            except Exception as e:
+                logger.warning("Warm-up query failed on %s: %s", index_name, e)
+                errors += 1
+    logger.info(
+        "Warmed up index %s with %d queries in %.1fs",
+        index_name,
+        len(searches) * rounds,
+        time.perf_counter() - start,
+    )
+    return errors
+
+
+def warmup_taxonomy_index(
+    es_client: Elasticsearch,
+    index_name: str,
+    config: IndexConfig,
+    prefixes: Iterable[str] = DEFAULT_COMPLETION_PREFIXES,
+    langs: list[str] | None = None,
+) -> int:
+    """Run completion queries on a taxonomy index, to warm up suggesters
+
+    :param es_client: the Elasticsearch client
+    :param index_name: the taxonomy index to warm up
+    :param config: the index configuration
+    :param prefixes: the user inputs to complete
+    :param langs: the languages to complete in, defaults to english
+    :return: the number of failed queries
+    """
+    langs = langs or ["en"]
+    taxonomy_names = [source.name for source in config.taxonomy.sources]
+    errors = 0
+    start = time.perf_counter()
+    for prefix in prefixes:
+        query = build_completion_query(prefix, taxonomy_names, langs, 10, config)
+        try:
+            query.index().index(index_name).using(es_client).execute()
+        except Exception as e:
+            logger.warning("Warm-up query failed on %s: %s", index_name, e)
+            errors += 1
+    logger.info(
+        "Warmed up taxonomy index %s in %.1fs",
+        index_name,
+        time.perf_counter() - start,
+    )
+    return errors
+
+
+def warmup_new_index(
+    es_client: Elasticsearch, index_name: str, index_id: str, config: IndexConfig
+) -> None:
+    """Warm up the new index of an import, according to settings"""
+    if not settings.import_warmup_rounds:
+        return
+    queries = (
+        load_warmup_queries(settings.import_warmup_queries_path)
+        if settings.import_warmup_queries_path
+        else default_warmup_queries(config)
+    )
+    warmup_index(
+        es_client, index_name, index_id, queries, settings.import_warmup_rounds
+    )
+
+
+def warmup_new_taxonomy_index(
+    es_client: Elasticsearch, index_name: str, config: IndexConfig
+) -> None:
+    """Warm up the new taxonomy index of an import, according to settings"""
+    if not settings.import_warmup_rounds:
+        return
+    for _ in range(settings.import_warmup_rounds):
+        warmup_taxonomy_index(es_client, index_name, config)
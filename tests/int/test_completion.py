@@ -1,5 +1,7 @@
 import pytest
 
+from app.config import AutocompleteEngine
+
 
 @pytest.mark.parametrize(
     "q,taxonomies,langs,results",
@@ -71,3 +73,38 @@ def test_completion(q, taxonomies, langs, results, test_client, synonyms_created
         (option["id"], option["text"], int(option["score"])) for option in options
     ]
     assert completions == results
+
+
+@pytest.mark.parametrize(
+    "q,taxonomies,langs",
+    [
+        ("organ", "labels", "en"),
+        ("biol", "labels", "en,fr"),
+        ("Fairtrade/Max H", "labels", "fr,main"),
+        ("fr", "labels,categories", "en"),
+        ("b", "categories", "en"),
+    ],
+)
+def test_completion_memory_engine(
+    q, taxonomies, langs, test_client, index_config, synonyms_created
+):
+    """The in-memory engine gives the same completions as ES"""
+    url = f"/autocomplete?q={q}&langs={langs}&taxonomy_names={taxonomies}&size=5"
+    es_response = test_client.get(url)
+    assert es_response.status_code == 200
+    try:
+        index_config.taxonomy.autocomplete_engine = AutocompleteEngine.memory
+        memory_response = test_client.get(url)
+    finally:
+        index_config.taxonomy.autocomplete_engine = AutocompleteEngine.elasticsearch
+    assert memory_response.status_code == 200
+    assert memory_response.json()["debug"]["engine"] == "memory"
+
+    def completions(response):
+        # order of entries with same score is not significant
+        return sorted(
+            (-option["score"], option["id"], option["text"], option["name"])
+            for option in response.json()["options"]
+        )
+
+    assert completions(memory_response) == completions(es_response)
@@ -33,6 +33,8 @@ def test_import_data(test_off_config, es_connection, synonyms_created):
     document = es_connection.get(index="test_off", id="30123457678901")["_source"]
     last_index_1 = document.pop("last_indexed_datetime")
     assert last_index_1
+    content_hash_1 = document.pop("content_hash")
+    assert content_hash_1
     assert document == {
         "code": "30123457678901",
         "product_name": {
@@ -96,7 +98,9 @@ def test_import_data(test_off_config, es_connection, synonyms_created):
     assert es_connection.count(index="test_off")["count"] == 10
     # test our modified one entry
     document = es_connection.get(index="test_off", id="30123457678901")["_source"]
-    assert document.pop("last_indexed_datetime") > last_index_1
+    last_index_2 = document.pop("last_indexed_datetime")
+    assert last_index_2 > last_index_1
+    assert document.pop("content_hash") != content_hash_1
     assert document == {
         "code": "30123457678901",
         "product_name": {
@@ -124,6 +128,26 @@ def test_import_data(test_off_config, es_connection, synonyms_created):
     # our new document is there
     assert es_connection.get(index="test_off", id="30123457678910")["_source"]
 
+    # test differential update
+    helpers.TestDocumentPreprocessor.clean_calls()
+    result = runner_invoke(
+        "import",
+        "/opt/search/tests/int/data/test_off_data_update.jsonl",
+        "--differential",
+        "--skip-updates",
+    )
+    assert result.exit_code == 0
+    # documents were processed
+    pre_processor_calls = helpers.TestDocumentPreprocessor.get_calls()
+    assert len(pre_processor_calls) == 2
+    # but as they did not change, they were not indexed again
+    document = es_connection.get(index="test_off", id="30123457678901")["_source"]
+    assert document["last_indexed_datetime"] == last_index_2
+    # documents that are not in the file were removed
+    assert "Deleted 8 documents" in result.stderr
+    es_connection.indices.refresh(index="test_off")
+    assert es_connection.count(index="test_off")["count"] == 2
+
 
 def test_cleanup_indexes(test_off_config, es_connection):
     # clean ES first
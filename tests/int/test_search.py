@@ -298,6 +298,48 @@ def test_simple_charts(req_type, charts, sample_data, test_client):
     )
 
 
+@pytest.mark.parametrize(
+    "req_type,charts,interval",
+    [
+        ("GET", "histogram:unique_scans_n,stats:unique_scans_n", None),
+        (
+            "POST",
+            [
+                {
+                    "chart_type": "HistogramChart",
+                    "field": "unique_scans_n",
+                    "interval": 200,
+                },
+                {"chart_type": "StatsChart", "field": "unique_scans_n"},
+            ],
+            200,
+        ),
+    ],
+)
+def test_numeric_charts(req_type, charts, interval, sample_data, test_client):
+    params = {"sort_by": "created_t", "langs": ["en"], "charts": charts}
+    _, data = do_search(test_client, req_type, params)
+    charts = data["charts"]
+    assert set(charts.keys()) == set(
+        ["histogram:unique_scans_n", "stats:unique_scans_n"]
+    )
+    histogram_values = charts["histogram:unique_scans_n"]["data"][0]["values"]
+    # all products are in the histogram
+    assert sum(value["amount"] for value in histogram_values) == 6
+    if interval is not None:
+        assert histogram_values == [
+            {"start": 0.0, "end": 200.0, "amount": 1},
+            {"start": 200.0, "end": 400.0, "amount": 2},
+            {"start": 400.0, "end": 600.0, "amount": 2},
+            {"start": 600.0, "end": 800.0, "amount": 1},
+        ]
+    [stats] = charts["stats:unique_scans_n"]["data"][0]["values"]
+    assert stats["count"] == 6
+    assert stats["min"] == 100
+    assert stats["max"] == 600
+    assert stats["avg"] == 350
+
+
 def test_charts_bad_fields_fails(test_client):
     # non existing in distribution chart
     params = {"sort_by": "created_t", "langs": ["en"]}
@@ -319,6 +361,12 @@ def test_charts_bad_fields_fails(test_client):
     assert "Non numeric field name" in resp.text
     assert "labels" in resp.text
     assert "categories" in resp.text
+    # non numeric in histogram
+    resp, _ = do_search(
+        test_client, "GET", dict(params, charts=["histogram:labels"]), code=422
+    )
+    assert "Non numeric field name" in resp.text
+    assert "labels" in resp.text
     # non existing in scatter chart
     resp, _ = do_search(
         test_client,
@@ -452,3 +500,55 @@ def test_fields(req_type, sample_data, test_client):
     assert set(
         attributes for result in data["hits"] for attributes in result.keys()
     ) == {"code", "product_name"}
+
+
+def test_get_document(sample_data, test_client):
+    resp = test_client.get("/document/3012345670002")
+    assert resp.status_code == 200
+    document = resp.json()
+    assert document["code"] == "3012345670002"
+    assert document["product_name"]["en"] == "Organic Granulated Sugar"
+    # unknown code
+    resp = test_client.get("/document/3012345679999")
+    assert resp.status_code == 404
+
+
+def test_get_documents(sample_data, test_client):
+    resp = test_client.get(
+        "/documents", params={"ids": "3012345670005,3012345679999,3012345670001"}
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [document["code"] for document in data["documents"]] == [
+        "3012345670005",
+        "3012345670001",
+    ]
+    assert data["documents"][0]["product_name"]["en"] == "Organic Brown Sugar"
+    assert data["not_found"] == ["3012345679999"]
+    # with projection
+    resp = test_client.get(
+        "/documents",
+        params={"ids": "3012345670005", "fields": "unique_scans_n,labels"},
+    )
+    assert resp.status_code == 200
+    document = resp.json()["documents"][0]
+    assert set(document.keys()) == {"code", "unique_scans_n", "labels"}
+    # too many ids
+    ids = ",".join(str(3012345670000 + i) for i in range(101))
+    resp = test_client.get("/documents", params={"ids": ids})
+    assert resp.status_code == 400
+
+
+def test_charts_data_only(sample_data, test_client):
+    params = {"sort_by": "unique_scans_n", "charts": "labels,histogram:unique_scans_n"}
+    _, data = do_search(test_client, "GET", params)
+    _, data_only = do_search(test_client, "GET", {**params, "charts_data_only": "1"})
+    resp = test_client.get("/charts/spec", params={"charts": params["charts"]})
+    assert resp.status_code == 200
+    assert "max-age" in resp.headers["Cache-Control"]
+    specs = resp.json()
+    assert set(data_only["charts"]) == set(specs) == set(data["charts"])
+    for name, chart in data_only["charts"].items():
+        assert list(chart.keys()) == ["data"]
+        # injecting data in the spec gives the full chart
+        assert {**specs[name], **chart} == data["charts"][name]
@@ -3,6 +3,8 @@ from pathlib import Path
 
 import pytest
 
+import app.config
+import app.search
 from app._types import JSONType
 from app.config import Config
 from app.query import build_elasticsearch_query_builder
@@ -25,6 +27,18 @@ def default_global_config():
     yield Config.from_yaml(DEFAULT_CONFIG_PATH)
 
 
+@pytest.fixture
+def global_config(default_global_config, monkeypatch):
+    """Fixture that sets the default global configuration for tests
+    as the configuration of the application, so that tests don't depend
+    on the CONFIG_PATH envvar."""
+    monkeypatch.setattr(app.config, "_CONFIG", default_global_config)
+    # those are built from the configuration
+    monkeypatch.setattr(app.search, "_ES_QUERY_BUILDERS", {})
+    monkeypatch.setattr(app.search, "_RESULT_PROCESSORS", {})
+    yield default_global_config
+
+
 @pytest.fixture
 def default_filter_query_builder(default_config):
     """Fixture that returns Luqum elasticsearch query builder based on default
@@ -1,5 +1,6 @@
 import datetime
 import json
+import queue
 import tempfile
 from pathlib import Path
 from typing import cast
@@ -9,17 +10,30 @@ from redis import Redis
 
 from app._import import (
     BaseDocumentFetcher,
+    ContentHashes,
+    QueuedLines,
     gen_documents,
+    gen_removed_ids,
+    gen_taxonomy_documents,
+    gen_taxonomy_updates,
     get_document_dict,
     get_new_updates,
     get_processed_since,
+    import_parallel,
     load_document_fetcher,
     run_update_daemon,
+    save_content_hashes,
+    send_lines,
+    taxonomy_hash,
     update_alias,
+    update_taxonomies,
 )
 from app._types import FetcherResult, FetcherStatus, JSONType
-from app.config import Config, IndexConfig
-from app.indexing import DocumentProcessor
+from app.config import Config, IndexConfig, settings
+from app.import_checkpoint import ImportCheckpoint
+from app.import_metrics import ImportMetrics
+from app.indexing import DocumentProcessor, content_hash
+from app.taxonomy import Taxonomy
 
 
 class RedisXrangeClient:
@@ -298,6 +312,7 @@ def test_gen_documents(default_config):
     num_processes = 4
     process_id = 0
 
+    metrics = ImportMetrics(process_id)
     documents = list(
         gen_documents(
             processor,
@@ -306,12 +321,20 @@ def test_gen_documents(default_config):
             num_items,
             num_processes,
             process_id,
+            metrics,
         )
     )
     tmp_path.unlink()
     tmp_path.parent.rmdir()
 
     assert len(documents) == 24  # (100 / 4) - 1 = 24
+    assert metrics.counts == {
+        "read": 25,
+        "parsed": 25,
+        "transformed": 24,
+        "skipped": 1,
+    }
+    assert set(metrics.timings) == {"read", "parse", "transform"}
 
     ids = [f"{i:03}" for i in range(num_items) if i % num_processes == 0]
     ids.pop(0)  # Remove the first item which is invalid
@@ -324,6 +347,9 @@ def test_gen_documents(default_config):
         last_indexed_datetime = document["_source"].pop("last_indexed_datetime")
         assert isinstance(last_indexed_datetime, str)
         assert datetime.datetime.fromisoformat(last_indexed_datetime) > start_datetime
+        assert document["_source"].pop("content_hash") == content_hash(
+            document["_source"]
+        )
         assert "categories" in document["_source"]
         assert document["_source"] == {
             "categories": ["en:beverages"],
@@ -331,6 +357,105 @@ def test_gen_documents(default_config):
         }
 
 
+def test_gen_documents_resume(default_config, tmp_path):
+    processor = DocumentProcessor(default_config)
+    file_path = tmp_path / "input.jsonl"
+    items = [{"code": f"{i:03}"} for i in range(10)]
+    # an invalid item
+    items[4].pop("code")
+    file_path.write_text("\n".join(json.dumps(item) for item in items))
+    checkpoint = ImportCheckpoint("index1", file_path, 2, 0, tmp_path)
+    checkpoint.line = 2
+
+    documents = gen_documents(
+        processor, file_path, "index1", None, 2, 0, checkpoint=checkpoint
+    )
+    assert [document["_id"] for document in documents] == ["006", "008"]
+    assert list(checkpoint.pending) == [6, 8]
+
+
+def test_import_parallel_checkpoints(default_config, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "import_checkpoints_dir", tmp_path)
+    file_path = tmp_path / "input.jsonl"
+    file_path.write_text(json.dumps({"code": "001"}))
+    writer_mock = MagicMock()
+    writer_mock.return_value.write.return_value = (1, [])
+    with patch("app._import.connection"), patch("app._import.BulkWriter", writer_mock):
+        # partial imports can't be resumed, no checkpoint is saved
+        import_parallel(default_config, file_path, "off", None, 1, 0, checkpoints=False)
+        assert writer_mock.return_value.write.call_args.kwargs["on_chunk_sent"] is None
+        assert not (tmp_path / "off-0.json").exists()
+        import_parallel(default_config, file_path, "index1", None, 1, 0)
+        assert json.loads((tmp_path / "index1-0.json").read_text())["done"]
+
+
+def test_send_lines(default_config, tmp_path):
+    file_path = tmp_path / "input.jsonl"
+    items = [{"code": f"{i:03}", "unique_scans_n": i} for i in range(5)]
+    file_path.write_text("\n".join(json.dumps(item) for item in items))
+    lines_queues: list = [queue.Queue(), queue.Queue()]
+    send_lines(file_path, 4, lines_queues, batch_size=1)
+    lines = QueuedLines(lines_queues[1])
+    # the process 1 only receives its lines
+    assert [i for i, _ in lines] == [1, 3]
+    assert lines.done
+    processor = DocumentProcessor(default_config)
+    documents = gen_documents(
+        processor,
+        file_path,
+        "index1",
+        None,
+        2,
+        0,
+        lines=QueuedLines(lines_queues[0]),
+    )
+    assert [document["_id"] for document in documents] == ["000", "002"]
+    assert lines_queues[0].empty()
+
+
+def test_gen_documents_differential(default_config, tmp_path):
+    processor = DocumentProcessor(default_config)
+    file_path = tmp_path / "input.jsonl"
+    items = [{"code": f"{i:03}", "unique_scans_n": i} for i in range(3)]
+    file_path.write_text("\n".join(json.dumps(item) for item in items))
+    documents = list(gen_documents(processor, file_path, "index1", None, 1, 0))
+    hashes = {
+        document["_id"]: document["_source"]["content_hash"] for document in documents
+    }
+    # 001 changed, 003 is not in the file anymore
+    hashes["001"] = "old-hash"
+    hashes["003"] = "some-hash"
+    es_client = MagicMock()
+    with patch("app._import.scan") as scan_mock:
+        scan_mock.return_value = (
+            {"_id": _id, "_source": {"content_hash": hash_}}
+            for _id, hash_ in hashes.items()
+        )
+        assert save_content_hashes(es_client, "index1", tmp_path) == 4
+    content_hashes = ContentHashes(tmp_path, 0)
+    metrics = ImportMetrics()
+
+    documents = gen_documents(
+        processor,
+        file_path,
+        "index1",
+        None,
+        1,
+        0,
+        metrics,
+        content_hashes=content_hashes,
+    )
+    assert [document["_id"] for document in documents] == ["001"]
+    content_hashes.close()
+    assert metrics.counts["unchanged"] == 2
+    assert content_hashes.seen_ids_path.read_text().split() == [
+        '"000"',
+        '"001"',
+        '"002"',
+    ]
+    assert list(gen_removed_ids(tmp_path, [content_hashes.seen_ids_path])) == ["003"]
+
+
 def test_update_alias(default_config):
     es_mock = MagicMock()
     next_index = "index1"
@@ -447,3 +572,105 @@ def test_run_update_daemon(default_global_config: Config):
     kwargs = mock_call.kwargs
     assert set(kwargs.keys()) == {"index", "id"}
     assert kwargs["id"] == "4"
+
+
+def _taxonomies(labels_names=None):
+    return [
+        Taxonomy.from_dict(
+            "labels",
+            {
+                "en:organic": {"name": {"en": "Organic", "fr": "Bio"}},
+                "en:fair-trade": {"name": labels_names or {"en": "Fair trade"}},
+            },
+        ),
+        Taxonomy.from_dict("countries", {"en:france": {"name": {"en": "France"}}}),
+    ]
+
+
+def test_gen_taxonomy_documents(default_config):
+    hashes: dict[str, str] = {}
+    with patch("app._import.iter_taxonomies", return_value=_taxonomies()):
+        documents = list(
+            gen_taxonomy_documents(default_config, "taxonomy-1", {"en", "fr"}, hashes)
+        )
+    assert [(doc["_index"], doc["_id"]) for doc in documents] == [
+        ("taxonomy-1", "labels:en:organic"),
+        ("taxonomy-1", "labels:en:fair-trade"),
+        ("taxonomy-1", "countries:en:france"),
+    ]
+    assert hashes == {
+        "labels": taxonomy_hash(doc["_source"] for doc in documents[:2]),
+        "countries": taxonomy_hash([documents[2]["_source"]]),
+    }
+    assert hashes["labels"] != hashes["countries"]
+
+
+def test_gen_taxonomy_updates(default_config):
+    # previous import
+    previous_hashes: dict[str, str] = {}
+    with patch("app._import.iter_taxonomies", return_value=_taxonomies()):
+        previous = list(
+            gen_taxonomy_documents(
+                default_config,
+                "taxonomy-1",
+                set(default_config.supported_langs),
+                previous_hashes,
+            )
+        )
+    previous_hashes["brands"] = "a-removed-taxonomy"
+    indexed = {
+        "labels": [
+            {"_id": doc["_id"], "_source": doc["_source"]} for doc in previous[:2]
+        ],
+        "brands": [{"_id": "brands:xx:acme", "_source": {}}],
+    }
+
+    def scan_mock(es_client, index, query, size):
+        assert index == "taxonomy-1"
+        return indexed[query["query"]["term"]["taxonomy_name"]]
+
+    # fair trade got a french name
+    taxonomies = _taxonomies({"en": "Fair trade", "fr": "Commerce équitable"})
+    hashes: dict[str, str] = {}
+    with patch(
+        "app._import.iter_taxonomies", return_value=taxonomies
+    ) as iter_mock, patch("app._import.scan", side_effect=scan_mock):
+        actions = list(
+            gen_taxonomy_updates(
+                MagicMock(), default_config, "taxonomy-1", previous_hashes, hashes
+            )
+        )
+    iter_mock.assert_called_once_with(default_config.taxonomy, download_newer=True)
+    # countries are unchanged, labels changed and brands were removed
+    assert hashes["countries"] == previous_hashes["countries"]
+    assert hashes["labels"] != previous_hashes["labels"]
+    assert "brands" not in hashes
+    assert [(action.get("_op_type", "index"), action["_id"]) for action in actions] == [
+        ("index", "labels:en:fair-trade"),
+        ("delete", "brands:xx:acme"),
+    ]
+    assert actions[0]["_source"]["name"]["fr"] == "Commerce équitable"
+
+
+def test_update_taxonomies_errors(default_config):
+    previous_hashes = {"labels": "labels-1", "countries": "countries-1"}
+
+    def gen_updates(es_client, config, index_name, previous_hashes, hashes):
+        hashes.update({"labels": "labels-2", "countries": "countries-2"})
+        hashes["brands"] = "brands-1"
+        return iter([])
+
+    errors = [
+        {"index": {"_id": "labels:en:organic", "status": 400}},
+        {"index": {"_id": "brands:xx:acme", "status": 400}},
+    ]
+    es_client = MagicMock()
+    with patch("app._import.gen_taxonomy_updates", side_effect=gen_updates), patch(
+        "app._import.BulkWriter"
+    ) as writer_mock, patch("app._import.set_taxonomy_hashes") as set_hashes_mock:
+        writer_mock.return_value.write.return_value = (10, errors)
+        update_taxonomies(es_client, default_config, "taxonomy-1", previous_hashes)
+    # taxonomies with errors will be updated again next time
+    set_hashes_mock.assert_called_once_with(
+        es_client, "taxonomy-1", {"labels": "labels-1", "countries": "countries-2"}
+    )
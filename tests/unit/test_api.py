@@ -0,0 +1,48 @@
+from unittest.mock import patch
+
+import elasticsearch
+import pytest
+
+from app.openfoodfacts import IMAGE_FIELDS_FIELD
+
+
+@pytest.fixture
+def es_client(global_config):
+    with patch("app.api.connection.current_es_client") as current_es_client:
+        yield current_es_client.return_value
+
+
+def test_get_document(es_client, test_client):
+    es_client.get.return_value = {"_id": "3000", "_source": {"code": "3000"}}
+    response = test_client.get("/document/3000")
+    assert response.status_code == 200
+    assert response.json() == {"code": "3000"}
+    # internal fields are not returned
+    es_client.get.assert_called_once_with(
+        index="openfoodfacts", id="3000", source_excludes=[IMAGE_FIELDS_FIELD]
+    )
+
+    es_client.get.side_effect = elasticsearch.NotFoundError("not found", None, {})
+    assert test_client.get("/document/3001").status_code == 404
+
+
+def test_get_documents(es_client, test_client):
+    es_client.mget.return_value = {
+        "docs": [
+            {"_id": "3000", "found": True, "_source": {"code": "3000"}},
+            {"_id": "3001", "found": False},
+        ]
+    }
+    response = test_client.get(
+        "/documents", params={"ids": "3000,3001", "fields": "product_name"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"documents": [{"code": "3000"}], "not_found": ["3001"]}
+    # internal fields are not returned
+    es_client.mget.assert_called_once_with(
+        index="openfoodfacts",
+        ids=["3000", "3001"],
+        source_includes=["code", "product_name"],
+        source_excludes=[IMAGE_FIELDS_FIELD],
+    )
+    assert test_client.get("/documents", params={"ids": ","}).status_code == 400
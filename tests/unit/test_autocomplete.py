@@ -0,0 +1,303 @@
+from unittest.mock import patch
+
+import pytest
+
+from app import autocomplete
+from app.autocomplete import (
+    CompletionCache,
+    CompletionCacheKey,
+    CompletionEntry,
+    SortedCompletionIndex,
+    TaxonomyCompletionEngine,
+    completion_normalizer,
+    get_completion_engine,
+    normalize_completion_input,
+)
+from app.config import AutocompleteEngine
+
+
+def _entry(id_, synonyms, taxonomy_name="categories", name=None):
+    return {
+        "id": id_,
+        "taxonomy_name": taxonomy_name,
+        "name": name or {lang: syns[0] for lang, syns in synonyms.items()},
+        "synonyms": {
+            lang: {"input": syns, "weight": max(100 - len(id_), 0)}
+            for lang, syns in synonyms.items()
+        },
+    }
+
+
+ENTRIES = [
+    _entry("en:biscuits", {"en": ["Biscuits", "biscuit"], "fr": ["Biscuits"]}),
+    _entry("en:beverages", {"en": ["Beverages", "drinks"], "fr": ["Boissons"]}),
+    _entry("en:chocolate-biscuits", {"en": ["Biscuit with chocolate"]}),
+    _entry("en:sweetened-beverages", {"en": ["Beverages with added sugar"]}),
+    _entry("en:creme-brulee", {"en": ["Crème brûlée"], "fr": ["Crème brûlée"]}),
+    _entry("en:organic", {"en": ["Organic"], "fr": ["Bio", "biologique"]}, "labels"),
+    _entry("en:muesli", {"de": ["Müsli", "Muesli"], "ar": ["موسلي"]}),
+]
+
+
+@pytest.fixture
+def engine():
+    return TaxonomyCompletionEngine(ENTRIES)
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("Crème Brûlée", "cremebrulee"),
+        ("Fairtrade/Max H", "fairtrademaxh"),
+        ("  ", ""),
+        ("Œufs", "œufs"),
+    ],
+)
+def test_normalize_completion_input(text, expected):
+    assert normalize_completion_input(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text,normalizer,expected",
+    [
+        # like Elasticsearch german_normalization, no ascii folding
+        ("Müsli", "german_normalization", "musli"),
+        ("Muesli", "german_normalization", "musli"),
+        ("Straße", "german_normalization", "strasse"),
+        ("Quelle", "german_normalization", "quelle"),
+        ("Blaue", "german_normalization", "blaue"),
+        ("Café", "german_normalization", "café"),
+        # like Elasticsearch scandinavian_folding
+        ("Blåbær", "scandinavian_folding", "blabar"),
+        ("Rødgrød", "scandinavian_folding", "rodgrod"),
+        ("Blaabaer", "scandinavian_folding", "blabar"),
+        ("Koogt", "scandinavian_folding", "kogt"),
+    ],
+)
+def test_normalize_completion_input_special(text, normalizer, expected):
+    assert normalize_completion_input(text, normalizer) == expected
+
+
+def test_completion_normalizer():
+    assert completion_normalizer(["en", "fr"]) == "asciifolding"
+    assert completion_normalizer(["de"]) == "german_normalization"
+    assert completion_normalizer(["sv", "da"]) == "scandinavian_folding"
+    # different normalizations
+    assert completion_normalizer(["en", "de"]) is None
+    # not mimicked
+    assert completion_normalizer(["ar"]) is None
+
+
+def _completions(response):
+    return [(option["id"], option["text"], option["score"]) for option in response]
+
+
+@pytest.mark.parametrize(
+    "q,taxonomy_names,langs,fuzziness,expected",
+    [
+        # best weight first, one result per entry, shortest synonym
+        (
+            "b",
+            ["categories"],
+            ["en"],
+            None,
+            [
+                ("en:biscuits", "biscuit", 89.0),
+                ("en:beverages", "Beverages", 88.0),
+                ("en:chocolate-biscuits", "Biscuit with chocolate", 79.0),
+                ("en:sweetened-beverages", "Beverages with added sugar", 78.0),
+            ],
+        ),
+        # separators and accents are ignored
+        (
+            "creme br",
+            ["categories"],
+            ["en"],
+            None,
+            [("en:creme-brulee", "Crème brûlée", 85.0)],
+        ),
+        (
+            "beverages w",
+            ["categories"],
+            ["en"],
+            None,
+            [("en:sweetened-beverages", "Beverages with added sugar", 78.0)],
+        ),
+        # only requested taxonomies and languages
+        ("bio", ["labels"], ["en"], None, []),
+        ("bio", ["labels"], ["fr"], None, [("en:organic", "Bio", 90.0)]),
+        ("bio", ["categories"], ["fr"], None, []),
+        # fuzzy, with an exact prefix first
+        (
+            "bicsuit",
+            ["categories"],
+            ["en"],
+            1,
+            [
+                ("en:biscuits", "biscuit", 89.0),
+                ("en:chocolate-biscuits", "Biscuit with chocolate", 79.0),
+            ],
+        ),
+        ("biscuiz", ["categories"], ["en"], None, []),
+        (
+            "biscuiz",
+            ["categories"],
+            ["en"],
+            1,
+            [
+                ("en:biscuits", "biscuit", 89.0),
+                ("en:chocolate-biscuits", "Biscuit with chocolate", 79.0),
+            ],
+        ),
+        # first letter must match
+        ("viscuit", ["categories"], ["en"], 2, []),
+        # no fuzziness on short input
+        ("bo", ["categories"], ["fr"], 1, [("en:beverages", "Boissons", 88.0)]),
+        # language specific normalization
+        ("mue", ["categories"], ["de"], None, [("en:muesli", "Muesli", 91.0)]),
+        # languages that are not mimicked are left to Elasticsearch
+        ("مو", ["categories"], ["ar"], None, []),
+    ],
+)
+def test_complete(engine, q, taxonomy_names, langs, fuzziness, expected):
+    response = engine.complete(q, taxonomy_names, langs, 5, fuzziness)
+    assert response["timed_out"] is False
+    assert _completions(response["options"]) == expected
+
+
+def test_complete_multiple_langs(engine):
+    response = engine.complete("bi", ["categories", "labels"], ["fr", "en"], 2)
+    # an entry is returned once, names are in the first language
+    assert [
+        (option["id"], option["name"], option["input"])
+        for option in response["options"]
+    ] == [
+        ("en:organic", "Bio", "bi"),
+        ("en:biscuits", "Biscuits", "bi"),
+        ("en:chocolate-biscuits", "", "bi"),
+    ]
+
+
+def test_complete_size(engine):
+    response = engine.complete("b", ["categories"], ["en"], 2)
+    assert _completions(response["options"]) == [
+        ("en:biscuits", "biscuit", 89.0),
+        ("en:beverages", "Beverages", 88.0),
+    ]
+
+
+def test_iter_fuzzy_matches_edit_distance():
+    entry = CompletionEntry(
+        id="en:test", taxonomy_name="test", name={}, weight=1, synonyms={}
+    )
+    words = ["abcd", "abdc", "abxd", "axyz", "ab", "abcdef", "bacd", "acbd"]
+    index = SortedCompletionIndex([(word, entry) for word in words])
+    matches = {
+        index.keys[position]: distance
+        for distance, start, end in index.iter_fuzzy("abcd", 1)
+        for position in range(start, end)
+    }
+    assert matches == {
+        "abcd": 0,
+        "abcdef": 0,
+        # transposition
+        "abdc": 1,
+        "acbd": 1,
+        # substitution
+        "abxd": 1,
+        # "ab" needs two insertions, "bacd" does not start with "a"
+    }
+
+
+def _cache_key(prefix, fuzziness=None, generation="off_taxonomy-1"):
+    return CompletionCacheKey(
+        index_id="off",
+        generation=generation,
+        engine=AutocompleteEngine.memory,
+        taxonomy_names=("categories",),
+        langs=("en",),
+        size=5,
+        fuzziness=fuzziness,
+        prefix=prefix,
+    )
+
+
+def test_completion_cache(engine):
+    cache = CompletionCache(maxsize=10, ttl=60)
+    assert cache.get(_cache_key("b")) == (None, "miss")
+    result = engine.complete_result("B", ["categories"], ["en"], 5)
+    assert result.complete
+    cache.set(_cache_key("b"), result)
+    assert cache.get(_cache_key("b")) == (result, "hit")
+    # another generation does not use it
+    assert cache.get(_cache_key("b", generation="off_taxonomy-2")) == (None, "miss")
+    # a longer input is derived from the complete result
+    derived, status = cache.get(_cache_key("beveragesw"))
+    assert status == "prefix"
+    expected = engine.complete_result("beverages w", ["categories"], ["en"], 5)
+    assert derived.response_for("x") == expected.response_for("x")
+    assert derived.response_for("Beverages w")["options"] == [
+        {
+            "id": "en:sweetened-beverages",
+            "text": "Beverages with added sugar",
+            "name": "Beverages with added sugar",
+            "score": 78.0,
+            "input": "Beverages w",
+            "taxonomy_name": "categories",
+        }
+    ]
+    # and is cached
+    assert cache.get(_cache_key("beveragesw")) == (derived, "hit")
+    # the text is changed if needed, to match the input
+    derived, status = cache.get(_cache_key("biscuits"))
+    assert status == "prefix"
+    assert [
+        (option["id"], option["text"]) for option in derived.response["options"]
+    ] == [("en:biscuits", "Biscuits")]
+    # fuzzy results are not derived
+    assert cache.get(_cache_key("bisc", fuzziness=1)) == (None, "miss")
+
+
+def test_completion_cache_incomplete(engine):
+    cache = CompletionCache(maxsize=10, ttl=60)
+    key = _cache_key("b")._replace(size=2)
+    result = engine.complete_result("b", ["categories"], ["en"], 2)
+    assert not result.complete
+    cache.set(key, result)
+    # other entries may match, so we don't derive from it
+    assert cache.get(key._replace(prefix="bev")) == (None, "miss")
+
+
+def test_completion_cache_disabled(engine):
+    cache = CompletionCache(maxsize=0, ttl=60)
+    cache.set(_cache_key("b"), engine.complete_result("b", ["categories"], ["en"], 5))
+    assert cache.get(_cache_key("b")) == (None, "miss")
+
+
+def test_completion_cache_other_normalizer(engine):
+    cache = CompletionCache(maxsize=10, ttl=60)
+    key = _cache_key("m")._replace(langs=("de",), normalizer="german_normalization")
+    cache.set(key, engine.complete_result("m", ["categories"], ["de"], 5))
+    derived, status = cache.get(key._replace(prefix="mu"))
+    assert status == "prefix"
+    assert [option["id"] for option in derived.response["options"]] == ["en:muesli"]
+    # languages with different normalizations are only cached as is
+    key = _cache_key("m")._replace(langs=("de", "en"), normalizer=None)
+    cache.set(key, engine.complete_result("m", ["categories"], ["de", "en"], 5))
+    assert cache.get(key)[1] == "hit"
+    assert cache.get(key._replace(prefix="mu")) == (None, "miss")
+
+
+def test_get_completion_engine(default_config, monkeypatch):
+    monkeypatch.setattr(autocomplete, "_COMPLETION_ENGINES", {})
+    engine = TaxonomyCompletionEngine(ENTRIES)
+    with patch.object(
+        TaxonomyCompletionEngine, "from_config", return_value=engine
+    ) as from_config:
+        # the engine is built in background, Elasticsearch is used meanwhile
+        assert get_completion_engine("off", default_config, "gen-1") is None
+        build = autocomplete._COMPLETION_ENGINE_BUILDS.get("off")
+        if build is not None:
+            build.join()
+        assert get_completion_engine("off", default_config, "gen-1") is engine
+        from_config.assert_called_once_with(default_config)
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+from elasticsearch_dsl.connections import connections
+
+from app._types import FetcherResult, FetcherStatus
+from app.benchmarks import load_test, search_benchmark
+from app.benchmarks.data_generation import generate_products, write_products
+from app.benchmarks.fake_es import fake_aggregation
+from app.benchmarks.import_benchmark import benchmark_import
+from app.indexing import DocumentProcessor
+
+
+def test_generate_products(default_config):
+    products = list(generate_products(10, seed=1))
+    # generation is reproducible
+    assert products == list(generate_products(10, seed=1))
+    assert products != list(generate_products(10, seed=2))
+    assert len({product["code"] for product in products}) == 10
+    processor = DocumentProcessor(default_config)
+    for product in products:
+        result = processor.from_result(
+            FetcherResult(status=FetcherStatus.FOUND, document=product)
+        )
+        assert result.status == FetcherStatus.FOUND
+        document = result.document
+        assert document["product_name"]["main"] == product["product_name"]
+        assert document.get("categories") == (product["categories_tags"] or None)
+
+
+def test_benchmark_import(default_config, tmp_path):
+    file_path = tmp_path / "products.jsonl"
+    write_products(file_path, 20)
+    report = benchmark_import(default_config, file_path)
+    assert report["documents"] == 20
+    assert report["errors"] == 0
+    assert report["counts"]["acknowledged"] == 20
+    assert {"read", "parse", "preprocess", "transform", "serialize", "bulk"} <= set(
+        report["stages"]
+    )
+    assert report["peak_rss_bytes"] > 0
+    # limit the number of items
+    assert benchmark_import(default_config, file_path, num_items=5)["documents"] == 5
+
+
+def test_fake_aggregation():
+    documents = [
+        {"labels": ["en:organic", "en:vegan"], "nutriments": {"fat_100g": 1.5}},
+        {"labels": ["en:organic"], "nutriments": {"fat_100g": 12}},
+        {"labels": [], "nutriments": {}},
+    ]
+    assert fake_aggregation({"terms": {"field": "labels", "size": 1}}, documents) == {
+        "doc_count_error_upper_bound": 0,
+        "sum_other_doc_count": 1,
+        "buckets": [{"key": "en:organic", "doc_count": 2}],
+    }
+    histogram = fake_aggregation(
+        {"histogram": {"field": "nutriments.fat_100g", "interval": 10}}, documents
+    )
+    assert histogram == {
+        "buckets": [{"key": 0, "doc_count": 1}, {"key": 10, "doc_count": 1}]
+    }
+    stats = fake_aggregation(
+        {
+            "filter": {"match_all": {}},
+            "aggs": {"stats": {"stats": {"field": "nutriments.fat_100g"}}},
+        },
+        documents,
+    )
+    assert stats["doc_count"] == 3
+    assert stats["stats"] == {
+        "count": 2,
+        "min": 1.5,
+        "max": 12,
+        "avg": 6.75,
+        "sum": 13.5,
+    }
+
+
+@pytest.fixture
+def fake_es_connection():
+    yield
+    connections.remove_connection("default")
+
+
+def test_benchmark_search(global_config, fake_es_connection):
+    queries = [
+        query
+        for query in search_benchmark.QUERIES
+        if query["name"] in ("free_text", "facets", "charts")
+    ]
+    report = search_benchmark.benchmark_search(
+        "off", queries, iterations=2, warmup=1, num_documents=10, allocations=True
+    )
+    assert set(report["queries"]) == {"free_text", "facets", "charts"}
+    facets_report = report["queries"]["facets"]
+    assert facets_report["peak_alloc_bytes"] > 0
+    # allocations are also measured by stage
+    assert facets_report["stages"]["facets"]["peak_alloc_bytes"] > 0
+    assert (
+        0
+        < facets_report["stages"]["parse"]["peak_alloc_bytes"]
+        <= facets_report["peak_alloc_bytes"]
+    )
+    assert {
+        "parse",
+        "es_query_build",
+        "es_request",
+        "result_processing",
+        "facets",
+        "charts",
+        "serialization",
+        "total",
+    } <= set(facets_report["stages"])
+    assert report["stages"]["total"]["ops_per_sec"] > 0
+
+
+def test_load_requests(tmp_path):
+    file_path = tmp_path / "requests.jsonl"
+    file_path.write_text(
+        '{"method": "GET", "path": "/search", "params": {"q": "milk"}}\n'
+        '{"method": "POST", "path": "/search", "json": {"q": "milk"}}\n'
+    )
+    assert load_test.load_requests(file_path) == [
+        load_test.RecordedRequest("GET", "/search", params={"q": "milk"}),
+        load_test.RecordedRequest("POST", "/search", json={"q": "milk"}),
+    ]
+    assert len(load_test.load_requests()) == len(load_test.DEFAULT_REQUESTS)
+
+
+def test_run_load_test(global_config, fake_es_connection):
+    requests = [
+        load_test.RecordedRequest("POST", "/search", json={"q": "milk"}),
+        load_test.RecordedRequest(
+            "GET", "/autocomplete", params={"q": "mi", "taxonomy_names": "labels"}
+        ),
+        # invalid request
+        load_test.RecordedRequest("GET", "/search"),
+    ]
+
+    async def run():
+        async with load_test.in_process_client(num_documents=10) as client:
+            return await load_test.run_load_test(
+                client, requests, rate=30, duration=0.2
+            )
+
+    report = asyncio.run(run())
+    assert report["requests"] == 6
+    assert report["statuses"] == {"200": 4, "422": 2}
+    assert report["error_rate"] == pytest.approx(1 / 3)
+    assert report["endpoints"]["/autocomplete"]["statuses"] == {"200": 2}
+    assert report["endpoints"]["/search"]["requests"] == 4
+    latencies = report["latency_ms"]
+    assert 0 < latencies["p50"] <= latencies["p95"] <= latencies["p99"]
@@ -0,0 +1,226 @@
+import datetime
+import decimal
+import json
+import time
+from unittest.mock import MagicMock
+
+import elastic_transport
+import elasticsearch
+import pytest
+from elasticsearch import Elasticsearch
+
+from app import bulk_writer
+from app.bulk_writer import BulkWriter
+from app.import_metrics import ImportMetrics
+
+REJECTED = {
+    "status": 429,
+    "error": {"type": "es_rejected_execution_exception", "reason": "busy"},
+}
+
+
+def bulk_response(items):
+    return {"errors": False, "items": items}
+
+
+def actions(num, text=""):
+    return [
+        {"_index": "index1", "_id": str(i), "_source": {"code": str(i), "text": text}}
+        for i in range(num)
+    ]
+
+
+@pytest.fixture
+def es_client():
+    es_client = MagicMock(spec=Elasticsearch)
+    # use the real serializers
+    es_client.transport = Elasticsearch("http://localhost:9200").transport
+    return es_client
+
+
+@pytest.fixture
+def sleep_mock(monkeypatch):
+    sleep_mock = MagicMock()
+    monkeypatch.setattr(bulk_writer.time, "sleep", sleep_mock)
+    return sleep_mock
+
+
+def sent_ids(es_client):
+    """ids sent in each bulk request"""
+    return [
+        [
+            json.loads(line)["index"]["_id"]
+            for line in call.kwargs["operations"]
+            if b'"index"' in line
+        ]
+        for call in es_client.bulk.call_args_list
+    ]
+
+
+def test_bulk_writer_write(es_client, sleep_mock):
+    es_client.bulk.side_effect = [
+        bulk_response(
+            [
+                {"index": {"status": 201}},
+                {"index": {"status": 429, **REJECTED}},
+                {
+                    "index": {
+                        "status": 400,
+                        "error": {"type": "mapper_parsing_exception"},
+                    }
+                },
+            ]
+        ),
+        bulk_response([{"index": {"status": 201}}]),
+    ]
+    metrics = ImportMetrics()
+    writer = BulkWriter(es_client, metrics, target_latency=10)
+    chunks_sent: list[int] = []
+    success, errors = writer.write(actions(3), on_chunk_sent=chunks_sent.append)
+    assert success == 2
+    assert chunks_sent == [3]
+    assert errors == [
+        {"index": {"status": 400, "error": {"type": "mapper_parsing_exception"}}}
+    ]
+    # rejected item was sent again, after a backoff
+    assert sent_ids(es_client) == [["0", "1", "2"], ["1"]]
+    sleep_mock.assert_called_once_with(bulk_writer.INITIAL_BACKOFF)
+    lines = es_client.bulk.call_args_list[0].kwargs["operations"]
+    assert [json.loads(line) for line in lines[:2]] == [
+        {"index": {"_index": "index1", "_id": "0"}},
+        {"code": "0", "text": ""},
+    ]
+    assert metrics.counts == {"acknowledged": 2, "failed": 1}
+    assert metrics.errors == {
+        "es_rejected_execution_exception": 1,
+        "mapper_parsing_exception": 1,
+    }
+    assert metrics.retries == {"status_429": 1}
+    assert metrics.bulk_requests == 2
+    assert metrics.bulk_bytes == sum(
+        len(line) + 1
+        for call in es_client.bulk.call_args_list
+        for line in call.kwargs["operations"]
+    )
+
+
+def test_bulk_writer_max_retries(es_client, sleep_mock):
+    # the whole request is rejected
+    es_client.bulk.side_effect = elasticsearch.ApiError(
+        "rejected",
+        elastic_transport.ApiResponseMeta(
+            status=429,
+            http_version="1.1",
+            headers=elastic_transport.HttpHeaders(),
+            duration=0.1,
+            node=MagicMock(),
+        ),
+        body={},
+    )
+    writer = BulkWriter(es_client, max_retries=2)
+    success, errors = writer.write(actions(2))
+    assert success == 0
+    assert errors == [
+        {
+            "index": {
+                "_index": "index1",
+                "_id": str(i),
+                "status": 429,
+                "error": "rejected after 2 retries",
+            }
+        }
+        for i in range(2)
+    ]
+    assert es_client.bulk.call_count == 3
+    assert [call.args[0] for call in sleep_mock.call_args_list] == [1.0, 2.0]
+    assert writer.metrics.counts["failed"] == 2
+
+
+def test_bulk_writer_adapt_chunk_bytes(es_client):
+    writer = BulkWriter(es_client, chunk_bytes=1_000_000, target_latency=1)
+    writer.adapt_chunk_bytes(0.2, rejected=False)
+    assert writer.chunk_bytes == 1_250_000
+    writer.adapt_chunk_bytes(0.7, rejected=False)
+    assert writer.chunk_bytes == 1_250_000
+    writer.adapt_chunk_bytes(0.2, rejected=True)
+    assert writer.chunk_bytes == 625_000
+    writer.adapt_chunk_bytes(1.5, rejected=False)
+    assert writer.chunk_bytes == 312_500
+    writer.chunk_bytes = bulk_writer.MAX_CHUNK_BYTES
+    writer.adapt_chunk_bytes(0.1, rejected=False)
+    assert writer.chunk_bytes == bulk_writer.MAX_CHUNK_BYTES
+    writer.chunk_bytes = bulk_writer.MIN_CHUNK_BYTES
+    writer.adapt_chunk_bytes(1.5, rejected=False)
+    assert writer.chunk_bytes == bulk_writer.MIN_CHUNK_BYTES
+
+
+def test_bulk_writer_chunks(es_client):
+    writer = BulkWriter(es_client, chunk_bytes=200)
+    chunks = writer.chunks(actions(5, text="x" * 30))
+    # each action is ~90 bytes, so we get two actions per chunk
+    assert len(next(chunks)) == 2
+    # a change of chunk size applies to next chunks
+    writer.chunk_bytes = 100
+    assert [len(chunk) for chunk in chunks] == [1, 1, 1]
+    # an action larger than chunk size is sent alone
+    assert [len(chunk) for chunk in writer.chunks(actions(2, text="x" * 300))] == [
+        1,
+        1,
+    ]
+
+
+def test_bulk_writer_senders(es_client, monkeypatch):
+    completed: list[str] = []
+
+    def bulk(operations):
+        ids = [json.loads(line)["index"]["_id"] for line in operations[::2]]
+        # first chunk is slower, so that it completes after next ones
+        time.sleep(0.1 if "0" in ids else 0.0)
+        completed.extend(ids)
+        return bulk_response([{"index": {"status": 201}} for _ in ids])
+
+    es_client.bulk.side_effect = bulk
+    writer = BulkWriter(es_client, chunk_bytes=100, senders=3)
+    # keep one action per chunk
+    monkeypatch.setattr(writer, "adapt_chunk_bytes", MagicMock())
+    # ids completed when each chunk is reported
+    reported: list[list[str]] = []
+    success, errors = writer.write(
+        actions(10, text="x" * 30),
+        on_chunk_sent=lambda size: reported.append(list(completed)),
+    )
+    assert (success, errors) == (10, [])
+    assert es_client.bulk.call_count == 10
+    assert completed[0] != "0"
+    # chunks are reported in order, the first one once it is completed
+    assert len(reported) == 10
+    assert "0" in reported[0]
+    assert writer.metrics.counts["acknowledged"] == 10
+    assert writer.metrics.bulk_requests == 10
+
+
+def test_bulk_writer_senders_error(es_client):
+    es_client.bulk.side_effect = elasticsearch.ConnectionError("no connection")
+    writer = BulkWriter(es_client, chunk_bytes=100, senders=2)
+    with pytest.raises(elasticsearch.ConnectionError):
+        writer.write(actions(10, text="x" * 30))
+    assert writer.metrics.errors["ConnectionError"] >= 1
+
+
+def test_bulk_writer_serialize(es_client):
+    writer = BulkWriter(es_client)
+    action = {
+        "_index": "index1",
+        "_id": "1",
+        "_source": {
+            "date": datetime.datetime(2024, 1, 2, 3, 4, 5),
+            "price": decimal.Decimal("1.5"),
+        },
+    }
+    lines = writer.serialize(action)
+    assert lines == [
+        b'{"index":{"_id":"1","_index":"index1"}}',
+        b'{"date":"2024-01-02T03:04:05","price":1.5}',
+    ]
+    # already serialized actions are kept as is
+    assert writer.serialize(lines) is lines
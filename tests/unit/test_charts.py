@@ -0,0 +1,209 @@
+import pytest
+
+from app._types import (
+    DistributionChart,
+    GetSearchParameters,
+    HistogramChart,
+    ScatterChart,
+    StatsChart,
+    SuccessSearchResponse,
+)
+from app.charts import build_charts, build_charts_templates
+from app.query import create_chart_aggregation_clauses
+
+
+def test_parse_numeric_charts_get():
+    params = GetSearchParameters(
+        sort_by="unique_scans_n",
+        charts="categories,histogram:nutriscore_score,stats:nutriments.salt_100g,"
+        "unique_scans_n:completeness",
+    )
+    assert params.charts == [
+        DistributionChart(field="categories"),
+        HistogramChart(field="nutriscore_score"),
+        StatsChart(field="nutriments.salt_100g"),
+        ScatterChart(x="unique_scans_n", y="completeness"),
+    ]
+
+
+def test_numeric_charts_must_be_numeric():
+    with pytest.raises(ValueError, match="Non numeric field name: categories"):
+        GetSearchParameters(sort_by="unique_scans_n", charts="histogram:categories")
+
+
+def test_histogram_chart_validation():
+    with pytest.raises(ValueError, match="greater than 0"):
+        HistogramChart(field="nutriscore_score", interval=0)
+    with pytest.raises(ValueError, match="greater than or equal to 1"):
+        HistogramChart(field="nutriscore_score", buckets=0)
+
+
+def test_create_chart_aggregation_clauses():
+    clauses = create_chart_aggregation_clauses(
+        [
+            DistributionChart(field="categories"),
+            HistogramChart(field="nutriscore_score", interval=5),
+            HistogramChart(field="completeness", buckets=10),
+            StatsChart(field="nutriments.salt_100g"),
+        ]
+    )
+    assert {name: agg.to_dict() for name, agg in clauses.items()} == {
+        "histogram:nutriscore_score": {
+            "histogram": {"field": "nutriscore_score", "interval": 5}
+        },
+        "histogram:completeness": {
+            "variable_width_histogram": {"field": "completeness", "buckets": 10}
+        },
+        "stats:nutriments.salt_100g": {
+            "filter": {"match_all": {}},
+            "aggs": {
+                "stats": {"stats": {"field": "nutriments.salt_100g"}},
+                "percentiles": {
+                    "percentiles": {
+                        "field": "nutriments.salt_100g",
+                        "percents": [5, 25, 50, 75, 95],
+                    }
+                },
+            },
+        },
+    }
+
+
+def test_build_numeric_charts(default_config):
+    search_result = SuccessSearchResponse(
+        hits=[],
+        page=1,
+        page_size=10,
+        page_count=1,
+        took=1,
+        timed_out=False,
+        count=12,
+        is_count_exact=True,
+        aggregations={
+            "histogram:nutriscore_score": {
+                "buckets": [
+                    {"key": -5.0, "doc_count": 2},
+                    {"key": 0.0, "doc_count": 10},
+                ]
+            },
+            "histogram:completeness": {
+                "buckets": [
+                    {"key": 0.2, "min": 0.1, "max": 0.3, "doc_count": 4},
+                    {"key": 0.8, "min": 0.7, "max": 0.9, "doc_count": 8},
+                ]
+            },
+            "stats:nutriments.salt_100g": {
+                "doc_count": 12,
+                "stats": {"count": 12, "min": 0.0, "max": 4.0, "avg": 1.1, "sum": 13.2},
+                "percentiles": {
+                    "values": {
+                        "5.0": 0.1,
+                        "25.0": 0.5,
+                        "50.0": 1.0,
+                        "75.0": 1.5,
+                        "95.0": 3.5,
+                    }
+                },
+            },
+        },
+    )
+    charts = build_charts(
+        search_result,
+        default_config,
+        [
+            HistogramChart(field="nutriscore_score", interval=5),
+            HistogramChart(field="completeness"),
+            StatsChart(field="nutriments.salt_100g"),
+            # no aggregation, gives an empty chart
+            StatsChart(field="nutriscore_score"),
+        ],
+    )
+    assert set(charts.keys()) == {
+        "histogram:nutriscore_score",
+        "histogram:completeness",
+        "stats:nutriments.salt_100g",
+        "stats:nutriscore_score",
+    }
+    assert charts["histogram:nutriscore_score"]["data"][0]["values"] == [
+        {"start": -5.0, "end": 0.0, "amount": 2},
+        {"start": 0.0, "end": 5.0, "amount": 10},
+    ]
+    assert charts["histogram:completeness"]["data"][0]["values"] == [
+        {"start": 0.1, "end": 0.3, "amount": 4},
+        {"start": 0.7, "end": 0.9, "amount": 8},
+    ]
+    assert charts["stats:nutriments.salt_100g"]["data"][0]["values"] == [
+        {
+            "count": 12,
+            "min": 0.0,
+            "max": 4.0,
+            "avg": 1.1,
+            "p5": 0.1,
+            "q1": 0.5,
+            "median": 1.0,
+            "q3": 1.5,
+            "p95": 3.5,
+        }
+    ]
+    assert charts["stats:nutriscore_score"]["data"][0]["values"] == []
+
+
+def test_build_charts_data_only(default_config):
+    search_result = SuccessSearchResponse(
+        hits=[{"unique_scans_n": 10, "completeness": 0.5}],
+        page=1,
+        page_size=10,
+        page_count=1,
+        took=1,
+        timed_out=False,
+        count=1,
+        is_count_exact=True,
+        aggregations={
+            "categories": {"buckets": [{"key": "en:biscuits", "doc_count": 1}]},
+        },
+    )
+    requested_charts = [
+        DistributionChart(field="categories"),
+        ScatterChart(x="unique_scans_n", y="completeness"),
+    ]
+    charts = build_charts(search_result, default_config, requested_charts)
+    data_charts = build_charts(
+        search_result, default_config, requested_charts, data_only=True
+    )
+    templates = build_charts_templates(default_config, requested_charts)
+    assert (
+        set(charts)
+        == set(data_charts)
+        == set(templates)
+        == {
+            "categories",
+            "unique_scans_n:completeness",
+        }
+    )
+    assert data_charts["categories"] == {
+        "data": [
+            {
+                "name": "table",
+                "values": [{"category": "en:biscuits", "amount": 1}],
+                "transform": [
+                    {"type": "filter", "expr": "datum['category'] != 'unknown'"}
+                ],
+            }
+        ]
+    }
+    assert data_charts["unique_scans_n:completeness"] == {
+        "data": [
+            {"name": "source", "values": [{"unique_scans_n": 10, "completeness": 0.5}]}
+        ]
+    }
+    for key, chart in charts.items():
+        # full chart is the template with data injected
+        assert chart == {**templates[key], **data_charts[key]}
+        # templates are not modified
+        assert templates[key]["data"][0]["values"] == []
+    # templates are built once
+    assert build_charts_templates(default_config, requested_charts) == templates
+    assert (
+        build_charts_templates(default_config, requested_charts)["categories"]
+        is templates["categories"]
+    )
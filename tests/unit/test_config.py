@@ -93,3 +93,31 @@ def test_reserved_field_names(tmpdir):
         app.config.Config.from_yaml(my_config)
     assert "last_indexed_datetime" in str(excinfo.value)
     assert "_id" in str(excinfo.value)
+
+
+HIERARCHY_FIELDS = """
+            categories:
+                type: taxonomy
+                taxonomy_name: categories
+                expand_ancestors: true
+            categories_hierarchy:
+                type: keyword
+"""
+
+
+def test_reserved_hierarchy_field_names(tmpdir):
+    """Test we can't use the name of the ancestors field of a taxonomy field"""
+    my_config = tmpdir / "config.yaml"
+    conf_content = BASE_CONFIG.replace("        # more fields\n", HIERARCHY_FIELDS)
+    open(my_config, "w").write(conf_content)
+    with pytest.raises(ValueError, match="categories_hierarchy"):
+        app.config.Config.from_yaml(my_config)
+    field = app.config.FieldConfig(
+        name="categories", type="taxonomy", taxonomy_name="categories"
+    )
+    assert field.get_hierarchy_field_name() == "categories_hierarchy"
+
+
+def test_expand_ancestors_only_for_taxonomy():
+    with pytest.raises(ValueError, match="expand_ancestors"):
+        app.config.FieldConfig(type="keyword", expand_ancestors=True)
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import pytest
+
+from app.import_checkpoint import ImportCheckpoint, remove_checkpoints
+
+
+def test_import_checkpoint(tmp_path):
+    file_path = Path("products.jsonl")
+    checkpoint = ImportCheckpoint("index1", file_path, 2, 1, tmp_path)
+    for line in (1, 3, 5):
+        checkpoint.add_pending(line)
+    checkpoint.chunk_sent(2)
+    assert checkpoint.path == tmp_path / "index1-1.json"
+    assert checkpoint.path.exists()
+
+    resumed = ImportCheckpoint("index1", file_path, 2, 1, tmp_path)
+    resumed.load()
+    assert (resumed.line, resumed.sent, resumed.done) == (3, 2, False)
+    checkpoint.chunk_sent(1)
+    checkpoint.finish()
+    resumed.load()
+    assert (resumed.line, resumed.sent, resumed.done) == (5, 3, True)
+
+    # no checkpoint for this process
+    other = ImportCheckpoint("index1", file_path, 2, 0, tmp_path)
+    other.load()
+    assert (other.line, other.done) == (-1, False)
+
+    # other parameters
+    with pytest.raises(ValueError, match="same file and number of processes"):
+        ImportCheckpoint("index1", file_path, 3, 1, tmp_path).load()
+    with pytest.raises(ValueError, match="same file and number of processes"):
+        ImportCheckpoint("index1", Path("other.jsonl"), 2, 1, tmp_path).load()
+
+    remove_checkpoints("index1", 2, tmp_path)
+    assert list(tmp_path.iterdir()) == []
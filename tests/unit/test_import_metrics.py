@@ -0,0 +1,37 @@
+import json
+
+from app.import_metrics import ImportMetrics, import_report, write_import_report
+
+
+def test_import_report(tmp_path):
+    workers = []
+    for i in range(2):
+        metrics = ImportMetrics(i)
+        metrics.count("read", 10)
+        metrics.count("acknowledged", 4)
+        metrics.record_error("mapper_parsing_exception")
+        metrics.record_bulk(1000, 0.5)
+        metrics.stop()
+        worker = metrics.to_dict()
+        assert worker["bulk"] == {
+            "requests": 1,
+            "bytes": 1000,
+            "mean_bytes": 1000,
+            "mean_duration": 0.5,
+            "max_duration": 0.5,
+        }
+        workers.append(worker)
+    report = import_report("index1", 2.0, workers, num_errors=2)
+    assert report["counts"] == {"read": 20, "acknowledged": 8}
+    assert report["rates"] == {
+        "read": 10.0,
+        "parsed": 0.0,
+        "transformed": 0.0,
+        "acknowledged": 4.0,
+    }
+    assert report["errors"] == {"mapper_parsing_exception": 2}
+    assert report["timings"] == {"bulk": 1.0}
+    assert report["num_errors"] == 2
+    path = write_import_report(report, tmp_path / "reports")
+    assert path.parent == tmp_path / "reports"
+    assert json.loads(path.read_text()) == report
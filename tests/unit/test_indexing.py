@@ -8,10 +8,14 @@ from app.config import (
     TaxonomySourceConfig,
 )
 from app.indexing import (
+    DocumentProcessor,
+    content_hash,
+    expand_ancestors,
     generate_mapping_object,
     process_taxonomy_field,
     process_text_lang_field,
 )
+from app.taxonomy import Taxonomy
 
 
 @pytest.mark.parametrize(
@@ -131,8 +135,57 @@ def test_process_taxonomy_field(data, field, taxonomy_config, expected):
         assert set(output) == set(expected)
 
 
+def test_expand_ancestors(default_config):
+    taxonomy = Taxonomy.from_dict(
+        "categories",
+        {
+            "en:foods": {"name": {"en": "Foods"}},
+            "en:dairies": {"name": {"en": "Dairies"}, "parents": ["en:foods"]},
+            "en:cheeses": {"name": {"en": "Cheeses"}, "parents": ["en:dairies"]},
+        },
+    )
+    assert expand_ancestors(["en:cheeses", "en:dairies", "en:unknown"], taxonomy) == [
+        "en:cheeses",
+        "en:dairies",
+        "en:unknown",
+        "en:foods",
+    ]
+    assert expand_ancestors("en:dairies", taxonomy) == ["en:dairies", "en:foods"]
+
+    categories = default_config.fields["categories"]
+    config = default_config.model_copy(
+        update={
+            "fields": {
+                **default_config.fields,
+                "categories": categories.model_copy(update={"expand_ancestors": True}),
+            }
+        }
+    )
+    mapping = generate_mapping_object(config).to_dict()
+    assert mapping["properties"]["categories_hierarchy"] == {"type": "keyword"}
+    processor = DocumentProcessor(config)
+    processor.taxonomies["categories"] = taxonomy
+    inputs = processor.inputs_from_data(
+        "1", {"code": "1", "categories_tags": ["en:cheeses"]}
+    )
+    assert inputs["categories"] == ["en:cheeses"]
+    assert inputs["categories_hierarchy"] == ["en:cheeses", "en:dairies", "en:foods"]
+
+
 def test_create_mapping(default_config, load_expected_result):
     mapping = generate_mapping_object(default_config)
     data = mapping.to_dict()
     expected_result = load_expected_result("test_mapping", data)
     assert data == expected_result
+
+
+def test_content_hash():
+    inputs = {"code": "1", "categories": ["en:a", "en:b"], "_id": "1"}
+    hash_ = content_hash(inputs)
+    # keys order, id, last indexed date do not count
+    assert hash_ == content_hash(
+        {"categories": ["en:a", "en:b"], "code": "1", "last_indexed_datetime": "x"}
+    )
+    assert hash_ == content_hash({**inputs, "content_hash": hash_})
+    # but values do
+    assert hash_ != content_hash({**inputs, "categories": ["en:b", "en:a"]})
@@ -0,0 +1,48 @@
+from app.metrics import Histogram, StageTimer
+
+
+def test_histogram_render():
+    histogram = Histogram(
+        "test_duration_seconds", "A test histogram", ("stage",), buckets=(0.1, 1.0)
+    )
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+    histogram.observe(2, stage='say "hi"')
+    assert histogram.render().splitlines() == [
+        "# HELP test_duration_seconds A test histogram",
+        "# TYPE test_duration_seconds histogram",
+        'test_duration_seconds_bucket{stage="parse",le="0.1"} 1',
+        'test_duration_seconds_bucket{stage="parse",le="1.0"} 2',
+        'test_duration_seconds_bucket{stage="parse",le="+Inf"} 2',
+        'test_duration_seconds_sum{stage="parse"} 0.55',
+        'test_duration_seconds_count{stage="parse"} 2',
+        'test_duration_seconds_bucket{stage="say \\"hi\\"",le="0.1"} 0',
+        'test_duration_seconds_bucket{stage="say \\"hi\\"",le="1.0"} 0',
+        'test_duration_seconds_bucket{stage="say \\"hi\\"",le="+Inf"} 1',
+        'test_duration_seconds_sum{stage="say \\"hi\\""} 2.0',
+        'test_duration_seconds_count{stage="say \\"hi\\""} 1',
+    ]
+
+
+def test_stage_timer():
+    histogram = Histogram("test_seconds", "test", ("index_id", "endpoint", "stage"))
+    timer = StageTimer()
+    timer.labels["index_id"] = "off"
+    with timer.stage("parse"):
+        pass
+    timer.add("es_took", 0.002)
+    timer.add("es_took", 0.001)
+    timer.stop()
+    assert timer.end is not None
+    assert list(timer.durations) == ["parse", "es_took"]
+    assert timer.timings_ms()["es_took"] == 3.0
+    timer.observe(histogram, endpoint="/search")
+    rendered = histogram.render()
+    assert (
+        'test_seconds_count{index_id="off",endpoint="/search",stage="parse"} 1'
+        in rendered
+    )
+    assert (
+        'test_seconds_sum{index_id="off",endpoint="/search",stage="es_took"} 0.003'
+        in rendered
+    )
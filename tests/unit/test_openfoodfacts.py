@@ -1,7 +1,11 @@
 from unittest.mock import MagicMock
 
 from app._types import FetcherStatus
-from app.openfoodfacts import TaxonomyPreprocessor
+from app.openfoodfacts import (
+    DocumentPreprocessor,
+    ResultProcessor,
+    TaxonomyPreprocessor,
+)
 from app.taxonomy import Taxonomy, TaxonomyNodeResult
 
 
@@ -31,3 +35,63 @@ class TestTaxonomyPreprocessor:
         # Check that we renamed "xx" to "main"
         assert result.node.names["main"] == "NAT&vie"
         assert result.node.synonyms["main"] == ["NAT&vie", "NAT&vie veggie"]
+
+
+PRODUCT_WITH_IMAGES = {
+    "code": "3307130803004",
+    "lang": "fr",
+    "languages_codes": {"fr": 5},
+    "images": {
+        "1": {"sizes": {"full": {"h": 1000, "w": 800}}},
+        "front_fr": {"imgid": "1", "rev": "4", "sizes": {"400": {"h": 400}}},
+        "ingredients_fr": {"imgid": "1", "rev": "7", "sizes": {"400": {"h": 400}}},
+    },
+}
+
+
+class TestDocumentPreprocessor:
+    def test_preprocess_image_fields(self, default_config):
+        preprocessor = DocumentPreprocessor(default_config)
+        result = preprocessor.preprocess(PRODUCT_WITH_IMAGES)
+        assert result.status is FetcherStatus.FOUND
+        image_fields = result.document["image_fields"]
+        assert image_fields == ResultProcessor.build_image_fields(PRODUCT_WITH_IMAGES)
+        assert image_fields["image_url"] == (
+            "https://images.openfoodfacts.org/images/products/"
+            "330/713/080/3004/front_fr.4.400.jpg"
+        )
+        # each selected image uses its own revision
+        assert image_fields["selected_images"]["ingredients"]["small"] == {
+            "fr": (
+                "https://images.openfoodfacts.org/images/products/"
+                "330/713/080/3004/ingredients_fr.7.200.jpg"
+            )
+        }
+        # source document is not modified
+        assert "image_fields" not in PRODUCT_WITH_IMAGES
+
+    def test_preprocess_invalid_barcode(self, default_config):
+        preprocessor = DocumentPreprocessor(default_config)
+        result = preprocessor.preprocess({**PRODUCT_WITH_IMAGES, "code": "invalid"})
+        assert result.status is FetcherStatus.FOUND
+        assert "image_fields" not in result.document
+
+
+class TestResultProcessor:
+    def test_process_after_uses_image_fields(self, default_config):
+        processor = ResultProcessor(default_config)
+        stored = {"image_url": "https://example.com/front.jpg"}
+        result = processor.process_after(
+            {**PRODUCT_WITH_IMAGES, "image_fields": stored}
+        )
+        assert "image_fields" not in result
+        assert result["image_url"] == "https://example.com/front.jpg"
+        assert "image_small_url" not in result
+
+    def test_process_after_without_image_fields(self, default_config):
+        processor = ResultProcessor(default_config)
+        result = processor.process_after(dict(PRODUCT_WITH_IMAGES))
+        assert result["image_small_url"] == (
+            "https://images.openfoodfacts.org/images/products/"
+            "330/713/080/3004/front_fr.4.200.jpg"
+        )
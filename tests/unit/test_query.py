@@ -6,8 +6,15 @@ from luqum.parser import parser
 from app._types import JSONType, QueryAnalysis, SearchParameters
 from app.config import IndexConfig
 from app.es_query_builder import FullTextQueryBuilder
-from app.exceptions import QueryAnalysisError
-from app.query import boost_phrases, build_search_query, resolve_unknown_operation
+from app.exceptions import QueryAnalysisError, QueryCheckError
+from app.metrics import StageTimer
+from app.query import (
+    boost_phrases,
+    build_completion_query,
+    build_elasticsearch_query_builder,
+    build_search_query,
+    resolve_unknown_operation,
+)
 
 
 def test_boost_phrases_none():
@@ -247,3 +254,34 @@ def test_build_search_query_failure(
             es_query_builder=default_filter_query_builder,
         )
     assert error_msg in str(exc_info.value)
+
+
+def test_build_search_query_hierarchy_field(global_config):
+    index_config = global_config.indices["off"]
+    index_config.fields["categories"].expand_ancestors = True
+    params = SearchParameters(q='categories_hierarchy:"en:dairies"', langs=["en"])
+    query = build_search_query(params, build_elasticsearch_query_builder(index_config))
+    assert query.es_query.to_dict()["query"] == {
+        "term": {"categories_hierarchy": {"value": "en:dairies"}}
+    }
+    # hierarchy fields only exist for fields with expand_ancestors
+    params = SearchParameters(q='labels_hierarchy:"en:organic"', langs=["en"])
+    with pytest.raises(QueryCheckError):
+        build_search_query(params, build_elasticsearch_query_builder(index_config))
+
+
+def test_build_search_query_timings(default_filter_query_builder):
+    params = SearchParameters(q="orange AND brands:foo", langs=["en"])
+    timer = StageTimer()
+    build_search_query(params, default_filter_query_builder, timer)
+    assert list(timer.durations) == ["parse", "transform", "check", "es_query_build"]
+
+
+def test_build_completion_query_source(default_config):
+    query = build_completion_query(
+        "bis", ["categories"], ["en", "fr"], 5, default_config
+    )
+    # only synonyms in requested languages are returned
+    assert query.to_dict()["_source"] == {
+        "includes": ["id", "taxonomy_name", "name", "synonyms.en", "synonyms.fr"]
+    }
@@ -0,0 +1,135 @@
+import json
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from elasticsearch_dsl import Search
+
+from app import slow_log
+from app._types import QueryAnalysis, SearchParameters
+from app.config import settings
+from app.metrics import StageTimer
+
+
+@pytest.fixture
+def slow_log_path(global_config, tmp_path, monkeypatch):
+    path = tmp_path / "logs" / "slow_queries.jsonl"
+    monkeypatch.setattr(settings, "slow_query_log_path", path)
+    monkeypatch.setattr(settings, "slow_query_threshold", 0.5)
+    yield path
+    slow_log.reset()
+
+
+def test_log_slow_query(slow_log_path, monkeypatch):
+    params = SearchParameters(q="milk", langs=["en", "fr"], page_size=5)
+    es_query = MagicMock(spec=Search)
+    es_query.to_dict.return_value = {"query": {"match_all": {}}}
+    es_query.extra.return_value.execute.return_value.to_dict.return_value = {
+        "took": 3,
+        "profile": {"shards": []},
+    }
+    query = QueryAnalysis(text_query="milk").clone(es_query=es_query)
+    timer = StageTimer()
+    timer.add("es_request", 0.4)
+
+    # fast query
+    assert slow_log.log_slow_query(params, query, 0.1, timer, took=2) is None
+    # slow query
+    slow_log.log_slow_query(params, query, 0.6, timer, took=300).result()
+    # slow query, profiled
+    monkeypatch.setattr(settings, "slow_query_profile", True)
+    slow_log.log_slow_query(params, query, 0.7, timer, took=300).result()
+    es_query.extra.assert_called_once_with(profile=True)
+
+    entries = [json.loads(line) for line in slow_log_path.read_text().splitlines()]
+    assert len(entries) == 2
+    assert entries[0]["duration_ms"] == 600.0
+    assert entries[0]["took_ms"] == 300
+    assert entries[0]["timings_ms"] == {"es_request": 400.0}
+    assert entries[0]["params"] == {
+        "q": "milk",
+        "langs": ["en", "fr"],
+        "page_size": 5,
+        "index_id": "off",
+    }
+    assert entries[0]["es_query"] == {"query": {"match_all": {}}}
+    assert "profile" not in entries[0]
+    assert entries[1]["profile"] == {"shards": []}
+
+
+def test_log_slow_query_disabled(slow_log_path, monkeypatch):
+    monkeypatch.setattr(settings, "slow_query_threshold", None)
+    params = SearchParameters(q="milk")
+    assert slow_log.log_slow_query(params, QueryAnalysis(), 10, StageTimer()) is None
+    assert not slow_log_path.exists()
+
+
+def test_log_slow_query_busy(slow_log_path, monkeypatch):
+    monkeypatch.setattr(settings, "slow_query_profile", True)
+    monkeypatch.setattr(slow_log, "MAX_PENDING_ENTRIES", 3)
+    monkeypatch.setattr(slow_log, "MAX_PENDING_PROFILES", 1)
+    # block the background thread in the first profile
+    profiling = threading.Event()
+    unblock = threading.Event()
+
+    def profile_query(es_query):
+        profiling.set()
+        unblock.wait(5)
+        return {"shards": []}
+
+    monkeypatch.setattr(slow_log, "profile_query", profile_query)
+    params = SearchParameters(q="milk")
+    query = QueryAnalysis(text_query="milk").clone(es_query=MagicMock(spec=Search))
+    futures = [slow_log.log_slow_query(params, query, 1, StageTimer())]
+    profiling.wait(5)
+    futures += [
+        slow_log.log_slow_query(params, query, duration, StageTimer())
+        for duration in (2, 3, 4, 5)
+    ]
+    # the queue is full
+    assert futures[3:] == [None, None]
+    unblock.set()
+    futures[1].result()
+    futures[2].result()
+    futures.append(slow_log.log_slow_query(params, query, 6, StageTimer()))
+    futures[-1].result()
+
+    entries = [json.loads(line) for line in slow_log_path.read_text().splitlines()]
+    assert [entry["duration_ms"] for entry in entries] == [1000, 2000, 3000, 6000]
+    assert entries[0]["profile"] == {"shards": []}
+    # profiling was busy
+    assert entries[1]["profile_skipped"]
+    assert "profile" not in entries[1]
+    assert entries[2]["profile_skipped"]
+    # entries were dropped before this one
+    assert entries[3]["dropped_entries"] == 2
+    assert entries[3]["profile"] == {"shards": []}
+
+
+def test_reset_pending_entries(slow_log_path, monkeypatch):
+    monkeypatch.setattr(settings, "slow_query_profile", True)
+    # block the background thread in a profile
+    profiling = threading.Event()
+    unblock = threading.Event()
+
+    def profile_query(es_query):
+        profiling.set()
+        unblock.wait(5)
+        return {"shards": []}
+
+    monkeypatch.setattr(slow_log, "profile_query", profile_query)
+    params = SearchParameters(q="milk")
+    query = QueryAnalysis(text_query="milk").clone(es_query=MagicMock(spec=Search))
+    futures = [slow_log.log_slow_query(params, query, 1, StageTimer())]
+    profiling.wait(5)
+    futures.append(slow_log.log_slow_query(params, query, 2, StageTimer()))
+    # reset waits for pending entries, without holding them back
+    reset = threading.Thread(target=slow_log.reset)
+    reset.start()
+    unblock.set()
+    reset.join(5)
+    assert not reset.is_alive()
+    assert all(future.done() for future in futures)
+
+    entries = [json.loads(line) for line in slow_log_path.read_text().splitlines()]
+    assert [entry["duration_ms"] for entry in entries] == [1000, 2000]
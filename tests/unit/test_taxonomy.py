@@ -0,0 +1,252 @@
+import json
+import os
+from unittest.mock import MagicMock, patch
+
+import app.taxonomy
+from app.config import TaxonomyConfig, TaxonomySourceConfig
+from app.taxonomy import (
+    Taxonomy,
+    fetch_taxonomy_file,
+    get_preloaded_taxonomy,
+    iter_taxonomies,
+    taxonomy_entry_result,
+)
+from app.utils.download import get_file_etag
+
+
+def test_taxonomy_from_dict():
+    taxonomy = Taxonomy.from_dict(
+        "categories",
+        {
+            "en:foods": {"name": {"en": "Foods"}},
+            "en:snacks": {"name": {"en": "Snacks"}, "parents": ["en:foods"]},
+            "en:biscuits": {
+                "name": {"en": "Biscuits", "fr": None},
+                "synonyms": {"en": ["Biscuits", "cookies"]},
+                "parents": ["en:snacks", "en:snacks", "en:foods"],
+            },
+        },
+    )
+    biscuits = taxonomy["en:biscuits"]
+    assert biscuits.names == {"en": "Biscuits"}
+    assert biscuits.get_synonyms("en") == ["Biscuits", "cookies"]
+    assert [parent.id for parent in biscuits.parents] == ["en:snacks", "en:foods"]
+    assert [child.id for child in taxonomy["en:foods"].children] == [
+        "en:snacks",
+        "en:biscuits",
+    ]
+    # default values are not shared
+    assert taxonomy["en:foods"].parents == []
+    assert taxonomy["en:foods"].synonyms is not taxonomy["en:snacks"].synonyms
+
+
+def _categories():
+    return Taxonomy.from_dict(
+        "categories",
+        {
+            "en:foods": {"name": {"en": "Foods"}},
+            "en:dairies": {"name": {"en": "Dairies"}, "parents": ["en:foods"]},
+            "en:desserts": {"name": {"en": "Desserts"}, "parents": ["en:foods"]},
+            "en:yogurts": {"name": {"en": "Yogurts"}, "parents": ["en:dairies"]},
+            "en:dairy-desserts": {
+                "name": {"en": "Dairy desserts"},
+                "parents": ["en:yogurts", "en:desserts"],
+            },
+        },
+    )
+
+
+def test_get_ancestor_ids():
+    taxonomy = _categories()
+    assert taxonomy.get_ancestor_ids("en:foods") == ()
+    assert taxonomy.get_ancestor_ids("en:dairy-desserts") == (
+        "en:yogurts",
+        "en:desserts",
+        "en:dairies",
+        "en:foods",
+    )
+    assert taxonomy.get_ancestor_ids("en:unknown") == ()
+    # ancestors of all entries were computed, not those of unknown ids
+    assert taxonomy._closures["parents"]["en:yogurts"] == ("en:dairies", "en:foods")
+    assert "en:unknown" not in taxonomy._closures["parents"]
+
+
+def test_get_descendant_ids():
+    taxonomy = _categories()
+    assert taxonomy.get_descendant_ids("en:foods") == (
+        "en:dairies",
+        "en:desserts",
+        "en:yogurts",
+        "en:dairy-desserts",
+    )
+    assert taxonomy.get_descendant_ids("en:dairy-desserts") == ()
+    assert taxonomy.get_descendant_ids("en:unknown") == ()
+
+
+def _cyclic_taxonomy():
+    # en:milks and en:dairies are parents of each other
+    return Taxonomy.from_dict(
+        "categories",
+        {
+            "en:foods": {},
+            "en:dairies": {"parents": ["en:foods", "en:milks"]},
+            "en:milks": {"parents": ["en:dairies"]},
+            "en:whole-milks": {"parents": ["en:milks"]},
+        },
+    )
+
+
+def test_get_ancestor_ids_cycle():
+    expected = {
+        "en:foods": (),
+        "en:dairies": ("en:foods", "en:milks"),
+        "en:milks": ("en:dairies", "en:foods"),
+        "en:whole-milks": ("en:milks", "en:dairies", "en:foods"),
+    }
+    # results don't depend on the first requested entry
+    for key in expected:
+        taxonomy = _cyclic_taxonomy()
+        taxonomy.get_ancestor_ids(key)
+        assert {key: taxonomy.get_ancestor_ids(key) for key in expected} == expected
+    taxonomy = _cyclic_taxonomy()
+    assert taxonomy.get_descendant_ids("en:foods") == (
+        "en:dairies",
+        "en:milks",
+        "en:whole-milks",
+    )
+    assert taxonomy.get_descendant_ids("en:milks") == ("en:dairies", "en:whole-milks")
+
+
+def test_taxonomy_entry_result():
+    taxonomy = _categories()
+    result = taxonomy_entry_result(taxonomy, taxonomy["en:foods"], page=2, page_size=1)
+    assert result == {
+        "taxonomy_name": "categories",
+        "id": "en:foods",
+        "names": {"en": "Foods"},
+        "parents": [],
+        "ancestors": [],
+        "children": ["en:desserts"],
+        "children_count": 2,
+        "descendants": ["en:desserts"],
+        "descendants_count": 4,
+        "page": 2,
+        "page_size": 1,
+    }
+
+
+def _join_preload(index_id):
+    preload = app.taxonomy._PRELOADS.get(index_id)
+    if preload is not None:
+        preload.join()
+
+
+def test_get_preloaded_taxonomy(default_config, monkeypatch):
+    monkeypatch.setattr(app.taxonomy, "_PRELOADED_TAXONOMIES", {})
+    taxonomy_config = default_config.taxonomy
+    previous, current = _categories(), _categories()
+    with patch("app.taxonomy.iter_taxonomies", return_value=[previous]):
+        # taxonomies are loaded in background
+        assert (
+            get_preloaded_taxonomy("off", taxonomy_config, "categories", "g1") is None
+        )
+        _join_preload("off")
+        assert (
+            get_preloaded_taxonomy("off", taxonomy_config, "categories", "g1")
+            is previous
+        )
+    with patch("app.taxonomy.iter_taxonomies", return_value=[current]):
+        # taxonomies were re-imported, previous ones are used until reloaded
+        assert (
+            get_preloaded_taxonomy("off", taxonomy_config, "categories", "g2")
+            is previous
+        )
+        _join_preload("off")
+        assert (
+            get_preloaded_taxonomy("off", taxonomy_config, "categories", "g2")
+            is current
+        )
+    assert get_preloaded_taxonomy("off", taxonomy_config, "labels", "g2") is None
+
+
+def test_taxonomy_entry_api(global_config, test_client, monkeypatch):
+    monkeypatch.setattr(app.taxonomy, "_PRELOADED_TAXONOMIES", {})
+    categories = _categories()
+    with patch("app.taxonomy.iter_taxonomies", return_value=[categories]), patch(
+        "app.api.taxonomy_generation", return_value="gen-1"
+    ):
+        # taxonomies are loaded in background
+        response = test_client.get("/taxonomy/categories/en:yogurts")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "10"
+        _join_preload("off")
+        response = test_client.get("/taxonomy/categories/en:yogurts")
+        assert response.status_code == 200
+        # closures were computed during the preload
+        assert set(categories._closures) == {"parents", "children"}
+        data = response.json()
+        assert data["ancestors"] == ["en:dairies", "en:foods"]
+        assert data["descendants"] == ["en:dairy-desserts"]
+        assert response.headers["Cache-Control"] == "public, max-age=3600"
+        etag = response.headers["ETag"]
+        # revalidation
+        response = test_client.get(
+            "/taxonomy/categories/en:yogurts", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        response = test_client.get(
+            "/taxonomy/categories/en:yogurts", params={"page_size": 10}
+        )
+        assert response.headers["ETag"] != etag
+        assert test_client.get("/taxonomy/categories/en:unknown").status_code == 404
+        assert test_client.get("/taxonomy/unknown/en:yogurts").status_code == 404
+
+
+def test_iter_taxonomies(default_config, tmp_path):
+    names = ["labels", "countries", "brands"]
+    paths = {name: tmp_path / f"{name}.json" for name in names}
+    for name, path in paths.items():
+        path.write_text(json.dumps({f"en:{name}-1": {"name": {"en": name}}}))
+    taxonomy_config = TaxonomyConfig(
+        sources=[
+            TaxonomySourceConfig(name=name, url=f"file://{path}")
+            for name, path in paths.items()
+        ],
+        index=default_config.taxonomy.index,
+    )
+    taxonomies = list(iter_taxonomies(taxonomy_config))
+    assert [taxonomy.name for taxonomy in taxonomies] == names
+    assert [list(taxonomy.keys()) for taxonomy in taxonomies] == [
+        ["en:labels-1"],
+        ["en:countries-1"],
+        ["en:brands-1"],
+    ]
+    # loaded taxonomies are cached
+    assert list(iter_taxonomies(taxonomy_config))[0] is taxonomies[0]
+    # until their file changes
+    paths["labels"].write_text(json.dumps({"en:organic": {"name": {"en": "Organic"}}}))
+    stat = paths["labels"].stat()
+    os.utime(paths["labels"], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    labels = next(iter_taxonomies(taxonomy_config))
+    assert list(labels.keys()) == ["en:organic"]
+
+
+def test_fetch_taxonomy_file_missing_file(tmp_path):
+    taxonomy_path = tmp_path / "labels.json"
+    url = "https://example.com/labels.json"
+    response = MagicMock(status_code=200, headers={"ETag": '"v1"'})
+    response.iter_content.return_value = [b'{"en:organic": {}}']
+    with patch("app.utils.download.http_session") as session:
+        session.get.return_value = response
+        fetch_taxonomy_file("labels", url, cache_dir=tmp_path)
+        assert get_file_etag(taxonomy_path) == "v1"
+        # the file was removed, but not its metadata
+        taxonomy_path.unlink()
+        session.get.reset_mock()
+        fetch_taxonomy_file(
+            "labels", url, force_download=True, download_newer=True, cache_dir=tmp_path
+        )
+    # the stored Etag is not used, as the file is missing
+    session.get.assert_called_once_with(url, stream=True, headers={})
+    assert taxonomy_path.read_bytes() == b'{"en:organic": {}}'
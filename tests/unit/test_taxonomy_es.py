@@ -0,0 +1,97 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.taxonomy import Taxonomy
+from app.taxonomy_es import create_synonyms, create_synonyms_files, refresh_synonyms
+
+
+def _taxonomies(organic_synonyms):
+    return [
+        Taxonomy.from_dict(
+            "labels",
+            {"en:organic": {"name": {"en": "Organic"}, "synonyms": organic_synonyms}},
+        ),
+        Taxonomy.from_dict(
+            "countries",
+            {"en:france": {"name": {"en": "France"}, "synonyms": {"en": ["France"]}}},
+        ),
+    ]
+
+
+def test_create_synonyms_files(tmp_path):
+    taxonomy = Taxonomy.from_dict(
+        "labels",
+        {
+            "en:organic": {
+                "name": {"en": "Organic"},
+                "synonyms": {
+                    "en": ["Organic", "Bio  (EU)", "!!"],
+                    "fr": ["Bio"],
+                    "xx": ["AB-Agriculture"],
+                },
+            },
+            "en:vegan": {"name": {"en": "Vegan"}, "synonyms": {"en": ["Vegan"]}},
+        },
+    )
+    create_synonyms_files(taxonomy, ["en", "fr", "de"], tmp_path)
+    assert (tmp_path / "en.txt").read_text() == (
+        "ab agriculture,bio eu ,organic => en:organic\n" "vegan => en:vegan\n"
+    )
+    assert (tmp_path / "fr.txt").read_text() == (
+        "ab agriculture,bio,organic => en:organic\n"
+    )
+    # files are created for all languages
+    assert (tmp_path / "de.txt").read_text() == ""
+
+
+def test_create_synonyms(default_config, tmp_path):
+    synonyms = {"en": ["Organic", "bio"]}
+    with patch("app.taxonomy_es.iter_taxonomies", return_value=_taxonomies(synonyms)):
+        assert create_synonyms(default_config, tmp_path)
+    labels_file = tmp_path / "labels" / "en.txt"
+    assert labels_file.read_text() == "bio,organic => en:organic\n"
+    countries_mtime = (tmp_path / "countries" / "en.txt").stat().st_mtime_ns
+    # nothing changed
+    with patch("app.taxonomy_es.iter_taxonomies", return_value=_taxonomies(synonyms)):
+        assert not create_synonyms(default_config, tmp_path)
+    # a synonym was added
+    synonyms = {"en": ["Organic", "bio", "organically grown"]}
+    with patch("app.taxonomy_es.iter_taxonomies", return_value=_taxonomies(synonyms)):
+        assert create_synonyms(default_config, tmp_path)
+    assert labels_file.read_text() == ("bio,organic,organically grown => en:organic\n")
+    # unchanged files were not replaced
+    assert (tmp_path / "countries" / "en.txt").stat().st_mtime_ns == countries_mtime
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["countries", "labels"]
+
+
+def test_refresh_synonyms(default_config, tmp_path):
+    es_client = MagicMock()
+    taxonomies = _taxonomies({"en": ["Organic", "bio"]})
+    with patch("app.taxonomy_es.iter_taxonomies", return_value=taxonomies), patch(
+        "app.taxonomy_es.connection.current_es_client", return_value=es_client
+    ):
+        assert refresh_synonyms("off", default_config, tmp_path)
+        es_client.indices.reload_search_analyzers.assert_called_once_with(index="off")
+        es_client.indices.clear_cache.assert_called_once_with(index="off", request=True)
+        es_client.reset_mock()
+        # synonyms did not change, analyzers are not reloaded
+        assert not refresh_synonyms("off", default_config, tmp_path)
+        es_client.indices.reload_search_analyzers.assert_not_called()
+        es_client.indices.clear_cache.assert_not_called()
+
+
+def test_refresh_synonyms_failed_reload(default_config, tmp_path):
+    es_client = MagicMock()
+    es_client.indices.reload_search_analyzers.side_effect = RuntimeError("timeout")
+    taxonomies = _taxonomies({"en": ["Organic", "bio"]})
+    with patch("app.taxonomy_es.iter_taxonomies", return_value=taxonomies), patch(
+        "app.taxonomy_es.connection.current_es_client", return_value=es_client
+    ):
+        with pytest.raises(RuntimeError):
+            refresh_synonyms("off", default_config, tmp_path)
+        es_client.indices.reload_search_analyzers.side_effect = None
+        # files are unchanged, but they were not reloaded yet
+        assert refresh_synonyms("off", default_config, tmp_path)
+        assert es_client.indices.reload_search_analyzers.call_count == 2
+        assert not refresh_synonyms("off", default_config, tmp_path)
@@ -1,7 +1,92 @@
+import gzip
+import importlib.util
+import shutil
+import subprocess
+import threading
+from unittest.mock import MagicMock, patch
+
+import orjson
+import pytest
+
 from app.utils import load_class_object_from_string
+from app.utils.download import download_file, get_file_etag
+from app.utils.io import jsonl_iter, jsonl_lines, read_blocks
 
 
 def test_load_class_object_from_string():
     cls = load_class_object_from_string("app.openfoodfacts.ResultProcessor")
     assert isinstance(cls, type)
     assert cls.__name__ == "ResultProcessor"
+
+
+@pytest.fixture
+def jsonl_items():
+    return [{"code": str(i), "name": f"product é {i}"} for i in range(1000)]
+
+
+@pytest.mark.parametrize("external", [True, False])
+@pytest.mark.parametrize("suffix", [".jsonl", ".jsonl.gz", ".jsonl.zst"])
+def test_jsonl_iter(tmp_path, jsonl_items, suffix, external):
+    if suffix == ".jsonl.zst" and not (
+        shutil.which("zstd") and (external or importlib.util.find_spec("zstandard"))
+    ):
+        pytest.skip("zstd is not available")
+    data = b"\n".join(orjson.dumps(item) for item in jsonl_items) + b"\n\n"
+    file_path = tmp_path / f"data{suffix}"
+    if suffix == ".jsonl.gz":
+        # multi-member gzip file
+        half = len(data) // 2
+        file_path.write_bytes(gzip.compress(data[:half]) + gzip.compress(data[half:]))
+    elif suffix == ".jsonl.zst":
+        raw_path = tmp_path / "data.jsonl"
+        raw_path.write_bytes(data)
+        subprocess.run(["zstd", "-q", str(raw_path), "-o", str(file_path)], check=True)
+    else:
+        file_path.write_bytes(data)
+    # small blocks, so that lines span several blocks
+    lines = list(jsonl_lines(file_path, block_size=100, external=external))
+    assert all(isinstance(line, bytes) for line in lines)
+    assert [orjson.loads(line) for line in lines] == jsonl_items
+    assert list(jsonl_iter(file_path)) == jsonl_items
+
+
+def test_read_blocks_stop_early(tmp_path):
+    file_path = tmp_path / "data.jsonl.gz"
+    file_path.write_bytes(gzip.compress(b"0123456789" * 10000))
+    num_threads = threading.active_count()
+    blocks = read_blocks(file_path, block_size=10, external=False)
+    assert next(blocks) == b"0123456789"
+    # the background thread stops
+    blocks.close()
+    assert threading.active_count() == num_threads
+
+
+def _response(status_code, content=b"", etag=None):
+    response = MagicMock(status_code=status_code, headers={})
+    if etag is not None:
+        response.headers["ETag"] = etag
+    response.iter_content.return_value = [content]
+    return response
+
+
+def test_download_file(tmp_path):
+    output_path = tmp_path / "labels.json"
+    with patch("app.utils.download.http_session") as session:
+        session.get.return_value = _response(200, b'{"en:organic": {}}', '"v1"')
+        assert download_file("https://example.com/labels.json", output_path)
+        session.get.assert_called_once_with(
+            "https://example.com/labels.json", stream=True, headers={}
+        )
+        assert output_path.read_bytes() == b'{"en:organic": {}}'
+        assert get_file_etag(output_path) == "v1"
+
+        # conditional request, the file did not change
+        session.get.reset_mock()
+        session.get.return_value = _response(304)
+        assert not download_file("https://example.com/labels.json", output_path, "v1")
+        session.get.assert_called_once_with(
+            "https://example.com/labels.json",
+            stream=True,
+            headers={"If-None-Match": '"v1"'},
+        )
+        assert output_path.read_bytes() == b'{"en:organic": {}}'
@@ -0,0 +1,45 @@
+import json
+from unittest.mock import MagicMock
+
+from app import warmup
+from app.benchmarks.fake_es import FakeElasticsearch, indexed_documents
+
+
+def test_load_warmup_queries(tmp_path):
+    file_path = tmp_path / "queries.jsonl"
+    params = {"q": "milk", "facets": ["brands"]}
+    slow_log_entry = {"duration_ms": 1200.0, "params": {"q": "chocolate"}}
+    file_path.write_text(f"{json.dumps(params)}\n{json.dumps(slow_log_entry)}\n")
+    assert warmup.load_warmup_queries(file_path) == [params, {"q": "chocolate"}]
+
+
+def test_warmup_index(global_config):
+    # queries are validated with the global configuration
+    default_config = global_config.indices["off"]
+    es_client = MagicMock(
+        wraps=FakeElasticsearch(indexed_documents(default_config, 10))
+    )
+    queries = warmup.default_warmup_queries(default_config) + [
+        {"q": "milk", "sort_by": "unique_scans_n"},
+        # invalid query
+        {"facets": ["unknown"]},
+    ]
+    errors = warmup.warmup_index(es_client, "off-new", "off", queries, rounds=2)
+    assert errors == 1
+    assert es_client.search.call_count == 4
+    for call in es_client.search.call_args_list:
+        assert call.kwargs["index"] == ["off-new"]
+    # all facets are aggregated by the default query
+    body = es_client.search.call_args_list[0].kwargs["body"]
+    assert set(body["aggs"]) >= set(default_config.get_fields_with_bucket_agg())
+
+
+def test_warmup_taxonomy_index(default_config):
+    es_client = MagicMock(wraps=FakeElasticsearch([]))
+    errors = warmup.warmup_taxonomy_index(
+        es_client, "off_taxonomy-new", default_config, prefixes=["a", "b"]
+    )
+    assert errors == 0
+    assert es_client.search.call_count == 2
+    body = es_client.search.call_args_list[0].kwargs["body"]
+    assert body["suggest"]["taxonomy_suggest_en"]["text"] == "a"